@@ -0,0 +1,112 @@
+"""
+Отслеживание активности сессий пользователей
+
+Запись UserSession пользователя хранится в кэше. Время последней
+активности записывается в кэш и в БД не чаще, чем раз в
+SESSION_ACTIVITY_FLUSH_INTERVAL секунд, поэтому проверка неактивности
+точна до этого интервала. Смена IP или User-Agent определяется по записи
+из кэша и сохраняется сразу.
+"""
+
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import UserSession
+
+logger = logging.getLogger(__name__)
+
+# Запись в БД не чаще, чем раз в N секунд
+DEFAULT_FLUSH_INTERVAL = 60
+
+
+def _cache_key(user_id):
+    return f"user_session:{user_id}"
+
+
+def _flush_interval():
+    return getattr(settings, 'SESSION_ACTIVITY_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+
+
+def _cache_timeout():
+    return getattr(settings, 'SESSION_COOKIE_AGE', 8 * 60 * 60)
+
+
+def _record_from_session(user_session):
+    return {
+        'session_key': user_session.session_key,
+        'ip_address': user_session.ip_address,
+        'device_info': user_session.device_info,
+        'last_activity': user_session.last_activity,
+        'flushed_at': user_session.last_activity,
+    }
+
+
+def get_session_record(user_id):
+    """Запись сессии пользователя из кэша (None, если ее нет)"""
+    return cache.get(_cache_key(user_id))
+
+
+def set_session_record(user_id, record):
+    cache.set(_cache_key(user_id), record, _cache_timeout())
+
+
+def forget_session_record(user_id):
+    """Сбросить запись сессии (выход, удаление сессии)"""
+    cache.delete(_cache_key(user_id))
+
+
+def load_session_record(user, session_key, ip_address, user_agent):
+    """Запись сессии из кэша, а при промахе - из БД (с созданием)"""
+    record = get_session_record(user.pk)
+    if record is not None:
+        return record
+
+    user_session, _created = UserSession.objects.get_or_create(
+        user=user,
+        defaults={
+            'session_key': session_key,
+            'device_info': user_agent,
+            'ip_address': ip_address,
+        }
+    )
+    record = _record_from_session(user_session)
+    set_session_record(user.pk, record)
+    return record
+
+
+def touch_session(user, session_key, ip_address, user_agent, record=None, changed=False):
+    """
+    Отметить активность пользователя.
+    changed - запись изменена вызывающим кодом и должна быть сохранена в кэше.
+    Возвращает актуальную запись сессии.
+    """
+    if record is None:
+        record = load_session_record(user, session_key, ip_address, user_agent)
+    now = timezone.now()
+    record['last_activity'] = now
+    update = {}
+
+    # Проверяем, не изменились ли IP или User-Agent
+    if record['ip_address'] != ip_address or record['device_info'] != user_agent:
+        logger.warning(
+            f"Device info changed for user {user.email}: "
+            f"IP {record['ip_address']} -> {ip_address}, "
+            f"Agent changed: {record['device_info'] != user_agent}"
+        )
+        record['ip_address'] = ip_address
+        record['device_info'] = user_agent
+        update.update(ip_address=ip_address, device_info=user_agent)
+
+    if update or (now - record['flushed_at']).total_seconds() >= _flush_interval():
+        update['last_activity'] = now
+        record['flushed_at'] = now
+        UserSession.objects.filter(user=user).update(**update)
+        changed = True
+
+    # Кэш переписывается вместе с БД, а не на каждом запросе
+    if changed:
+        set_session_record(user.pk, record)
+    return record
@@ -222,7 +222,7 @@ class ProjectAccessKeyAdmin(admin.ModelAdmin):
     """Админка для ключей доступа к проектам"""
     list_display = ('key', 'project_id', 'created_by', 'is_active', 'expires_at', 'created_at')
     list_filter = ('is_active', 'expires_at', 'created_at')
-    search_fields = ('key', 'project_id', 'created_by__email')
+    search_fields = ('key', 'project__name', 'created_by__email')
     readonly_fields = ('key', 'created_at')
 
 
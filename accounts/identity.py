@@ -0,0 +1,86 @@
+"""
+Снимок Telegram-идентичности пользователя
+
+Telegram ID, отпечаток устройства и роль загружаются одним запросом
+(select_related('telegram_profile')), запоминаются на объекте пользователя
+на время запроса и хранятся в общем кэше. Кэш сбрасывается при привязке и
+отвязке Telegram (сигналы TelegramUser), смене роли и привязке устройства.
+"""
+
+import hashlib
+from collections import namedtuple
+from functools import lru_cache
+
+from django.core.cache import cache
+
+# Время жизни записи в общем кэше (секунды)
+IDENTITY_CACHE_TIMEOUT = 600
+
+# Атрибут пользователя со снимком для текущего запроса
+_REQUEST_ATTR = '_telegram_identity'
+
+TelegramIdentity = namedtuple('TelegramIdentity', ['telegram_id', 'device_fingerprint', 'role'])
+
+
+def _cache_key(user_id):
+    return f"telegram_identity:{user_id}"
+
+
+def _load_identity(user_id):
+    from .models import User
+
+    user = (
+        User.objects.select_related('telegram_profile')
+        .only('device_fingerprint', 'role', 'telegram_profile__telegram_id')
+        .get(pk=user_id)
+    )
+    try:
+        telegram_id = user.telegram_profile.telegram_id
+    except User.telegram_profile.RelatedObjectDoesNotExist:
+        telegram_id = None
+    return TelegramIdentity(telegram_id, user.device_fingerprint, user.role)
+
+
+def get_telegram_identity(user):
+    """Снимок пользователя (кэш запроса, затем общий кэш)"""
+    identity = getattr(user, _REQUEST_ATTR, None)
+    if identity is not None:
+        return identity
+
+    key = _cache_key(user.pk)
+    identity = cache.get(key)
+    if identity is None:
+        identity = _load_identity(user.pk)
+        cache.set(key, identity, IDENTITY_CACHE_TIMEOUT)
+
+    setattr(user, _REQUEST_ATTR, identity)
+    return identity
+
+
+def invalidate_telegram_identity(*users):
+    """Сбросить снимок пользователей (принимает объекты User или их ID)"""
+    user_ids = set()
+    for user in users:
+        if user is None:
+            continue
+        if hasattr(user, 'pk'):
+            user.__dict__.pop(_REQUEST_ATTR, None)
+            user = user.pk
+        user_ids.add(user)
+    if user_ids:
+        cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+
+
+@lru_cache(maxsize=1024)
+def device_fingerprint(user_agent, ip_address, email):
+    """Отпечаток устройства на основе user-agent и IP"""
+    data = f"{user_agent}_{ip_address}_{email}"
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def is_device_allowed(user, user_agent, ip_address):
+    """Разрешено ли устройство пользователю (по снимку)"""
+    fingerprint = get_telegram_identity(user).device_fingerprint
+    if not fingerprint:
+        return True  # Первый вход
+    return fingerprint == device_fingerprint(user_agent, ip_address, user.email)
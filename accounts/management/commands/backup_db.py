@@ -10,13 +10,26 @@ Django команда для управления резервными копи
 from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
 import os
-import shutil
 import sqlite3
 import datetime
 import json
 from pathlib import Path
 
 
+def copy_sqlite_database(source_path, target_path):
+    """
+    Копирует базу SQLite через backup API: в копию попадают и данные,
+    еще не перенесенные из журнала WAL
+    """
+    source = sqlite3.connect(str(source_path))
+    target = sqlite3.connect(str(target_path))
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
 class Command(BaseCommand):
     help = 'Управление резервными копиями базы данных'
     
@@ -75,8 +88,8 @@ class Command(BaseCommand):
             
             self.stdout.write(f"Создание резервной копии: {backup_filename}")
             
-            # Копируем файл базы данных
-            shutil.copy2(db_path, backup_path)
+            # Копируем базу данных
+            copy_sqlite_database(db_path, backup_path)
             
             # Создаем метаданные
             metadata = {
@@ -130,7 +143,7 @@ class Command(BaseCommand):
             current_backup = self.create_backup({'description': 'before_restore'})
             
             # Восстанавливаем базу данных
-            shutil.copy2(backup_path, db_path)
+            copy_sqlite_database(backup_path, db_path)
             
             self.stdout.write(
                 self.style.SUCCESS(f"База данных восстановлена из: {backup_path}")
@@ -0,0 +1,59 @@
+import time
+
+from django.core import signals
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+
+class Command(BaseCommand):
+    help = 'Замеряет запросы/сек без постоянных соединений с БД и с ними'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Количество имитируемых запросов')
+        parser.add_argument('--queries', type=int, default=3, help='SQL-запросов на один HTTP-запрос')
+        parser.add_argument(
+            '--max-age', type=int, default=None,
+            help='CONN_MAX_AGE для второго замера (по умолчанию - из настроек)'
+        )
+
+    def handle(self, *args, **options):
+        configured = connection.settings_dict['CONN_MAX_AGE']
+        max_age = options['max_age'] if options['max_age'] is not None else configured
+        if not max_age:
+            max_age = 60
+
+        try:
+            self._report('Новое соединение на каждый запрос (CONN_MAX_AGE=0)', self._bench(0, options))
+            self._report(f'Постоянные соединения (CONN_MAX_AGE={max_age})', self._bench(max_age, options))
+        finally:
+            connection.close()
+            connection.settings_dict['CONN_MAX_AGE'] = configured
+
+    def _bench(self, max_age, options):
+        connection.close()
+        connection.settings_dict['CONN_MAX_AGE'] = max_age
+
+        connects = 0
+        started = time.perf_counter()
+        for _ in range(options['requests']):
+            # Тот же цикл, что у обработчика WSGI: request_started и
+            # request_finished закрывают устаревшие соединения
+            signals.request_started.send(sender=self.__class__, environ={})
+            if connection.connection is None:
+                connects += 1
+            with connection.cursor() as cursor:
+                for _ in range(options['queries']):
+                    cursor.execute('SELECT 1')
+                    cursor.fetchone()
+            signals.request_finished.send(sender=self.__class__)
+        elapsed = time.perf_counter() - started
+
+        return {'requests': options['requests'], 'elapsed': elapsed, 'connects': connects}
+
+    def _report(self, title, result):
+        requests = result['requests']
+        self.stdout.write(self.style.SUCCESS(title))
+        self.stdout.write(f"  Запросов: {requests}")
+        self.stdout.write(f"  Запросов/сек: {requests / result['elapsed']:.0f}")
+        self.stdout.write(f"  Время на запрос: {result['elapsed'] / requests * 1000:.2f} мс")
+        self.stdout.write(f"  Новых соединений: {result['connects']}")
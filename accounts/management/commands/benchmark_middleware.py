@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.utils.module_loading import import_string
+
+
+class Command(BaseCommand):
+    help = 'Замеряет накладные расходы middleware на запрос (WSGI и ASGI)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20000, help='Количество запросов на замер')
+        parser.add_argument('--path', default='/projects/', help='Путь тестового запроса')
+        parser.add_argument(
+            '--middleware', action='append',
+            help='Путь к middleware (по умолчанию - каждый из MIDDLEWARE)'
+        )
+
+    def handle(self, *args, **options):
+        paths = options['middleware'] or settings.MIDDLEWARE
+        factory = RequestFactory()
+
+        self.stdout.write(self.style.SUCCESS(f"Запросов: {options['requests']}, путь: {options['path']}"))
+        self.stdout.write(f"{'middleware':<60} {'WSGI, мкс':>10} {'ASGI, мкс':>10}")
+        for path in paths:
+            middleware = import_string(path)
+            try:
+                sync_time = self._bench_sync(middleware, factory, options)
+                async_time = self._bench_async(middleware, factory, options)
+            except Exception as e:
+                # Middleware, зависящие от предыдущих (сессии, сообщения), отдельно не работают
+                self.stdout.write(f"{path:<60} {'ошибка':>10} ({e})")
+                continue
+            async_column = f"{async_time:.2f}" if async_time is not None else '-'
+            self.stdout.write(f"{path:<60} {sync_time:>10.2f} {async_column:>10}")
+
+    def _request(self, factory, options):
+        request = factory.get(options['path'])
+        request.user = AnonymousUser()
+        return request
+
+    def _bench_sync(self, middleware, factory, options):
+        chain = middleware(lambda request: HttpResponse('ok'))
+        requests = [self._request(factory, options) for _ in range(options['requests'])]
+
+        started = time.perf_counter()
+        for request in requests:
+            chain(request)
+        return self._per_request(started, options)
+
+    def _bench_async(self, middleware, factory, options):
+        if not getattr(middleware, 'async_capable', False):
+            return None
+
+        async def view(request):
+            return HttpResponse('ok')
+
+        chain = middleware(view)
+        requests = [self._request(factory, options) for _ in range(options['requests'])]
+
+        async def run():
+            for request in requests:
+                await chain(request)
+
+        started = time.perf_counter()
+        asyncio.run(run())
+        return self._per_request(started, options)
+
+    def _per_request(self, started, options):
+        return (time.perf_counter() - started) / options['requests'] * 1_000_000
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import ProjectAccessKey
+from projects.access import invalidate_project_access
+
+
+class Command(BaseCommand):
+    help = 'Деактивирует истекшие ключи доступа к проектам (запускать периодически)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Ключей за одно обновление (по умолчанию 1000)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать количество истекших ключей'
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        expired = ProjectAccessKey.objects.expired(now)
+
+        if options['dry_run']:
+            self.stdout.write(f'Истекших ключей: {expired.count()}')
+            return
+
+        total = 0
+        while True:
+            batch = list(
+                expired.order_by('expires_at')
+                .values_list('id', 'assigned_to_id')[:options['batch_size']]
+            )
+            if not batch:
+                break
+
+            with transaction.atomic():
+                total += ProjectAccessKey.objects.filter(
+                    id__in=[key_id for key_id, _user_id in batch]
+                ).update(is_active=False)
+
+            # update() не вызывает сигналы, кэш доступа сбрасываем явно
+            invalidate_project_access(*(user_id for _key_id, user_id in batch))
+
+        self.stdout.write(self.style.SUCCESS(f'Деактивировано ключей: {total}'))
@@ -0,0 +1,40 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0004_estimatecategory_estimaterate_estimatetemplate_and_more'),
+        ('accounts', '0010_auto_20250916_1038'),
+    ]
+
+    operations = [
+        # Колонка project_id остается той же; меняется только описание поля
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveField(
+                    model_name='projectaccesskey',
+                    name='project_id',
+                ),
+                migrations.AddField(
+                    model_name='projectaccesskey',
+                    name='project',
+                    field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='access_keys', to='projects.project', verbose_name='Проект'),
+                ),
+            ],
+            database_operations=[],
+        ),
+        migrations.AddIndex(
+            model_name='projectaccesskey',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['assigned_to', 'project', 'expires_at'], name='access_key_active_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projectaccesskey',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['project', 'assigned_to'], name='access_key_active_proj_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projectaccesskey',
+            index=models.Index(condition=models.Q(('is_active', True), ('expires_at__isnull', False)), fields=['expires_at'], name='access_key_expiry_idx'),
+        ),
+    ]
@@ -2,7 +2,6 @@ from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
-import hashlib
 import uuid
 import logging
 
@@ -141,9 +140,8 @@ class User(AbstractUser):
     def get_telegram_id(self):
         """Получает Telegram ID пользователя"""
         try:
-            from .models import TelegramUser
-            telegram_user = TelegramUser.objects.filter(user=self).first()
-            return telegram_user.telegram_id if telegram_user else None
+            from .identity import get_telegram_identity
+            return get_telegram_identity(self).telegram_id
         except:
             return None
 
@@ -253,8 +251,8 @@ class User(AbstractUser):
 
     def generate_device_fingerprint(self, user_agent, ip_address):
         """Генерирует отпечаток устройства на основе user-agent и IP"""
-        data = f"{user_agent}_{ip_address}_{self.email}"
-        return hashlib.sha256(data.encode()).hexdigest()
+        from .identity import device_fingerprint
+        return device_fingerprint(user_agent, ip_address, self.email)
 
     def is_device_allowed(self, user_agent, ip_address):
         """Проверяет, разрешено ли устройство для этого пользователя"""
@@ -269,35 +267,14 @@ class User(AbstractUser):
         self.device_fingerprint = self.generate_device_fingerprint(user_agent, ip_address)
         self.last_login_ip = ip_address
         self.save(update_fields=['device_fingerprint', 'last_login_ip'])
+        
+        from .identity import invalidate_telegram_identity
+        invalidate_telegram_identity(self)
     
     def get_accessible_projects(self):
         """Получить все доступные пользователю проекты"""
-        from projects.models import Project
-        from django.db.models import Q
-        
-        # Получаем проекты через ключи доступа для всех ролей
-        access_keys = ProjectAccessKey.objects.filter(
-            assigned_to=self,
-            is_active=True
-        ).values_list('project_id', flat=True)
-        
-        if self.is_admin_role():
-            # Администраторы видят все проекты + проекты через ключи доступа
-            return Project.objects.filter(
-                Q(is_active=True) | Q(id__in=access_keys)
-            ).distinct()
-        elif self.is_foreman_role():
-            # Прорабы видят свои проекты + проекты через ключи доступа
-            return Project.objects.filter(
-                Q(created_by=self) | Q(foreman=self) | Q(id__in=access_keys),
-                is_active=True
-            ).distinct()
-        else:
-            # Остальные роли видят только проекты через ключи доступа
-            return Project.objects.filter(
-                id__in=access_keys,
-                is_active=True
-            ).distinct()
+        from projects.access import accessible_projects
+        return accessible_projects(self)
 
 
 class UserSession(models.Model):
@@ -324,11 +301,35 @@ class UserSession(models.Model):
         return f"Сессия {self.user.email}"
 
 
+class ProjectAccessKeyQuerySet(models.QuerySet):
+    """Выборки ключей доступа"""
+
+    def valid(self, now=None):
+        """Активные и не истекшие ключи (проверка срока выполняется в SQL)"""
+        now = now or timezone.now()
+        return self.filter(is_active=True).filter(
+            models.Q(expires_at__isnull=True) | models.Q(expires_at__gt=now)
+        )
+
+    def expired(self, now=None):
+        """Активные ключи с истекшим сроком"""
+        now = now or timezone.now()
+        return self.filter(is_active=True, expires_at__lte=now)
+
+
 class ProjectAccessKey(models.Model):
     """Модель для ключей доступа к проектам"""
     
     key = models.UUIDField(_('Ключ доступа'), default=uuid.uuid4, unique=True)
-    project_id = models.UUIDField(_('ID проекта'))
+    # Без ограничения в БД: исторически ключи могут ссылаться на удаленные проекты
+    project = models.ForeignKey(
+        'projects.Project',
+        on_delete=models.CASCADE,
+        verbose_name=_('Проект'),
+        related_name='access_keys',
+        db_constraint=False,
+        db_index=False
+    )
     created_by = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -349,12 +350,34 @@ class ProjectAccessKey(models.Model):
     created_at = models.DateTimeField(_('Создан'), auto_now_add=True)
     used_at = models.DateTimeField(_('Использован'), blank=True, null=True)
 
+    objects = ProjectAccessKeyQuerySet.as_manager()
+
     class Meta:
         verbose_name = _('Ключ доступа к проекту')
         verbose_name_plural = _('Ключи доступа к проектам')
         db_table = 'project_access_keys'
         # Убираем unique_together чтобы можно было создавать несколько ключей
         # но логика в коде будет контролировать активные ключи
+        indexes = [
+            # Проверка доступа пользователя: только активные ключи
+            models.Index(
+                fields=['assigned_to', 'project', 'expires_at'],
+                condition=models.Q(is_active=True),
+                name='access_key_active_user_idx'
+            ),
+            # Ключи проекта (участники, выдача ключей)
+            models.Index(
+                fields=['project', 'assigned_to'],
+                condition=models.Q(is_active=True),
+                name='access_key_active_proj_idx'
+            ),
+            # Поиск истекших ключей для expire_access_keys
+            models.Index(
+                fields=['expires_at'],
+                condition=models.Q(is_active=True, expires_at__isnull=False),
+                name='access_key_expiry_idx'
+            ),
+        ]
 
     def __str__(self):
         try:
@@ -367,8 +390,18 @@ class ProjectAccessKey(models.Model):
             logger.error(f"Ошибка при получении проекта для ключа {self.key}: {e}")
             return f"Ключ доступа {str(self.key)[:8]}... (ошибка)"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем владельца ключа, чтобы сбросить его кэш доступа при переназначении
+        instance._loaded_assigned_to_id = instance.__dict__.get('assigned_to_id')
+        return instance
+
     def is_valid(self):
-        """Проверяет, действителен ли ключ"""
+        """
+        Проверяет, действителен ли ключ уже загруженного объекта.
+        Для выборок используйте ProjectAccessKey.objects.valid().
+        """
         if not self.is_active:
             return False
         
@@ -653,4 +686,7 @@ class TelegramAuthToken(models.Model):
         self.user = user
         self.telegram_user = telegram_user
         self.is_used = True
-        self.save()
\ No newline at end of file
+        self.save()
+        
+        from .telegram_auth_events import notify_token_used
+        notify_token_used(self)
\ No newline at end of file
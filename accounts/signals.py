@@ -0,0 +1,80 @@
+"""
+Сигналы аккаунтов
+"""
+
+import logging
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .activity import forget_session_record
+from .identity import invalidate_telegram_identity
+from .models import TelegramUser, User, UserSession
+
+logger = logging.getLogger(__name__)
+
+# ip_address в UserSession обязателен; без REMOTE_ADDR (unix-сокет, прокси)
+# сессия все равно создается
+UNKNOWN_CLIENT_IP = '0.0.0.0'
+
+
+@receiver(post_save, sender=UserSession)
+@receiver(post_delete, sender=UserSession)
+def user_session_changed(sender, instance, **kwargs):
+    """Сессия создана заново или удалена - запись в кэше устарела"""
+    forget_session_record(instance.user_id)
+
+
+@receiver(post_save, sender=TelegramUser)
+@receiver(post_delete, sender=TelegramUser)
+def telegram_user_changed(sender, instance, **kwargs):
+    """Привязка или отвязка Telegram - снимок идентичности устарел"""
+    user = instance.user if TelegramUser.user.is_cached(instance) else instance.user_id
+    invalidate_telegram_identity(user)
+
+
+@receiver(post_save, sender=User)
+def user_role_changed(sender, instance, update_fields=None, **kwargs):
+    """Смена роли или отпечатка устройства - снимок идентичности устарел"""
+    if update_fields is None or {'role', 'device_fingerprint'} & set(update_fields):
+        invalidate_telegram_identity(instance)
+
+
+@receiver(user_logged_in)
+def user_logged_in_session(sender, request, user, **kwargs):
+    """
+    При входе (по паролю или через Telegram) UserSession указывает на новую
+    сессию; при SESSION_ENFORCEMENT прежняя сессия Django удаляется
+    (единственная активная сессия)
+    """
+    session_key = request.session.session_key if request is not None else None
+    if not session_key:
+        return
+
+    from .middleware import get_client_ip
+
+    if getattr(settings, 'SESSION_ENFORCEMENT', False):
+        previous_keys = UserSession.objects.filter(user=user).exclude(
+            session_key=session_key
+        ).values_list('session_key', flat=True)
+        engine = import_module(settings.SESSION_ENGINE)
+        for previous_key in previous_keys:
+            engine.SessionStore(session_key=previous_key).delete()
+
+    UserSession.objects.filter(user=user).delete()
+    try:
+        # Точка сохранения: ошибка записи не ломает транзакцию входа
+        with transaction.atomic():
+            UserSession.objects.create(
+                user=user,
+                session_key=session_key,
+                device_info=request.META.get('HTTP_USER_AGENT', ''),
+                ip_address=get_client_ip(request) or UNKNOWN_CLIENT_IP
+            )
+    except Exception as e:
+        # Вход не должен падать из-за учета сессий, просто логируем
+        logger.error(f"Error creating UserSession: {e}")
@@ -0,0 +1,87 @@
+"""
+Уведомления о входе по QR-коду Telegram
+
+Когда бот отмечает TelegramAuthToken использованным, результат входа
+записывается в общий кэш и публикуется в канал брокера событий. Страница
+входа ждет результата long-poll запросом к telegram_auth_status: в своем
+процессе ответ приходит сразу через брокер, а из процесса бота - при
+очередной проверке кэша (раз в CHECK_INTERVAL секунд, без запросов к БД).
+"""
+
+import asyncio
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from kanban.live_events import get_broker
+
+# Максимальное время удержания long-poll запроса (секунды)
+MAX_WAIT = 25
+
+# Период проверки кэша при ожидании (секунды)
+CHECK_INTERVAL = 1
+
+
+def _result_key(token):
+    return f"telegram_auth_result:{token}"
+
+
+def _channel(token):
+    return f"telegram_auth_{token}"
+
+
+def auth_result(auth_token):
+    """Ответ telegram_auth_status для использованного токена"""
+    telegram_user = auth_token.telegram_user
+    return {
+        'status': 'success',
+        'user_id': auth_token.user_id,
+        'username': telegram_user.username if telegram_user else '',
+        'first_name': telegram_user.first_name if telegram_user else '',
+        'token': str(auth_token.token)
+    }
+
+
+def notify_token_used(auth_token):
+    """Сохранить результат входа и разбудить ожидающие запросы"""
+    result = auth_result(auth_token)
+    # Запись живет до истечения токена: после него статус - expired
+    timeout = max(1, int((auth_token.expires_at - timezone.now()).total_seconds()))
+
+    def _notify():
+        cache.set(_result_key(auth_token.token), result, timeout)
+        get_broker().publish(_channel(auth_token.token), {'type': 'auth', 'result': result})
+
+    transaction.on_commit(_notify)
+
+
+async def get_auth_result(token):
+    """Результат входа из кэша или None"""
+    return await cache.aget(_result_key(token))
+
+
+async def wait_for_auth_result(token, timeout):
+    """Ждать результата входа не дольше timeout секунд; None - не дождались"""
+    broker = get_broker()
+    channel = _channel(token)
+    queue = broker.subscribe(channel)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    try:
+        while True:
+            # Результат мог появиться до подписки или в другом процессе
+            result = await get_auth_result(token)
+            if result is not None:
+                return result
+
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=min(CHECK_INTERVAL, remaining))
+                return event['result']
+            except asyncio.TimeoutError:
+                continue
+    finally:
+        broker.unsubscribe(channel, queue)
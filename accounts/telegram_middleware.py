@@ -1,6 +1,8 @@
 
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.shortcuts import redirect
 from django.contrib.auth import logout
+from .identity import get_telegram_identity, is_device_allowed
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,8 +14,13 @@ class TelegramAuthMiddleware:
     Отключает стандартную авторизацию Django
     """
     
+    sync_capable = True
+    async_capable = True
+    
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
         # URL, которые доступны без авторизации
         self.exempt_urls = [
             '/admin/',
@@ -29,54 +36,71 @@ class TelegramAuthMiddleware:
             '/accounts/telegram-qr/',
             '/accounts/telegram-auth-status/',
         ]
+        # URL, для которых не проверяются Telegram ID и устройство
+        self.identity_exempt_prefixes = (
+            '/accounts/telegram-login/',
+            '/accounts/telegram-auth/',
+            '/admin/',
+            '/management/',
+        )
     
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
         # Проверяем, нужно ли проверять авторизацию
         if self.should_check_auth(request):
-            # Проверяем, авторизован ли пользователь
-            if not request.user.is_authenticated:
-                # Если это AJAX запрос, возвращаем JSON ошибку
-                if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                    from django.http import JsonResponse
-                    return JsonResponse({
-                        'error': 'Требуется авторизация через Telegram',
-                        'redirect': '/accounts/telegram-login/'
-                    }, status=401)
-                
-                # Обычный запрос - редиректим на авторизацию
-                return redirect('/accounts/telegram-login/')
+            response = self.check_auth(request)
+            if response is not None:
+                return response
+        
+        response = self.get_response(request)
+        return response
+    
+    async def __acall__(self, request):
+        # Исключенные пути проходят без переключения потоков
+        if self.should_check_auth(request):
+            response = await sync_to_async(self.check_auth)(request)
+            if response is not None:
+                return response
+        return await self.get_response(request)
+    
+    def check_auth(self, request):
+        """Проверка пользователя; возвращает ответ-перенаправление или None"""
+        # Проверяем, авторизован ли пользователь
+        if not request.user.is_authenticated:
+            # Если это AJAX запрос, возвращаем JSON ошибку
+            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                from django.http import JsonResponse
+                return JsonResponse({
+                    'error': 'Требуется авторизация через Telegram',
+                    'redirect': '/accounts/telegram-login/'
+                }, status=401)
+            
+            # Обычный запрос - редиректим на авторизацию
+            return redirect('/accounts/telegram-login/')
+        
+        # Telegram ID и устройство проверяются по одному снимку пользователя
+        if not request.path.startswith(self.identity_exempt_prefixes):
+            identity = get_telegram_identity(request.user)
+            request.telegram_identity = identity
             
             # Проверяем, есть ли у пользователя Telegram ID
-            # Исключаем проверку для URL авторизации
-            if (not request.path.startswith('/accounts/telegram-login/') and 
-                not request.path.startswith('/accounts/telegram-auth/') and
-                not request.path.startswith('/admin/') and
-                not request.path.startswith('/management/') and
-                not request.user.get_telegram_id()):
-                telegram_id = request.user.get_telegram_id()
-                logger.warning(f"Пользователь {request.user.email} не имеет Telegram ID. Полученный ID: {telegram_id}")
+            if not identity.telegram_id:
+                logger.warning(f"Пользователь {request.user.email} не имеет Telegram ID")
                 logout(request)
                 return redirect('/accounts/telegram-login/?error=no_telegram_id')
             
-            # Проверяем привязку устройства для авторизованных пользователей
-            if (not request.path.startswith('/accounts/telegram-login/') and 
-                not request.path.startswith('/accounts/telegram-auth/') and
-                not request.path.startswith('/admin/') and
-                not request.path.startswith('/management/') and
-                request.user.is_authenticated):
-                
-                # Получаем информацию об устройстве
-                user_agent = request.META.get('HTTP_USER_AGENT', '')
-                ip_address = self.get_client_ip(request)
-                
-                # Проверяем, разрешено ли устройство
-                if not request.user.is_device_allowed(user_agent, ip_address):
-                    logger.warning(f"Попытка входа с неразрешенного устройства для пользователя {request.user.email}. IP: {ip_address}")
-                    logout(request)
-                    return redirect('/accounts/telegram-login/?error=device_not_allowed')
+            # Получаем информацию об устройстве
+            user_agent = request.META.get('HTTP_USER_AGENT', '')
+            ip_address = self.get_client_ip(request)
+            
+            # Проверяем, разрешено ли устройство
+            if not is_device_allowed(request.user, user_agent, ip_address):
+                logger.warning(f"Попытка входа с неразрешенного устройства для пользователя {request.user.email}. IP: {ip_address}")
+                logout(request)
+                return redirect('/accounts/telegram-login/?error=device_not_allowed')
         
-        response = self.get_response(request)
-        return response
+        return None
     
     def should_check_auth(self, request):
         """Определяет, нужно ли проверять авторизацию для данного запроса"""
@@ -108,15 +132,28 @@ class TelegramBotMiddleware:
     Middleware для интеграции с Telegram ботом
     """
     
+    sync_capable = True
+    async_capable = True
+    
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
     
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self.add_telegram_info(request)
+        response = self.get_response(request)
+        return response
+    
+    async def __acall__(self, request):
+        await sync_to_async(self.add_telegram_info)(request)
+        return await self.get_response(request)
+    
+    def add_telegram_info(self, request):
         # Добавляем информацию о Telegram в request
         if hasattr(request, 'user') and request.user.is_authenticated:
-            telegram_id = request.user.get_telegram_id()
+            telegram_id = get_telegram_identity(request.user).telegram_id
             request.telegram_id = telegram_id
             request.is_telegram_user = telegram_id is not None
-        
-        response = self.get_response(request)
-        return response
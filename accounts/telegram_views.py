@@ -7,6 +7,7 @@ from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import View
 from django.conf import settings
+from django.core.exceptions import ValidationError
 import logging
 import json
 
@@ -344,38 +345,88 @@ def telegram_qr_code(request):
     return HttpResponse(f'<img src="data:image/png;base64,{image_base64}" style="max-width: 200px; height: auto;">')
 
 
-def telegram_auth_status(request):
-    """Проверка статуса авторизации через Telegram"""
+async def telegram_auth_status(request):
+    """
+    Проверка статуса авторизации через Telegram.
+    С параметром wait (секунды, до MAX_WAIT) под ASGI работает как long-poll:
+    ответ приходит сразу после входа через бота или по истечении ожидания.
+    Под WSGI ожидание заняло бы поток воркера - ответ приходит сразу.
+    """
+    from django.core.handlers.asgi import ASGIRequest
     from django.http import JsonResponse
+    from django.utils import timezone
+    from superpan.async_views import get_session_value
     from .models import TelegramAuthToken
+    from .telegram_auth_events import MAX_WAIT, auth_result, get_auth_result, wait_for_auth_result
     
-    auth_token_str = request.session.get('telegram_auth_token')
+    auth_token_str = await get_session_value(request, 'telegram_auth_token')
     if not auth_token_str:
         return JsonResponse({'status': 'no_token'})
     
+    try:
+        wait = min(max(int(request.GET.get('wait', 0)), 0), MAX_WAIT)
+    except (TypeError, ValueError):
+        wait = 0
+    if not isinstance(request, ASGIRequest):
+        wait = 0
+    
+    # Результат входа уже в кэше - без обращения к БД
+    result = await get_auth_result(auth_token_str)
+    if result is not None:
+        return JsonResponse(result)
+    
     try:
         # Ищем токен в базе данных
-        auth_token = TelegramAuthToken.objects.get(token=auth_token_str)
-        
-        # Проверяем, не истек ли токен
+        auth_token = await TelegramAuthToken.objects.select_related(
+            'user', 'telegram_user'
+        ).aget(token=auth_token_str)
+    except (TelegramAuthToken.DoesNotExist, ValidationError):
+        return JsonResponse({'status': 'invalid_token'})
+    
+    # Проверяем, не истек ли токен
+    if auth_token.is_expired():
+        return JsonResponse({'status': 'expired'})
+    
+    # Проверяем, был ли токен использован
+    if auth_token.is_used and auth_token.user:
+        return JsonResponse(auth_result(auth_token))
+    
+    # Токен еще не использован: ждем входа, но не дольше срока действия токена
+    remaining = (auth_token.expires_at - timezone.now()).total_seconds()
+    if wait and remaining > 0:
+        result = await wait_for_auth_result(auth_token_str, min(wait, remaining))
+        if result is not None:
+            return JsonResponse(result)
         if auth_token.is_expired():
             return JsonResponse({'status': 'expired'})
-        
-        # Проверяем, был ли токен использован
-        if auth_token.is_used and auth_token.user:
-            return JsonResponse({
-                'status': 'success',
-                'user_id': auth_token.user.id,
-                'username': auth_token.telegram_user.username if auth_token.telegram_user else '',
-                'first_name': auth_token.telegram_user.first_name if auth_token.telegram_user else '',
-                'token': str(auth_token.token)
-            })
-        
-        # Токен существует, но еще не использован
-        return JsonResponse({
-            'status': 'pending',
-            'token': str(auth_token.token)
-        })
-        
-    except TelegramAuthToken.DoesNotExist:
-        return JsonResponse({'status': 'invalid_token'})
+    
+    return JsonResponse({
+        'status': 'pending',
+        'token': str(auth_token.token)
+    })
+
+
+def telegram_qr_login(request):
+    """Вход после подтверждения QR-кода в боте (токен из сессии этого браузера)"""
+    from .models import TelegramAuthToken
+    
+    # Токен одноразовый для сессии: повторный переход не авторизует
+    auth_token_str = request.session.pop('telegram_auth_token', None)
+    auth_token = None
+    if auth_token_str:
+        auth_token = TelegramAuthToken.objects.select_related('user').filter(
+            token=auth_token_str,
+            is_used=True,
+            user__isnull=False
+        ).first()
+    
+    if auth_token is None or auth_token.is_expired():
+        messages.error(request, 'QR-код не подтвержден или истек. Попробуйте еще раз.')
+        return redirect('accounts:telegram_login')
+    
+    login(request, auth_token.user)
+    auth_token.user.bind_device(request.META.get('HTTP_USER_AGENT', ''), get_client_ip(request))
+    logger.info(f"Вход по QR-коду: {auth_token.user.email}")
+    
+    messages.success(request, f'Добро пожаловать, {auth_token.user.get_full_name()}!')
+    return redirect('/projects/list/')
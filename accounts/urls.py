@@ -23,4 +23,5 @@ urlpatterns = [
     path('telegram/setup/', telegram_views.telegram_setup, name='telegram_setup'),
     path('telegram/qr/', telegram_views.telegram_qr_code, name='telegram_qr'),
     path('telegram/auth-status/', telegram_views.telegram_auth_status, name='telegram_auth_status'),
+    path('telegram/qr-login/', telegram_views.telegram_qr_login, name='telegram_qr_login'),
 ]
\ No newline at end of file
@@ -73,21 +73,8 @@ class LoginView(View):
                     # Аутентифицируем пользователя
                     login(request, user)
                     
-                    # Создаем или обновляем сессию после логина
-                    UserSession.objects.filter(user=user).delete()  # Удаляем старые сессии
-                    
-                    # Теперь session_key точно существует после login()
-                    if request.session.session_key:
-                        try:
-                            UserSession.objects.create(
-                                user=user,
-                                session_key=request.session.session_key,
-                                device_info=user_agent,
-                                ip_address=ip_address
-                            )
-                        except Exception as e:
-                            # Если все равно ошибка, просто логируем
-                            logger.error(f"Error creating UserSession: {e}")
+                    # Запись UserSession создается обработчиком user_logged_in
+                    # (accounts/signals.py)
                     
                     # Логируем успешный вход
                     LoginAttempt.objects.create(
@@ -152,7 +139,7 @@ def profile_view(request):
         'accessible_projects': accessible_projects.count(),
         'managed_projects': request.user.managed_projects.count() if hasattr(request.user, 'managed_projects') else 0,
         'created_expenses': request.user.created_expense_items.count(),
-        'project_memberships': request.user.assigned_access_keys.filter(is_active=True).count(),
+        'project_memberships': request.user.assigned_access_keys.valid().count(),
         'last_login': request.user.last_login,
         'date_joined': request.user.created_at,
     }
@@ -24,4 +24,5 @@ urlpatterns = [
     path('export/csv/', views.export_csv, name='export_csv'),
     path('devices/', views.device_management, name='device_management'),
     path('devices/reset/<int:user_id>/', views.reset_device_binding, name='reset_device_binding'),
+    path('metrics', views.metrics, name='metrics'),
 ]
@@ -5,6 +5,8 @@ from django.http import JsonResponse, HttpResponse
 from django.utils import timezone
 from django.views.decorators.http import require_http_methods
 from django.db.models import Count, Sum, Q
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
 from datetime import timedelta
 from decimal import Decimal
 import io
@@ -21,6 +23,8 @@ from projects.models import Project, ProjectActivity
 from kanban.models import ExpenseItem, ExpenseCategory
 from accounts.forms import UserRegistrationForm
 from projects.forms import ProjectForm
+from superpan.metrics import render_prometheus
+from superpan.query_budget import query_budget
 
 
 def is_superuser(user):
@@ -462,6 +466,7 @@ def financial_reports(request):
 
 @login_required
 @user_passes_test(is_superuser)
+@query_budget(20)
 def export_excel(request):
     """Экспорт данных в Excel"""
     
@@ -713,6 +718,7 @@ def export_pdf(request):
 
 @login_required
 @user_passes_test(is_superuser)
+@query_budget(20)
 def export_csv(request):
     """Экспорт данных в CSV"""
     
@@ -952,3 +958,14 @@ def telegram_unlink(request, pk):
     
     return redirect('admin_panel:users_list')
 
+
+def metrics(request):
+    """Метрики запросов в текстовом формате Prometheus"""
+    token = settings.METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if not is_superuser(request.user) and not (
+        token and constant_time_compare(authorization, f'Bearer {token}')
+    ):
+        return HttpResponse(status=403)
+    
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -2,9 +2,11 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
-from django.db.models import Count, Case, When, IntegerField
 from projects.models import Project
+from projects.access import get_project_access
 from kanban.models import ExpenseItem
+from kanban.board_snapshot import get_or_create_board, build_board_snapshot
+from kanban.project_stats import get_project_stats
 from warehouse.models import WarehouseItem
 
 User = get_user_model()
@@ -42,26 +44,29 @@ class ProjectViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return Project.objects.filter(
-            members__user=self.request.user,
-            members__is_active=True
-        ).distinct()
+        return Project.objects.filter(id__in=get_project_access(self.request.user).member)
     
     @action(detail=True, methods=['get'])
     def stats(self, request, pk=None):
         """Статистика проекта"""
         project = self.get_object()
         
-        # Оптимизированный запрос с агрегацией
+        # Сводная статистика читается одной строкой ProjectStats
+        stats = get_project_stats(project.id)
         
-        stats = project.expense_items.aggregate(
-            total_tasks=Count('id'),
-            completed_tasks=Count(Case(When(status='done', then=1), output_field=IntegerField())),
-            in_progress_tasks=Count(Case(When(status='in_progress', then=1), output_field=IntegerField())),
-            pending_tasks=Count(Case(When(status='todo', then=1), output_field=IntegerField())),
-        )
-        
-        return Response(stats)
+        return Response({
+            'total_tasks': stats['total_count'],
+            'completed_tasks': stats['completed_count'],
+            'in_progress_tasks': stats['in_progress_count'],
+            'pending_tasks': stats['todo_count'],
+        })
+    
+    @action(detail=True, methods=['get'])
+    def board(self, request, pk=None):
+        """Снимок канбан-доски проекта"""
+        project = self.get_object()
+        board = get_or_create_board(project, request.user)
+        return Response(build_board_snapshot(board))
 
 
 class TaskViewSet(viewsets.ModelViewSet):
@@ -70,10 +75,7 @@ class TaskViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return ExpenseItem.objects.filter(
-            project__members__user=self.request.user,
-            project__members__is_active=True
-        ).distinct()
+        return ExpenseItem.objects.filter(project_id__in=get_project_access(self.request.user).member)
     
     @action(detail=True, methods=['post'])
     def move(self, request, pk=None):
@@ -6,7 +6,6 @@
 
 import os
 import sys
-import shutil
 import sqlite3
 import datetime
 import json
@@ -19,6 +18,8 @@ django.setup()
 
 from django.conf import settings
 
+from accounts.management.commands.backup_db import copy_sqlite_database
+
 
 class DatabaseBackupManager:
     """Менеджер резервного копирования базы данных"""
@@ -37,8 +38,8 @@ class DatabaseBackupManager:
             
             print(f"[BACKUP] Создание резервной копии: {backup_filename}")
             
-            # Копируем файл базы данных
-            shutil.copy2(self.db_path, backup_path)
+            # Копируем базу данных
+            copy_sqlite_database(self.db_path, backup_path)
             
             # Создаем метаданные резервной копии
             metadata = {
@@ -77,7 +78,7 @@ class DatabaseBackupManager:
             current_backup = self.create_backup("before_restore")
             
             # Восстанавливаем базу данных
-            shutil.copy2(backup_path, self.db_path)
+            copy_sqlite_database(backup_path, self.db_path)
             
             print(f"[OK] База данных восстановлена из: {backup_path}")
             print(f"[INFO] Текущая БД сохранена как: {current_backup}")
@@ -6,6 +6,8 @@
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5 МБ
 MAX_JSON_SIZE = 10 * 1024  # 10 КБ для JSON запросов
 MAX_JSON_MOVE_SIZE = 5 * 1024  # 5 КБ для перемещения элементов
+MAX_JSON_BULK_MOVE_SIZE = 64 * 1024  # 64 КБ для пакетного перемещения
+MAX_BULK_MOVE_ITEMS = 200
 
 # Лимиты безопасности
 MAX_LOGIN_ATTEMPTS = 5
@@ -23,6 +25,7 @@ RATE_LIMIT_ACCESS_KEY = '20/h'
 RATE_LIMIT_RESET_DEVICE = '10/h'
 RATE_LIMIT_CREATE_EXPENSE = '30/h'
 RATE_LIMIT_MOVE_EXPENSE = '60/h'
+RATE_LIMIT_BULK_MOVE_EXPENSE = '30/h'
 RATE_LIMIT_GENERATE_KEY = '10/h'
 
 # Пагинация
@@ -253,6 +253,9 @@ sudo -u superpan crontab << EOF
 
 # Очистка старых бэкапов каждую неделю
 0 3 * * 0 cd /opt/superpan && ./venv/bin/python manage.py backup_db cleanup --keep 10 --auto
+
+# Сверка потраченных сумм проектов с выполненными задачами каждую ночь
+30 1 * * * cd /opt/superpan && ./venv/bin/python manage.py verify_spent_amounts --fix
 EOF
 
 # Запуск сервисов
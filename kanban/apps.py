@@ -5,3 +5,6 @@ class KanbanConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'kanban'
     verbose_name = 'Канбан-доска расходов'
+
+    def ready(self):
+        from . import signals  # noqa: F401
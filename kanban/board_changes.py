@@ -0,0 +1,90 @@
+"""
+Ревизии канбан-доски и инкрементальные обновления
+
+Каждое изменение карточек увеличивает ревизию доски и пишет строку
+в журнал BoardChange. Клиент передает последнюю известную ревизию и
+получает только карточки, измененные после нее.
+"""
+
+from django.db import transaction
+from django.db.models import F
+
+from .board_snapshot import build_cards, fetch_card_rows
+from .models import BoardChange, KanbanBoard
+
+# Если изменений больше, клиенту выгоднее перезагрузить доску целиком
+DELTA_MAX_CHANGES = 500
+
+
+def record_board_changes(board_id, changes):
+    """
+    Записать изменения карточек одной ревизией доски.
+    changes - список пар (item_id, change_type). Возвращает новую ревизию.
+    """
+    if not changes:
+        return None
+
+    with transaction.atomic():
+        KanbanBoard.objects.filter(pk=board_id).update(revision=F('revision') + 1)
+        revision = KanbanBoard.objects.filter(pk=board_id).values_list('revision', flat=True).first()
+        if revision is None:
+            return None
+
+        BoardChange.objects.bulk_create([
+            BoardChange(
+                board_id=board_id,
+                revision=revision,
+                item_id=item_id,
+                change_type=change_type
+            )
+            for item_id, change_type in changes
+        ])
+
+    return revision
+
+
+def record_board_change(board_id, item_id, change_type):
+    """Записать изменение одной карточки"""
+    return record_board_changes(board_id, [(item_id, change_type)])
+
+
+def build_board_delta(board, since):
+    """
+    Изменения доски после ревизии since.
+    Если журнал не покрывает запрошенный диапазон, возвращает reset=True,
+    и клиент должен загрузить доску целиком.
+    """
+    revision = board.revision
+    delta = {'revision': revision, 'reset': False, 'cards': [], 'deleted': []}
+
+    if since >= revision:
+        return delta
+
+    changes = list(
+        board.changes.filter(revision__gt=since, revision__lte=revision)
+        .order_by('revision', 'id')
+        .values_list('revision', 'item_id', 'change_type')[:DELTA_MAX_CHANGES + 1]
+    )
+
+    # Журнал очищен или изменений слишком много - нужна полная перезагрузка
+    if not changes or changes[0][0] != since + 1 or len(changes) > DELTA_MAX_CHANGES:
+        delta['reset'] = True
+        return delta
+
+    last_change = {}
+    for _revision, item_id, change_type in changes:
+        last_change[item_id] = change_type
+
+    deleted = [item_id for item_id, change_type in last_change.items()
+               if change_type == BoardChange.ChangeType.DELETED]
+    changed = [item_id for item_id, change_type in last_change.items()
+               if change_type != BoardChange.ChangeType.DELETED]
+
+    if changed:
+        delta['cards'] = build_cards(fetch_card_rows(board.project_id, item_ids=changed))
+
+    # Карточка могла быть удалена без записи в журнал (каскадом)
+    found = {card['id'] for card in delta['cards']}
+    delta['deleted'] = deleted + [item_id for item_id in changed if item_id not in found]
+
+    return delta
@@ -0,0 +1,178 @@
+"""
+Снимок канбан-доски проекта
+
+Собирает всю доску (колонки, карточки, статистику) за фиксированное
+число запросов. Используется HTML-доской, REST API и Telegram ботом.
+"""
+
+from decimal import Decimal
+
+from django.db.models import Exists, OuterRef
+from django.db.models.functions import Substr
+
+from .models import ExpenseItem, KanbanBoard, KanbanColumn, StatusChangeRequest
+
+# Стандартные колонки новой доски: (название, тип, позиция, цвет)
+DEFAULT_COLUMNS = [
+    ('Новые', 'new', 0, '#f8f9fa'),
+    ('К выполнению', 'todo', 1, '#e3f2fd'),
+    ('В работе', 'in_progress', 2, '#fff3cd'),
+    ('На проверке', 'review', 3, '#d1edff'),
+    ('Выполнены', 'done', 4, '#d4edda'),
+    ('Отменены', 'cancelled', 5, '#f8d7da'),
+]
+
+# Шаблон карточки обрезает описание до 100 символов
+CARD_DESCRIPTION_LENGTH = 101
+
+COLUMN_FIELDS = ('id', 'name', 'column_type', 'position', 'color')
+
+CARD_FIELDS = (
+    'id', 'column_id', 'title', 'task_type', 'priority', 'status',
+    'estimated_hours', 'amount', 'due_date', 'position', 'created_at',
+    'category__color', 'created_by__first_name', 'created_by__last_name',
+    'created_by__email',
+)
+
+
+def get_or_create_board(project, user):
+    """Получить доску проекта, создав ее со стандартными колонками при необходимости"""
+    board, created = KanbanBoard.objects.get_or_create(
+        project=project,
+        defaults={'created_by': user}
+    )
+
+    if created:
+        KanbanColumn.objects.bulk_create([
+            KanbanColumn(
+                board=board,
+                name=name,
+                column_type=column_type,
+                position=position,
+                color=color
+            )
+            for name, column_type, position, color in DEFAULT_COLUMNS
+        ])
+
+    return board
+
+
+def _initials(row):
+    """Инициалы автора карточки (как в шаблоне доски)"""
+    first = (row['created_by__first_name'] or row['created_by__email'] or '')[:1].upper()
+    last = (row['created_by__last_name'] or '')[:1]
+    return f"{first}{last}"
+
+
+def _build_card(row, task_type_labels, priority_labels):
+    """Преобразовать строку values() в карточку доски"""
+    return {
+        'id': row['id'],
+        'column_id': row['column_id'],
+        'title': row['title'],
+        'description': row['short_description'],
+        'task_type': row['task_type'],
+        'task_type_display': str(task_type_labels.get(row['task_type'], row['task_type'])),
+        'priority': row['priority'],
+        'priority_display': str(priority_labels.get(row['priority'], row['priority'])),
+        'status': row['status'],
+        'estimated_hours': row['estimated_hours'],
+        'amount': row['amount'],
+        'due_date': row['due_date'],
+        'position': row['position'],
+        'category_color': row['category__color'],
+        'created_by_initials': _initials(row),
+        'has_pending_status_change': row['has_pending_status_change'],
+    }
+
+
+def build_board_stats(rows):
+    """Статистика доски по уже загруженным строкам карточек"""
+    stats = {
+        'total_count': 0,
+        'completed_count': 0,
+        'in_progress_count': 0,
+        'new_count': 0,
+        'todo_count': 0,
+        'total_hours': Decimal('0.00'),
+        'completed_hours': Decimal('0.00'),
+        'total_amount': Decimal('0.00'),
+    }
+
+    for row in rows:
+        stats['total_count'] += 1
+        stats['total_hours'] += row['estimated_hours']
+        stats['total_amount'] += row['amount']
+        if row['status'] == 'done':
+            stats['completed_count'] += 1
+            stats['completed_hours'] += row['estimated_hours']
+        elif row['status'] == 'in_progress':
+            stats['in_progress_count'] += 1
+        elif row['status'] == 'new':
+            stats['new_count'] += 1
+        elif row['status'] == 'todo':
+            stats['todo_count'] += 1
+
+    if stats['total_count'] > 0:
+        stats['completion_percent'] = (stats['completed_count'] / stats['total_count']) * 100
+    else:
+        stats['completion_percent'] = 0
+
+    return stats
+
+
+def fetch_card_rows(project_id, item_ids=None):
+    """Строки карточек проекта (только поля, нужные шаблону карточки)"""
+    pending_requests = StatusChangeRequest.objects.filter(
+        expense_item=OuterRef('pk'),
+        status=StatusChangeRequest.Status.PENDING
+    )
+    queryset = ExpenseItem.objects.filter(project_id=project_id)
+    if item_ids is not None:
+        queryset = queryset.filter(id__in=item_ids)
+
+    return list(
+        queryset.annotate(
+            short_description=Substr('description', 1, CARD_DESCRIPTION_LENGTH),
+            has_pending_status_change=Exists(pending_requests),
+        )
+        .order_by('position', '-created_at')
+        .values(*CARD_FIELDS, 'short_description', 'has_pending_status_change')
+    )
+
+
+def build_cards(rows):
+    """Преобразовать строки карточек в словари для шаблона и JSON"""
+    task_type_labels = dict(ExpenseItem.TaskType.choices)
+    priority_labels = dict(ExpenseItem._meta.get_field('priority').choices)
+    return [_build_card(row, task_type_labels, priority_labels) for row in rows]
+
+
+def build_board_snapshot(board):
+    """
+    Построить снимок доски: колонки с карточками и статистику.
+    Выполняет ровно два запроса независимо от количества карточек.
+    """
+    columns = [
+        dict(column, items=[])
+        for column in board.columns.filter(is_active=True).order_by('position').values(*COLUMN_FIELDS)
+    ]
+    columns_by_id = {column['id']: column for column in columns}
+
+    rows = fetch_card_rows(board.project_id)
+
+    for card in build_cards(rows):
+        column = columns_by_id.get(card['column_id'])
+        if column is not None:
+            column['items'].append(card)
+
+    for column in columns:
+        column['item_count'] = len(column['items'])
+
+    return {
+        'board_id': board.id,
+        'project_id': board.project_id,
+        'revision': board.revision,
+        'columns': columns,
+        'stats': build_board_stats(rows),
+    }
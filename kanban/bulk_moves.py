@@ -0,0 +1,167 @@
+"""
+Пакетное перемещение карточек канбан-доски
+
+Применяет N перемещений карточек за фиксированное число запросов:
+доступ проверяется один раз на проект, карточки обновляются через
+bulk_update, история пишется через bulk_create.
+"""
+
+import uuid
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .board_changes import record_board_changes
+from .live_events import publish_board_event
+from .models import BoardChange, ExpenseHistory, ExpenseItem, KanbanColumn
+from .ordering import rank_between, rebalance_column
+from .project_stats import apply_stats_changes, lock_stats_states, updated_state
+
+
+def _parse_move(move):
+    """Проверить одно перемещение; возвращает (item_id, column_id) или None"""
+    if not isinstance(move, dict):
+        return None
+    try:
+        return uuid.UUID(str(move.get('item_id'))), int(move.get('target_column_id'))
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def _rebalance_for_append(column_id, moved_items):
+    """
+    В конце колонки нет места: перенумеровать ее и заново расставить
+    карточки пакета, уже перемещенные в нее. Возвращает позицию следующей.
+    """
+    rebalance_column(column_id)
+    batch = [item for item in moved_items if item.column_id == column_id]
+    last = (
+        ExpenseItem.objects.filter(column_id=column_id)
+        .exclude(pk__in=[item.pk for item in batch])
+        .aggregate(last=Max('position'))['last']
+    )
+    for item in batch:
+        last = rank_between(last, None)
+        item.position = last
+    return rank_between(last, None)
+
+
+def apply_bulk_moves(user, moves):
+    """
+    Переместить карточки по списку {'item_id', 'target_column_id'}.
+    Карточки ставятся в конец целевой колонки в порядке списка.
+    Возвращает результаты в порядке входных данных.
+    """
+    results = [
+        {'item_id': move.get('item_id') if isinstance(move, dict) else None, 'success': False}
+        for move in moves
+    ]
+    parsed = [_parse_move(move) for move in moves]
+
+    items = ExpenseItem.objects.select_related('project', 'column').in_bulk(
+        {move[0] for move in parsed if move}
+    )
+    columns = KanbanColumn.objects.select_related('board').in_bulk(
+        {move[1] for move in parsed if move}
+    )
+
+    access_by_project = {}
+    accepted = []
+    seen = set()
+    for result, move in zip(results, parsed):
+        if move is None:
+            result['error'] = 'Некорректные данные'
+            continue
+
+        item_id, column_id = move
+        item = items.get(item_id)
+        column = columns.get(column_id)
+        if item is None:
+            result['error'] = 'Элемент не найден'
+            continue
+        if column is None or column.board.project_id != item.project_id:
+            result['error'] = 'Колонка не найдена'
+            continue
+        if item_id in seen:
+            result['error'] = 'Элемент указан несколько раз'
+            continue
+
+        project = item.project
+        if project.id not in access_by_project:
+            access_by_project[project.id] = project.can_user_access(user)
+        if not access_by_project[project.id]:
+            result['error'] = 'Недостаточно прав'
+            continue
+        if not item.can_user_change_status(user):
+            result['error'] = 'Требуется запрос на изменение статуса'
+            continue
+
+        seen.add(item_id)
+        accepted.append((result, item, column))
+
+    if not accepted:
+        return results
+
+    with transaction.atomic():
+        # Состояния для статистики читаются под блокировкой строк
+        stored_states = lock_stats_states([item.id for _, item, _ in accepted])
+        last_positions = dict(
+            ExpenseItem.objects.filter(column_id__in={column.id for _, _, column in accepted})
+            .order_by()
+            .values('column_id')
+            .annotate(last=Max('position'))
+            .values_list('column_id', 'last')
+        )
+
+        now = timezone.now()
+        moved_items = []
+        history = []
+        changes_by_board = {}
+        for result, item, column in accepted:
+            old_column = item.column
+            position = rank_between(last_positions.get(column.id), None)
+            if position is None:
+                position = _rebalance_for_append(column.id, moved_items)
+            last_positions[column.id] = position
+
+            item.column = column
+            item.position = position
+            item.status = column.column_type
+            item.updated_at = now
+            moved_items.append(item)
+
+            history.append(ExpenseHistory(
+                expense_item=item,
+                user=user,
+                action='moved',
+                old_value=f"Колонка: {old_column.name}",
+                new_value=f"Колонка: {column.name}",
+                field_name='column'
+            ))
+            changes_by_board.setdefault(column.board_id, []).append(
+                (item.id, BoardChange.ChangeType.MOVED)
+            )
+
+            result.update(success=True, column_id=column.id, status=item.status)
+            publish_board_event(
+                item.project_id, 'moved',
+                item_id=item.id,
+                column_id=column.id,
+                status=item.status
+            )
+
+        ExpenseItem.objects.bulk_update(
+            moved_items, ['column', 'position', 'status', 'updated_at'], batch_size=500
+        )
+        ExpenseHistory.objects.bulk_create(history, batch_size=500)
+
+        # bulk_update не вызывает сигналы, журнал доски и статистику обновляем явно
+        for board_id, changes in changes_by_board.items():
+            record_board_changes(board_id, changes)
+        apply_stats_changes([
+            (stored_states.get(item.id), updated_state(stored_states.get(item.id), status=item.status))
+            for item in moved_items
+        ])
+
+    return results
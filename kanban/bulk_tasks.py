@@ -0,0 +1,146 @@
+"""
+Пакетное создание задач (список задач из одного сообщения бота)
+
+N задач создаются за фиксированное число запросов: первая колонка доски
+проекта кэшируется в процессе (сбрасывается сигналами KanbanColumn, а в
+других процессах - по истечении ENTRY_COLUMN_TTL), задачи, история и
+активность проекта пишутся через bulk_create в одной транзакции. bulk_create не вызывает
+сигналы, поэтому журнал доски и статистика обновляются явно.
+"""
+
+import time
+from collections import namedtuple
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+
+from projects.models import ProjectActivity
+
+from .board_changes import record_board_changes
+from .board_snapshot import DEFAULT_COLUMNS, get_or_create_board
+from .live_events import publish_board_event
+from .models import BoardChange, ExpenseHistory, ExpenseItem, KanbanColumn
+from .ordering import positions_for_top
+from .project_stats import apply_stats_changes
+
+CENTS = Decimal('0.01')
+
+EntryColumn = namedtuple('EntryColumn', ['id', 'board_id', 'column_type'])
+
+# Время жизни записи кэша колонок (секунды): правка колонок в другом
+# процессе (веб-приложение) видна боту не позже, чем через это время
+ENTRY_COLUMN_TTL = 60
+
+# project_id -> (EntryColumn, момент истечения по time.monotonic):
+# колонка, в которую попадают новые задачи
+_entry_columns = {}
+
+
+def _load_entry_column(project, user):
+    columns = KanbanColumn.objects.filter(board__project=project).order_by('position')
+    row = columns.values_list('id', 'board_id', 'column_type').first()
+    if row is None:
+        board = get_or_create_board(project, user)
+        row = columns.values_list('id', 'board_id', 'column_type').first()
+        if row is None:
+            # Доска есть, но колонки удалены
+            name, column_type, position, color = DEFAULT_COLUMNS[0]
+            column = KanbanColumn.objects.create(
+                board=board,
+                name=name,
+                column_type=column_type,
+                position=position,
+                color=color
+            )
+            row = (column.id, board.id, column.column_type)
+    return EntryColumn(*row)
+
+
+def get_entry_column(project, user):
+    """Первая колонка доски проекта (кэш процесса)"""
+    entry = _entry_columns.get(project.id)
+    if entry is not None and entry[1] > time.monotonic():
+        return entry[0]
+    column = _load_entry_column(project, user)
+    _entry_columns[project.id] = (column, time.monotonic() + ENTRY_COLUMN_TTL)
+    return column
+
+
+def forget_entry_column(project_id):
+    _entry_columns.pop(project_id, None)
+
+
+def forget_board_entry_columns(board_id):
+    """Сбросить записи проектов доски (колонки добавлены, изменены или удалены)"""
+    for project_id, (column, _expires_at) in list(_entry_columns.items()):
+        if column.board_id == board_id:
+            _entry_columns.pop(project_id, None)
+
+
+def _create(user, project, column, tasks):
+    with transaction.atomic():
+        positions = positions_for_top(column.id, len(tasks))
+        items = [
+            ExpenseItem(
+                project=project,
+                column_id=column.id,
+                position=position,
+                title=task['title'],
+                description=task['description'],
+                # Значение как после сохранения: статистика считается по объекту
+                amount=Decimal(str(task['amount'] or 0)).quantize(CENTS),
+                created_by=user,
+                # Как и ExpenseItem.save(): статус следует типу колонки
+                status=column.column_type
+            )
+            for task, position in zip(tasks, positions)
+        ]
+        ExpenseItem.objects.bulk_create(items, batch_size=500)
+
+        ExpenseHistory.objects.bulk_create([
+            ExpenseHistory(
+                expense_item=item,
+                user=user,
+                action='created',
+                new_value=f"Создан элемент расхода на сумму {item.amount} ₽"
+            )
+            for item in items
+        ], batch_size=500)
+        ProjectActivity.objects.bulk_create([
+            ProjectActivity(
+                project=project,
+                user=user,
+                activity_type=ProjectActivity.ActivityType.EXPENSE_ADDED,
+                description=f'Добавлен расход "{item.title}" на сумму {item.amount} ₽'
+            )
+            for item in items
+        ], batch_size=500)
+
+        # bulk_create не вызывает сигналы, журнал доски и статистику обновляем явно
+        record_board_changes(
+            column.board_id,
+            [(item.id, BoardChange.ChangeType.CREATED) for item in items]
+        )
+        apply_stats_changes([(None, item.get_stats_state()) for item in items])
+
+        for item in items:
+            publish_board_event(project.id, 'created', item_id=item.id, column_id=column.id)
+
+    return items
+
+
+def create_tasks(user, project, tasks):
+    """
+    Создать задачи в начале первой колонки доски проекта.
+    tasks - словари {'title', 'description', 'amount'} в порядке сообщения.
+    Возвращает созданные задачи.
+    """
+    if not tasks:
+        return []
+
+    try:
+        return _create(user, project, get_entry_column(project, user), tasks)
+    except (IntegrityError, KanbanColumn.DoesNotExist):
+        # Колонку удалили после того, как она попала в кэш
+        forget_entry_column(project.id)
+        return _create(user, project, get_entry_column(project, user), tasks)
@@ -0,0 +1,144 @@
+"""
+Живые события канбан-доски
+
+Публикация событий карточек (создание, перемещение, удаление, утверждение
+статуса, комментарии) подписанным браузерам через server-sent events.
+События не хранятся: пропущенные при переподключении клиент догоняет
+через board_delta.
+Бэкенд pub/sub подключаемый: KANBAN_EVENTS_BACKEND в settings.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = 'kanban.live_events.InProcessBroker'
+
+# Размер очереди одного подписчика; медленный клиент теряет старые события
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class InProcessBroker:
+    """
+    Pub/sub в пределах одного процесса.
+    Публикация возможна из любого потока, доставка - в event loop подписчика.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def publish(self, channel, event):
+        """Разослать событие всем подписчикам канала"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, event)
+            except RuntimeError:
+                # Event loop подписчика уже закрыт
+                pass
+
+    @staticmethod
+    def _deliver(queue, event):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(event)
+
+    def subscribe(self, channel):
+        """Подписаться на канал; возвращает очередь событий"""
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, channel, queue):
+        """Отписаться от канала"""
+        with self._lock:
+            subscribers = self._subscribers.get(channel)
+            if not subscribers:
+                return
+            subscribers.difference_update({item for item in subscribers if item[1] is queue})
+            if not subscribers:
+                del self._subscribers[channel]
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Экземпляр брокера, заданного в настройках"""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                backend = getattr(settings, 'KANBAN_EVENTS_BACKEND', DEFAULT_BACKEND)
+                _broker = import_string(backend)()
+    return _broker
+
+
+def board_channel(project_id):
+    """Имя канала доски проекта"""
+    return f"kanban_board_{project_id}"
+
+
+def publish_board_event(project_id, event_type, **data):
+    """Опубликовать событие доски после фиксации транзакции"""
+    event = dict(data, type=event_type)
+
+    def _publish():
+        try:
+            get_broker().publish(board_channel(project_id), event)
+        except Exception as e:
+            logger.error(f"Ошибка публикации события доски: {e}")
+
+    transaction.on_commit(_publish)
+
+
+def format_sse(event):
+    """Сериализовать событие в формат text/event-stream"""
+    payload = json.dumps(event, cls=DjangoJSONEncoder, ensure_ascii=False)
+    return f"event: {event['type']}\ndata: {payload}\n\n"
+
+
+async def board_event_stream(project_id, keepalive=None, max_lifetime=None):
+    """
+    Асинхронный поток SSE для доски проекта.
+    Django не отменяет потоковый ответ при обрыве соединения, поэтому поток
+    завершается через max_lifetime секунд - клиент переподключается сам.
+    """
+    if keepalive is None:
+        keepalive = getattr(settings, 'KANBAN_EVENTS_KEEPALIVE', 15)
+    if max_lifetime is None:
+        max_lifetime = getattr(settings, 'KANBAN_EVENTS_MAX_LIFETIME', 300)
+
+    channel = board_channel(project_id)
+    broker = get_broker()
+    queue = broker.subscribe(channel)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_lifetime
+    try:
+        # Клиент переподключается через 5 секунд после обрыва
+        yield "retry: 5000\n\n"
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=min(keepalive, remaining))
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield format_sse(event)
+    finally:
+        broker.unsubscribe(channel, queue)
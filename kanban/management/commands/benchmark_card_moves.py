@@ -0,0 +1,134 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from django.test.utils import CaptureQueriesContext
+
+from kanban.board_snapshot import get_or_create_board
+from kanban.models import ExpenseItem, KanbanColumn
+from kanban.ordering import CARD_ORDERING, position_for_move, rebalance_column
+from projects.models import Project
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Замеряет перемещение карточек канбан-доски (изменения откатываются)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('project_id', help='ID проекта, на доске которого выполняется замер')
+        parser.add_argument('--cards', type=int, default=200, help='Карточек в тестовых колонках')
+        parser.add_argument('--moves', type=int, default=500, help='Количество перемещений')
+        parser.add_argument('--seed', type=int, default=42, help='Seed генератора случайных чисел')
+
+    def handle(self, *args, **options):
+        try:
+            project = Project.objects.get(pk=options['project_id'])
+        except (Project.DoesNotExist, ValueError):
+            raise CommandError('Проект не найден')
+
+        try:
+            with transaction.atomic():
+                self._run(project, options)
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def _run(self, project, options):
+        board = get_or_create_board(project, project.created_by)
+        last_position = board.columns.aggregate(last=Max('position'))['last'] or 0
+
+        columns = [
+            KanbanColumn.objects.create(
+                board=board,
+                name=f'Замер {index}',
+                column_type='todo',
+                position=last_position + index
+            )
+            for index in (1, 2)
+        ]
+        for column in columns:
+            ExpenseItem.objects.bulk_create([
+                ExpenseItem(
+                    project=project,
+                    column=column,
+                    title=f'Карточка {index}',
+                    created_by=project.created_by,
+                    position=0
+                )
+                for index in range(options['cards'])
+            ])
+
+        self._report('Перенумерация соседей', self._bench(columns, options, self._move_renumber))
+
+        # Та же раскладка, что создает приложение: от POSITION_START с шагом POSITION_GAP
+        for column in columns:
+            rebalance_column(column.id)
+        self._report('Позиции с разрывами', self._bench(columns, options, self._move_gap))
+
+    def _bench(self, columns, options, move):
+        rng = random.Random(options['seed'])
+        item_ids = list(
+            ExpenseItem.objects.filter(column__in=columns).values_list('id', 'column_id')
+        )
+        column_ids = [column.id for column in columns]
+
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(options['moves']):
+                item_id, _column_id = rng.choice(item_ids)
+                target_id = rng.choice(column_ids)
+                index = rng.randint(0, options['cards'])
+                move(item_id, target_id, index)
+        elapsed = time.perf_counter() - started
+
+        return {
+            'moves': options['moves'],
+            'elapsed': elapsed,
+            'queries': len(queries.captured_queries),
+            'writes': sum(
+                1 for query in queries.captured_queries
+                if query['sql'].lstrip().upper().startswith('UPDATE')
+            ),
+        }
+
+    @staticmethod
+    def _move_gap(item_id, target_id, index):
+        item = ExpenseItem.objects.get(pk=item_id)
+        item.column_id = target_id
+        item.position = position_for_move(target_id, index=index, exclude_id=item_id)
+        item.save(update_fields=['column', 'position', 'status', 'updated_at'])
+
+    def _move_renumber(self, item_id, target_id, index):
+        item = ExpenseItem.objects.get(pk=item_id)
+        item.column_id = target_id
+        item.position = index
+        item.save(update_fields=['column', 'position', 'status', 'updated_at'])
+        self._renumber(target_id, item_id, index)
+
+    @staticmethod
+    def _renumber(column_id, moved_id, index):
+        """Сплошная перенумерация колонки 1, 2, 3... (прежний способ)"""
+        items = list(
+            ExpenseItem.objects.filter(column_id=column_id)
+            .order_by(*CARD_ORDERING)
+            .only('id', 'position')
+        )
+        moved = next(item for item in items if item.pk == moved_id)
+        items.remove(moved)
+        items.insert(min(index, len(items)), moved)
+        for position, item in enumerate(items, 1):
+            item.position = position
+        ExpenseItem.objects.bulk_update(items, ['position'], batch_size=500)
+
+    def _report(self, title, result):
+        moves = result['moves']
+        self.stdout.write(self.style.SUCCESS(title))
+        self.stdout.write(f"  Перемещений: {moves}")
+        self.stdout.write(f"  Время на перемещение: {result['elapsed'] / moves * 1000:.2f} мс")
+        self.stdout.write(f"  Запросов на перемещение: {result['queries'] / moves:.1f}")
+        self.stdout.write(f"  UPDATE на перемещение: {result['writes'] / moves:.1f}")
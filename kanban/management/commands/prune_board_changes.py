@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from kanban.models import BoardChange
+
+
+class Command(BaseCommand):
+    help = 'Удаляет старые записи журнала изменений канбан-досок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=7,
+            help='Хранить записи за последние N дней (по умолчанию 7)'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        deleted, _ = BoardChange.objects.filter(created_at__lt=cutoff).delete()
+
+        # Клиенты с более старой ревизией получат reset и перезагрузят доску
+        self.stdout.write(
+            self.style.SUCCESS(f'Удалено записей журнала: {deleted}')
+        )
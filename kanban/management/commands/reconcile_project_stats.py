@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from kanban.models import ProjectStats
+from kanban.project_stats import compute_project_stats
+from projects.models import Project
+
+
+class Command(BaseCommand):
+    help = 'Сверяет сводную статистику проектов с задачами и исправляет расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--project',
+            help='ID проекта (по умолчанию - все проекты)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать расхождения, не исправляя их'
+        )
+
+    def handle(self, *args, **options):
+        projects = Project.objects.order_by('name')
+        if options['project']:
+            projects = projects.filter(pk=options['project'])
+
+        existing = ProjectStats.objects.in_bulk(field_name='project_id')
+        fields = ('by_status', 'by_category', 'by_type')
+        checked = drifted = 0
+
+        for project_id, name in projects.values_list('id', 'name'):
+            checked += 1
+            expected = compute_project_stats(project_id)
+            current = existing.get(project_id)
+
+            if current is not None and all(
+                getattr(current, field) == getattr(expected, field) for field in fields
+            ):
+                continue
+
+            drifted += 1
+            self.stdout.write(
+                self.style.WARNING(
+                    f'{name}: ' + ('нет статистики' if current is None else 'расхождение')
+                )
+            )
+            if options['dry_run']:
+                continue
+
+            with transaction.atomic():
+                # Пересчитываем под блокировкой, чтобы не затереть параллельные изменения
+                ProjectStats.objects.select_for_update().filter(project_id=project_id).first()
+                expected = compute_project_stats(project_id)
+                ProjectStats.objects.update_or_create(
+                    project_id=project_id,
+                    defaults={field: getattr(expected, field) for field in fields}
+                )
+
+        action = 'Найдено' if options['dry_run'] else 'Исправлено'
+        self.stdout.write(
+            self.style.SUCCESS(f'Проверено проектов: {checked}. {action} расхождений: {drifted}')
+        )
@@ -0,0 +1,35 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kanban', '0008_statuschangerequest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kanbanboard',
+            name='revision',
+            field=models.PositiveBigIntegerField(default=0, help_text='Увеличивается при каждом изменении карточек доски', verbose_name='Ревизия'),
+        ),
+        migrations.CreateModel(
+            name='BoardChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('revision', models.PositiveBigIntegerField(verbose_name='Ревизия')),
+                ('item_id', models.UUIDField(verbose_name='ID карточки')),
+                ('change_type', models.CharField(choices=[('created', 'Создана'), ('moved', 'Перемещена'), ('updated', 'Изменена'), ('deleted', 'Удалена')], max_length=10, verbose_name='Тип изменения')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('board', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='changes', to='kanban.kanbanboard', verbose_name='Доска')),
+            ],
+            options={
+                'verbose_name': 'Изменение доски',
+                'verbose_name_plural': 'Изменения досок',
+                'db_table': 'kanban_board_changes',
+                'ordering': ['revision'],
+                'indexes': [models.Index(fields=['board', 'revision'], name='board_change_rev_idx')],
+            },
+        ),
+    ]
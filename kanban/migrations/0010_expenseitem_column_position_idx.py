@@ -0,0 +1,34 @@
+from django.db import migrations, models
+
+POSITION_GAP = 1024
+
+
+def spread_positions(apps, schema_editor):
+    """Перенумеровать существующие карточки с разрывами между позициями"""
+    ExpenseItem = apps.get_model('kanban', 'ExpenseItem')
+
+    column_ids = ExpenseItem.objects.values_list('column_id', flat=True).distinct()
+    for column_id in column_ids:
+        items = list(
+            ExpenseItem.objects.filter(column_id=column_id)
+            .order_by('position', '-created_at')
+            .only('id', 'position')
+        )
+        for index, item in enumerate(items, 1):
+            item.position = index * POSITION_GAP
+        ExpenseItem.objects.bulk_update(items, ['position'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kanban', '0009_kanbanboard_revision_boardchange'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expenseitem',
+            index=models.Index(fields=['column', 'position', '-created_at'], name='expense_column_pos_idx'),
+        ),
+        migrations.RunPython(spread_positions, migrations.RunPython.noop),
+    ]
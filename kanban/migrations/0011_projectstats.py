@@ -0,0 +1,29 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0001_initial'),
+        ('kanban', '0010_expenseitem_column_position_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('by_status', models.JSONField(default=dict, help_text='{статус: {count, hours, amount}}', verbose_name='По статусам')),
+                ('by_category', models.JSONField(default=dict, help_text='{id категории: {count, amount}}', verbose_name='По категориям')),
+                ('by_type', models.JSONField(default=dict, help_text='{тип: {count, amount}}', verbose_name='По типам задач')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлена')),
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='expense_stats', to='projects.project', verbose_name='Проект')),
+            ],
+            options={
+                'verbose_name': 'Статистика проекта',
+                'verbose_name_plural': 'Статистика проектов',
+                'db_table': 'kanban_project_stats',
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+
+def recompute_spent_amounts(apps, schema_editor):
+    """Пересчитать потраченные суммы один раз: дальше они обновляются приращениями"""
+    Project = apps.get_model('projects', 'Project')
+    ProjectEstimate = apps.get_model('projects', 'ProjectEstimate')
+    ExpenseItem = apps.get_model('kanban', 'ExpenseItem')
+
+    totals = dict(
+        ExpenseItem.objects.filter(status='done')
+        .order_by()
+        .values('project_id')
+        .annotate(total=models.Sum('amount'))
+        .values_list('project_id', 'total')
+    )
+    for project_id in Project.objects.values_list('id', flat=True):
+        total = totals.get(project_id) or 0
+        Project.objects.filter(pk=project_id).update(spent_amount=total)
+        ProjectEstimate.objects.filter(project_id=project_id).update(spent_amount=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0004_estimatecategory_estimaterate_estimatetemplate_and_more'),
+        ('kanban', '0011_projectstats'),
+    ]
+
+    operations = [
+        migrations.RunPython(recompute_spent_amounts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations, models
+
+POSITION_START = 2 ** 30
+
+
+def offset_positions(apps, schema_editor):
+    """Сдвинуть позиции карточек от POSITION_START: над первой карточкой появляется место"""
+    ExpenseItem = apps.get_model('kanban', 'ExpenseItem')
+    ExpenseItem.objects.filter(position__lt=POSITION_START).update(
+        position=models.F('position') + POSITION_START
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kanban', '0012_recompute_spent_amounts'),
+    ]
+
+    operations = [
+        migrations.RunPython(offset_positions, migrations.RunPython.noop),
+    ]
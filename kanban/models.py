@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator
 from decimal import Decimal
@@ -39,6 +39,11 @@ class KanbanBoard(models.Model):
         verbose_name=_('Создал'),
         related_name='created_boards'
     )
+    revision = models.PositiveBigIntegerField(
+        _('Ревизия'),
+        default=0,
+        help_text=_('Увеличивается при каждом изменении карточек доски')
+    )
     created_at = models.DateTimeField(_('Создана'), auto_now_add=True)
     updated_at = models.DateTimeField(_('Обновлена'), auto_now=True)
 
@@ -264,15 +269,45 @@ class ExpenseItem(models.Model):
         verbose_name_plural = _('Задачи')
         db_table = 'expense_items'
         ordering = ['column__position', 'position', '-created_at']
+        indexes = [
+            # Порядок карточек внутри колонки (см. kanban/ordering.py)
+            models.Index(fields=['column', 'position', '-created_at'], name='expense_column_pos_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.get_status_display()}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем исходную колонку, чтобы отличать перемещение от правки
+        instance._loaded_column_id = instance.__dict__.get('column_id')
+        return instance
+
+    # Поля, от которых зависит ProjectStats
+    STATS_FIELDS = ('project_id', 'status', 'category_id', 'task_type', 'estimated_hours', 'amount')
+
+    def get_stats_state(self):
+        """Значения полей статистики (None, если часть полей не загружена)"""
+        if any(name not in self.__dict__ for name in self.STATS_FIELDS):
+            return None
+        return tuple(self.__dict__[name] for name in self.STATS_FIELDS)
+
+    def lock_stats_state(self):
+        """Сохраненное в БД состояние статистики под блокировкой строки (None, если строки нет)"""
+        return type(self)._base_manager.select_for_update().filter(
+            pk=self.pk
+        ).order_by('pk').values_list(*self.STATS_FIELDS).first()
+
     def save(self, *args, **kwargs):
         # Синхронизируем статус с типом колонки
         if self.column:
             self.status = self.column.column_type
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            # Исходное состояние для статистики (сигнал post_save) читается в
+            # транзакции записи: параллельная правка не сдвинет статистику
+            self._stored_stats_state = None if self._state.adding else self.lock_stats_state()
+            super().save(*args, **kwargs)
     
     @property
     def is_overdue(self):
@@ -548,3 +583,79 @@ class StatusChangeRequest(models.Model):
     def is_rejected(self):
         """Проверяет, отклонен ли запрос"""
         return self.status == self.Status.REJECTED
+
+
+class BoardChange(models.Model):
+    """Журнал изменений карточек доски (для инкрементальных обновлений)"""
+    
+    class ChangeType(models.TextChoices):
+        CREATED = 'created', _('Создана')
+        MOVED = 'moved', _('Перемещена')
+        UPDATED = 'updated', _('Изменена')
+        DELETED = 'deleted', _('Удалена')
+    
+    board = models.ForeignKey(
+        KanbanBoard,
+        on_delete=models.CASCADE,
+        verbose_name=_('Доска'),
+        related_name='changes'
+    )
+    revision = models.PositiveBigIntegerField(_('Ревизия'))
+    item_id = models.UUIDField(_('ID карточки'))
+    change_type = models.CharField(
+        _('Тип изменения'),
+        max_length=10,
+        choices=ChangeType.choices
+    )
+    created_at = models.DateTimeField(_('Создано'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('Изменение доски')
+        verbose_name_plural = _('Изменения досок')
+        db_table = 'kanban_board_changes'
+        ordering = ['revision']
+        indexes = [
+            models.Index(fields=['board', 'revision'], name='board_change_rev_idx'),
+        ]
+
+    def __str__(self):
+        return f"Доска {self.board_id} r{self.revision}: {self.get_change_type_display()}"
+
+
+class ProjectStats(models.Model):
+    """
+    Сводная статистика задач проекта.
+    Поддерживается при каждом изменении задач (см. kanban/project_stats.py),
+    поэтому дашборды читают одну строку вместо агрегации по expense_items.
+    """
+    
+    project = models.OneToOneField(
+        'projects.Project',
+        on_delete=models.CASCADE,
+        verbose_name=_('Проект'),
+        related_name='expense_stats'
+    )
+    by_status = models.JSONField(
+        _('По статусам'),
+        default=dict,
+        help_text=_('{статус: {count, hours, amount}}')
+    )
+    by_category = models.JSONField(
+        _('По категориям'),
+        default=dict,
+        help_text=_('{id категории: {count, amount}}')
+    )
+    by_type = models.JSONField(
+        _('По типам задач'),
+        default=dict,
+        help_text=_('{тип: {count, amount}}')
+    )
+    updated_at = models.DateTimeField(_('Обновлена'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('Статистика проекта')
+        verbose_name_plural = _('Статистика проектов')
+        db_table = 'kanban_project_stats'
+
+    def __str__(self):
+        return f"Статистика проекта {self.project_id}"
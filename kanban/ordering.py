@@ -0,0 +1,149 @@
+"""
+Порядок карточек в колонках канбан-доски
+
+Позиции карточек хранятся с разрывами (POSITION_GAP), поэтому
+перемещение карточки меняет только ее собственную строку: новая позиция
+берется посередине между соседями. Перенумерация колонки выполняется
+только когда разрыв между соседями исчерпан.
+
+Нумерация начинается с POSITION_START, а не с нуля: вставка в начало
+колонки отступает от первой карточки на POSITION_GAP так же, как вставка
+в конец, вместо деления пополам расстояния до нуля.
+"""
+
+from django.db import transaction
+from django.db.models import Max, Min
+
+from .models import BoardChange, ExpenseItem, KanbanColumn
+
+POSITION_GAP = 1024
+
+# Позиция первой карточки пустой колонки: место для вставок в начало
+POSITION_START = 2 ** 30
+
+# Верхняя граница PositiveIntegerField
+POSITION_MAX = 2 ** 31 - 1
+
+CARD_ORDERING = ('position', '-created_at')
+
+
+def rank_between(lower, upper):
+    """
+    Позиция между соседями lower и upper (None - край колонки).
+    Возвращает None, если свободного места нет.
+    """
+    if upper is None:
+        if lower is None:
+            return POSITION_START
+        if lower + POSITION_GAP <= POSITION_MAX:
+            return lower + POSITION_GAP
+        upper = POSITION_MAX + 1
+    elif lower is None:
+        if upper - POSITION_GAP >= 1:
+            return upper - POSITION_GAP
+        lower = 0
+    if upper - lower > 1:
+        return (lower + upper) // 2
+    return None
+
+
+def rebalance_column(column_id):
+    """Перенумеровать карточки колонки с равными разрывами"""
+    from .board_changes import record_board_changes
+
+    with transaction.atomic():
+        # Блокируем колонку, чтобы параллельные перенумерации не пересекались
+        column = KanbanColumn.objects.select_for_update().get(pk=column_id)
+        items = list(
+            ExpenseItem.objects.filter(column_id=column_id)
+            .order_by(*CARD_ORDERING)
+            .only('id', 'position')
+        )
+        for index, item in enumerate(items):
+            item.position = POSITION_START + index * POSITION_GAP
+        ExpenseItem.objects.bulk_update(items, ['position'], batch_size=500)
+
+        record_board_changes(
+            column.board_id,
+            [(item.id, BoardChange.ChangeType.UPDATED) for item in items]
+        )
+
+
+def _column_positions(column_id, exclude_id=None):
+    queryset = ExpenseItem.objects.filter(column_id=column_id)
+    if exclude_id is not None:
+        queryset = queryset.exclude(pk=exclude_id)
+    return queryset.order_by(*CARD_ORDERING).values_list('position', flat=True)
+
+
+def _neighbors_for_index(column_id, index, exclude_id):
+    positions = _column_positions(column_id, exclude_id)
+    if index <= 0:
+        return None, positions.first()
+
+    neighbors = list(positions[index - 1:index + 1])
+    if not neighbors:
+        # Индекс за концом колонки - ставим в конец
+        return positions.aggregate(last=Max('position'))['last'], None
+    return neighbors[0], neighbors[1] if len(neighbors) > 1 else None
+
+
+def _neighbors_after_item(column_id, after_item_id, exclude_id):
+    lower = ExpenseItem.objects.filter(
+        pk=after_item_id, column_id=column_id
+    ).values_list('position', flat=True).first()
+    if lower is None:
+        return _neighbors_for_index(column_id, 0, exclude_id)
+
+    upper = _column_positions(column_id, exclude_id).filter(position__gt=lower).first()
+    return lower, upper
+
+
+def position_for_move(column_id, index=0, after_item_id=None, exclude_id=None):
+    """
+    Позиция для карточки, вставляемой в колонку.
+    after_item_id - карточка, после которой вставить (надежнее при
+    параллельных перетаскиваниях), иначе используется индекс в колонке.
+    """
+    for _attempt in range(2):
+        if after_item_id:
+            lower, upper = _neighbors_after_item(column_id, after_item_id, exclude_id)
+        else:
+            lower, upper = _neighbors_for_index(column_id, index, exclude_id)
+
+        position = rank_between(lower, upper)
+        if position is not None:
+            return position
+
+        rebalance_column(column_id)
+
+    # После перенумерации место есть всегда; сюда попадаем только при гонке
+    return (lower or 0) + 1
+
+
+def positions_for_top(column_id, count):
+    """Позиции для count новых карточек в начале колонки (в порядке списка)"""
+    for _attempt in range(2):
+        first = ExpenseItem.objects.filter(column_id=column_id).aggregate(first=Min('position'))['first']
+        if first is None:
+            return [POSITION_START + index * POSITION_GAP for index in range(count)]
+
+        step = min(POSITION_GAP, first // (count + 1))
+        if step > 0:
+            start = first - step * count
+            return [start + index * step for index in range(count)]
+
+        rebalance_column(column_id)
+
+    # После перенумерации место есть всегда; сюда попадаем только при гонке
+    return [first] * count
+
+
+def position_for_top(column_id):
+    """Позиция для новой карточки в начале колонки"""
+    first = ExpenseItem.objects.filter(column_id=column_id).aggregate(first=Min('position'))['first']
+    position = rank_between(None, first)
+    if position is None:
+        rebalance_column(column_id)
+        return position_for_top(column_id)
+    return position
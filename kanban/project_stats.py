@@ -0,0 +1,274 @@
+"""
+Сводная статистика задач проекта (ProjectStats) и потраченные суммы
+
+Статистика обновляется при каждом изменении задач: сигналы ExpenseItem и
+пакетные операции передают старое и новое состояние задачи, а в строку
+ProjectStats вносится только разница. Старое состояние читается из БД под
+блокировкой строки в той же транзакции, что и запись задачи, поэтому
+параллельная правка не сдвигает статистику. Каскадные удаления (колонка,
+доска) и SET_NULL категории проходят мимо сигналов задач - для них проект
+пересчитывается после фиксации транзакции. Тем же путем поддерживаются
+Project.spent_amount и ProjectEstimate.spent_amount (сумма выполненных
+задач) - через F()-выражения, без пересчета. Чтение - одна строка.
+Расхождения исправляют команды reconcile_project_stats и verify_spent_amounts.
+"""
+
+import threading
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from projects.models import Project, ProjectEstimate
+
+from .models import ExpenseItem, ProjectStats
+
+ZERO = Decimal('0.00')
+
+# Потраченной считается сумма задач в этом статусе
+SPENT_STATUS = ExpenseItem.Status.DONE
+
+
+def lock_stats_states(item_ids):
+    """
+    Текущие состояния задач под блокировкой строк: {id: состояние}.
+    Вызывается внутри транзакции, которая затем записывает задачи.
+    """
+    rows = (
+        ExpenseItem.objects.select_for_update()
+        .filter(pk__in=item_ids)
+        .order_by('pk')
+        .values_list('pk', *ExpenseItem.STATS_FIELDS)
+    )
+    return {row[0]: tuple(row[1:]) for row in rows}
+
+
+def updated_state(state, **values):
+    """Состояние с замененными полями статистики (None остается None)"""
+    if state is None:
+        return None
+    state = list(state)
+    for name, value in values.items():
+        state[ExpenseItem.STATS_FIELDS.index(name)] = value
+    return tuple(state)
+
+
+def _add(bucket, key, count, amount, hours=None):
+    entry = bucket.setdefault(str(key), {'count': 0, 'amount': '0.00'})
+    entry['count'] += count
+    entry['amount'] = str(Decimal(entry['amount']) + amount)
+    if hours is not None:
+        entry['hours'] = str(Decimal(entry.get('hours', '0.00')) + hours)
+    if entry['count'] <= 0:
+        del bucket[str(key)]
+
+
+def _apply_state(stats, state, sign):
+    """Добавить (sign=1) или вычесть (sign=-1) вклад задачи"""
+    _project_id, status, category_id, task_type, hours, amount = state
+    hours = Decimal(hours or 0) * sign
+    amount = Decimal(amount or 0) * sign
+
+    _add(stats.by_status, status, sign, amount, hours)
+    _add(stats.by_type, task_type, sign, amount)
+    if category_id is not None:
+        _add(stats.by_category, category_id, sign, amount)
+
+
+def _spent(state):
+    """Вклад задачи в потраченную сумму проекта"""
+    if state is None or state[1] != SPENT_STATUS:
+        return ZERO
+    return Decimal(state[5] or 0)
+
+
+def compute_spent_amount(project_id):
+    """Полный пересчет потраченной суммы проекта"""
+    return ExpenseItem.objects.filter(
+        project_id=project_id,
+        status=SPENT_STATUS
+    ).aggregate(total=Sum('amount'))['total'] or ZERO
+
+
+def _add_spent(project_id, delta):
+    Project.objects.filter(pk=project_id).update(spent_amount=F('spent_amount') + delta)
+    ProjectEstimate.objects.filter(project_id=project_id).update(spent_amount=F('spent_amount') + delta)
+
+
+def _save_recomputed_spent(project_id):
+    total = compute_spent_amount(project_id)
+    Project.objects.filter(pk=project_id).update(spent_amount=total)
+    ProjectEstimate.objects.filter(project_id=project_id).update(spent_amount=total)
+
+
+def compute_project_stats(project_id):
+    """Полный пересчет статистики проекта по expense_items"""
+    stats = ProjectStats(project_id=project_id, by_status={}, by_category={}, by_type={})
+    items = ExpenseItem.objects.filter(project_id=project_id).order_by()
+
+    for row in items.values('status').annotate(
+        count=Count('id'), hours=Sum('estimated_hours'), amount=Sum('amount')
+    ):
+        _add(stats.by_status, row['status'], row['count'], row['amount'] or ZERO, row['hours'] or ZERO)
+
+    for row in items.values('task_type').annotate(count=Count('id'), amount=Sum('amount')):
+        _add(stats.by_type, row['task_type'], row['count'], row['amount'] or ZERO)
+
+    for row in items.filter(category__isnull=False).values('category_id').annotate(
+        count=Count('id'), amount=Sum('amount')
+    ):
+        _add(stats.by_category, row['category_id'], row['count'], row['amount'] or ZERO)
+
+    return stats
+
+
+def _save_recomputed(project_id):
+    stats = compute_project_stats(project_id)
+    values = {
+        'by_status': stats.by_status,
+        'by_category': stats.by_category,
+        'by_type': stats.by_type,
+    }
+    try:
+        with transaction.atomic():
+            ProjectStats.objects.update_or_create(project_id=project_id, defaults=values)
+    except IntegrityError:
+        # Строку одновременно создал другой запрос - обновляем ее
+        ProjectStats.objects.filter(project_id=project_id).update(updated_at=timezone.now(), **values)
+
+
+def apply_stats_changes(changes, recompute=()):
+    """
+    Внести изменения задач в статистику.
+    changes - список пар (old_state, new_state) из ExpenseItem.get_stats_state();
+    None означает, что задачи не было (создание) или она удалена.
+    recompute - проекты, для которых старое состояние неизвестно.
+    """
+    by_project = defaultdict(list)
+    spent = defaultdict(lambda: ZERO)
+    recompute = set(recompute)
+    for old_state, new_state in changes:
+        if old_state == new_state:
+            continue
+        for state, sign in ((old_state, -1), (new_state, 1)):
+            if state is not None:
+                by_project[state[0]].append((state, sign))
+                spent[state[0]] += _spent(state) * sign
+
+    if not by_project and not recompute:
+        return
+
+    with transaction.atomic():
+        for project_id in recompute:
+            _save_recomputed(project_id)
+            _save_recomputed_spent(project_id)
+
+        for project_id, delta in spent.items():
+            if delta and project_id not in recompute:
+                _add_spent(project_id, delta)
+
+        locked = ProjectStats.objects.select_for_update().in_bulk(
+            [project_id for project_id in by_project if project_id not in recompute],
+            field_name='project_id'
+        )
+        for project_id, deltas in by_project.items():
+            if project_id in recompute:
+                continue
+            stats = locked.get(project_id)
+            if stats is None:
+                # Строки еще нет: пересчет уже учитывает записанные изменения
+                _save_recomputed(project_id)
+                continue
+            for state, sign in deltas:
+                _apply_state(stats, state, sign)
+            stats.save(update_fields=['by_status', 'by_category', 'by_type', 'updated_at'])
+
+
+_pending_recompute = threading.local()
+
+
+def recompute_on_commit(project_ids):
+    """
+    Пересчитать статистику проектов после фиксации текущей транзакции.
+    Каждый проект пересчитывается один раз, сколько бы задач ни затронуло
+    каскадное удаление.
+    """
+    project_ids = set(project_ids)
+    if not project_ids:
+        return
+    pending = getattr(_pending_recompute, 'project_ids', None)
+    if pending is None:
+        pending = _pending_recompute.project_ids = set()
+    pending.update(project_ids)
+    transaction.on_commit(_recompute_pending)
+
+
+def _recompute_pending():
+    project_ids = getattr(_pending_recompute, 'project_ids', None)
+    if not project_ids:
+        return
+    _pending_recompute.project_ids = set()
+    # Проект мог быть удален той же транзакцией
+    existing = Project.objects.filter(pk__in=project_ids).values_list('pk', flat=True)
+    apply_stats_changes([], recompute=list(existing))
+
+
+def get_project_stats(project_id):
+    """
+    Статистика проекта одним запросом (при отсутствии строки - пересчет).
+    Ключи совпадают со статистикой снимка доски (board_snapshot.build_board_stats).
+    """
+    stats = ProjectStats.objects.filter(project_id=project_id).first()
+    if stats is None:
+        with transaction.atomic():
+            _save_recomputed(project_id)
+        stats = ProjectStats.objects.get(project_id=project_id)
+    return summarize(stats)
+
+
+def stats_rows(bucket, key_name):
+    """
+    Строки в формате values().annotate(count, total_amount), как в прежней
+    аналитике; отсортированы по убыванию суммы.
+    """
+    rows = [
+        {key_name: key, 'count': entry['count'], 'total_amount': Decimal(entry['amount'])}
+        for key, entry in bucket.items()
+    ]
+    return sorted(rows, key=lambda row: row['total_amount'], reverse=True)
+
+
+def summarize(stats):
+    """Сводка по строке ProjectStats"""
+    def entry(status):
+        return stats.by_status.get(status, {})
+
+    def count(status):
+        return entry(status).get('count', 0)
+
+    def decimal(status, key):
+        return Decimal(entry(status).get(key, '0.00'))
+
+    statuses = stats.by_status.keys()
+    summary = {
+        'total_count': sum(count(status) for status in statuses),
+        'completed_count': count(ExpenseItem.Status.DONE),
+        'in_progress_count': count(ExpenseItem.Status.IN_PROGRESS),
+        'new_count': count(ExpenseItem.Status.NEW),
+        'todo_count': count(ExpenseItem.Status.TODO),
+        'total_hours': sum((decimal(status, 'hours') for status in statuses), ZERO),
+        'completed_hours': decimal(ExpenseItem.Status.DONE, 'hours'),
+        'total_amount': sum((decimal(status, 'amount') for status in statuses), ZERO),
+        'by_status': stats.by_status,
+        'by_category': stats.by_category,
+        'by_type': stats.by_type,
+    }
+
+    if summary['total_count'] > 0:
+        summary['completion_percent'] = (summary['completed_count'] / summary['total_count']) * 100
+    else:
+        summary['completion_percent'] = 0
+
+    return summary
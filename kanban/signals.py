@@ -0,0 +1,125 @@
+"""
+Сигналы канбан-доски
+"""
+
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from projects.models import Project
+
+from .board_changes import record_board_change, record_board_changes
+from .bulk_tasks import forget_board_entry_columns
+from .live_events import publish_board_event
+from .models import BoardChange, ExpenseCategory, ExpenseItem, KanbanBoard, KanbanColumn
+from .project_stats import apply_stats_changes, recompute_on_commit, updated_state
+
+
+def _origin_model(origin):
+    # origin - удаляемый объект или QuerySet
+    return getattr(origin, 'model', type(origin))
+
+
+def _saved_state(instance, update_fields):
+    """Состояние, записанное save(): при update_fields меняются только эти поля"""
+    if update_fields is None:
+        return instance.get_stats_state()
+    values = {}
+    for name in ExpenseItem.STATS_FIELDS:
+        field_name = name[:-3] if name.endswith('_id') else name
+        if name in update_fields or field_name in update_fields:
+            values[name] = instance.__dict__[name]
+    return updated_state(instance._stored_stats_state, **values)
+
+
+@receiver(post_save, sender=ExpenseItem)
+def expense_item_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Фиксирует создание, перемещение и правку карточки в журнале доски и статистике"""
+    if raw:
+        return
+
+    loaded_column_id = getattr(instance, '_loaded_column_id', None)
+    if created:
+        change_type = BoardChange.ChangeType.CREATED
+    elif loaded_column_id is not None and loaded_column_id != instance.column_id:
+        change_type = BoardChange.ChangeType.MOVED
+    else:
+        change_type = BoardChange.ChangeType.UPDATED
+
+    record_board_change(instance.column.board_id, instance.pk, change_type)
+    instance._loaded_column_id = instance.column_id
+
+    # Исходное состояние прочитано под блокировкой в ExpenseItem.save()
+    old_state = getattr(instance, '_stored_stats_state', None)
+    if created:
+        apply_stats_changes([(None, instance.get_stats_state())])
+        return
+
+    new_state = _saved_state(instance, update_fields) if old_state is not None else None
+    if new_state is None:
+        # Исходное состояние неизвестно (строки не было) или поля отложены
+        apply_stats_changes([], recompute=[instance.project_id])
+    else:
+        apply_stats_changes([(old_state, new_state)])
+
+
+@receiver(pre_delete, sender=ExpenseItem)
+def expense_item_deleting(sender, instance, origin=None, **kwargs):
+    """Читает удаляемое состояние под блокировкой в транзакции удаления"""
+    if origin is not None and _origin_model(origin) is not ExpenseItem:
+        return
+    instance._stored_stats_state = instance.lock_stats_state()
+
+
+@receiver(post_delete, sender=ExpenseItem)
+def expense_item_deleted(sender, instance, origin=None, **kwargs):
+    """Фиксирует удаление карточки в журнале доски и статистике"""
+    if origin is not None and _origin_model(origin) is not ExpenseItem:
+        # Каскад: статистика проекта удаляется вместе с проектом, при удалении
+        # колонки или доски проект пересчитывается один раз после фиксации.
+        # Журнал доски при удалении колонки пишет kanban_column_deleting
+        if _origin_model(origin) is not Project:
+            recompute_on_commit([instance.project_id])
+        return
+
+    record_board_change(instance.column.board_id, instance.pk, BoardChange.ChangeType.DELETED)
+    publish_board_event(instance.project_id, 'deleted', item_id=instance.pk)
+
+    old_state = getattr(instance, '_stored_stats_state', None)
+    if old_state is None:
+        apply_stats_changes([], recompute=[instance.project_id])
+    else:
+        apply_stats_changes([(old_state, None)])
+
+
+@receiver(pre_delete, sender=ExpenseCategory)
+def expense_category_deleting(sender, instance, **kwargs):
+    """SET_NULL категории меняет задачи без сигналов: пересчитываем их проекты"""
+    project_ids = ExpenseItem.objects.filter(category=instance).order_by().values_list(
+        'project_id', flat=True
+    ).distinct()
+    recompute_on_commit(list(project_ids))
+
+
+@receiver(pre_delete, sender=KanbanColumn)
+def kanban_column_deleting(sender, instance, origin=None, **kwargs):
+    """
+    Карточки колонки удаляются каскадом без записи в журнал доски:
+    фиксируем их удаление одной ревизией до удаления
+    """
+    # Вместе с доской удаляется и ее журнал
+    if origin is not None and _origin_model(origin) in (KanbanBoard, Project):
+        return
+    items = list(instance.items.order_by().values_list('pk', 'project_id'))
+    record_board_changes(
+        instance.board_id,
+        [(item_id, BoardChange.ChangeType.DELETED) for item_id, _project_id in items]
+    )
+    for item_id, project_id in items:
+        publish_board_event(project_id, 'deleted', item_id=item_id)
+
+
+@receiver(post_save, sender=KanbanColumn)
+@receiver(post_delete, sender=KanbanColumn)
+def kanban_column_changed(sender, instance, **kwargs):
+    """Первая колонка доски могла смениться - сбрасываем кэш колонок для новых задач"""
+    forget_board_entry_columns(instance.board_id)
@@ -0,0 +1,177 @@
+"""
+Пакетная обработка запросов на изменение статуса
+
+Утверждает или отклоняет выбранные запросы StatusChangeRequest одной
+транзакцией: целевые колонки всех затронутых досок определяются одним
+запросом, задачи и запросы обновляются через bulk_update, история
+пишется через bulk_create. Ошибки возвращаются по каждой строке.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+
+from .board_changes import record_board_changes
+from .live_events import publish_board_event
+from .models import (
+    BoardChange,
+    ExpenseHistory,
+    ExpenseItem,
+    KanbanColumn,
+    StatusChangeRequest,
+)
+from .project_stats import apply_stats_changes, lock_stats_states, updated_state
+
+APPROVE = 'approve'
+REJECT = 'reject'
+ACTIONS = (APPROVE, REJECT)
+
+
+def _target_columns(project_ids, statuses):
+    """Колонки для новых статусов: {(project_id, column_type): column_id}"""
+    columns = {}
+    rows = (
+        KanbanColumn.objects.filter(board__project_id__in=project_ids, column_type__in=statuses)
+        .order_by('position')
+        .values_list('board__project_id', 'column_type', 'id')
+    )
+    for project_id, column_type, column_id in rows:
+        # Как и при одиночном утверждении, берется первая подходящая колонка
+        columns.setdefault((project_id, column_type), column_id)
+    return columns
+
+
+def process_status_requests(user, request_ids, action, reason=''):
+    """
+    Утвердить или отклонить запросы на изменение статуса.
+    Возвращает результаты в порядке request_ids.
+    """
+    if action not in ACTIONS:
+        raise ValueError(f"Неизвестное действие: {action}")
+
+    results = [{'request_id': request_id, 'success': False} for request_id in request_ids]
+
+    with transaction.atomic():
+        status_requests = (
+            StatusChangeRequest.objects.select_for_update()
+            .select_related('expense_item__column')
+            .in_bulk(request_ids)
+        )
+
+        accepted = []
+        seen_items = set()
+        for result in results:
+            status_request = status_requests.get(result['request_id'])
+            if status_request is None:
+                result['error'] = 'Запрос не найден'
+            elif not status_request.is_pending:
+                result['error'] = 'Запрос уже обработан'
+            elif status_request.expense_item_id in seen_items:
+                result['error'] = 'Для задачи уже выбран другой запрос'
+            else:
+                seen_items.add(status_request.expense_item_id)
+                accepted.append((result, status_request))
+
+        if not accepted:
+            return results
+
+        # Состояния для статистики читаются под блокировкой строк
+        stored_states = lock_stats_states(
+            [status_request.expense_item_id for _, status_request in accepted]
+        )
+
+        columns = {}
+        if action == APPROVE:
+            columns = _target_columns(
+                {status_request.expense_item.project_id for _, status_request in accepted},
+                {status_request.new_status for _, status_request in accepted}
+            )
+
+        now = timezone.now()
+        processed = []
+        items = []
+        history = []
+        changes_by_board = {}
+        events = []
+        for result, status_request in accepted:
+            expense_item = status_request.expense_item
+            # Колонка до перемещения и после принадлежит одной доске
+            board_id = expense_item.column.board_id
+            change_type = BoardChange.ChangeType.UPDATED
+
+            if action == APPROVE:
+                # Статус задачи определяется колонкой: без нее утверждать нельзя
+                column_id = columns.get((expense_item.project_id, status_request.new_status))
+                if column_id is None:
+                    result['error'] = 'На доске нет колонки для нового статуса'
+                    continue
+
+                status_request.status = StatusChangeRequest.Status.APPROVED
+                expense_item.status = status_request.new_status
+                expense_item.updated_at = now
+
+                if column_id != expense_item.column_id:
+                    expense_item.column_id = column_id
+                    change_type = BoardChange.ChangeType.MOVED
+                items.append(expense_item)
+
+                history.append(ExpenseHistory(
+                    expense_item=expense_item,
+                    user=user,
+                    action='status_approved',
+                    old_value=f"Статус: {status_request.get_old_status_display()}",
+                    new_value=f"Статус: {status_request.get_new_status_display()}",
+                    field_name='status'
+                ))
+                events.append((expense_item.project_id, 'status_approved', {
+                    'item_id': expense_item.id,
+                    'column_id': expense_item.column_id,
+                    'status': expense_item.status,
+                }))
+            else:
+                status_request.status = StatusChangeRequest.Status.REJECTED
+                status_request.rejection_reason = reason
+
+                history.append(ExpenseHistory(
+                    expense_item=expense_item,
+                    user=user,
+                    action='status_rejected',
+                    old_value=f"Статус: {status_request.get_old_status_display()}",
+                    new_value=f"Запрос отклонен: {status_request.get_new_status_display()}",
+                    field_name='status'
+                ))
+                events.append((expense_item.project_id, 'status_rejected', {
+                    'item_id': expense_item.id,
+                }))
+
+            status_request.approved_by = user
+            status_request.approved_at = now
+            processed.append(status_request)
+            changes_by_board.setdefault(board_id, []).append(
+                (expense_item.id, change_type)
+            )
+            result['success'] = True
+
+        if not processed:
+            return results
+
+        StatusChangeRequest.objects.bulk_update(
+            processed,
+            ['status', 'approved_by', 'approved_at', 'rejection_reason'],
+            batch_size=500
+        )
+        if items:
+            ExpenseItem.objects.bulk_update(items, ['status', 'column', 'updated_at'], batch_size=500)
+        ExpenseHistory.objects.bulk_create(history, batch_size=500)
+
+        # bulk_update не вызывает сигналы, журнал доски и статистику обновляем явно
+        for board_id, changes in changes_by_board.items():
+            record_board_changes(board_id, changes)
+        apply_stats_changes([
+            (stored_states.get(item.id), updated_state(stored_states.get(item.id), status=item.status))
+            for item in items
+        ])
+
+        for project_id, event_type, data in events:
+            publish_board_event(project_id, event_type, **data)
+
+    return results
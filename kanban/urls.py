@@ -10,10 +10,13 @@ urlpatterns = [
     
     # Старые URL для расходов (для совместимости)
     path('board/<uuid:project_id>/', views.kanban_board, name='board'),
+    path('<uuid:project_id>/delta/', views.board_delta, name='board_delta'),
+    path('<uuid:project_id>/stream/', views.board_stream, name='board_stream'),
     path('expense/<uuid:pk>/', views.ExpenseItemDetailView.as_view(), name='expense_detail'),
     path('expense/<uuid:pk>/edit/', views.edit_expense_item, name='expense_edit'),
     path('api/create-expense/<uuid:project_id>/', views.create_expense_item, name='create_expense'),
     path('api/move-expense/', views.move_expense_item, name='move_expense'),
+    path('api/bulk-move-expense/', views.bulk_move_expense_items, name='bulk_move_expense'),
     path('api/add-comment/<uuid:pk>/', views.add_expense_comment, name='add_comment'),
     path('api/reject-expense/<uuid:pk>/', views.reject_expense_item, name='reject_expense'),
     path('add-expense/', views.add_expense, name='add_expense'),
@@ -22,6 +25,7 @@ urlpatterns = [
     # API для управления статусами
     path('api/approve-status/<int:request_id>/', views.approve_status_change, name='approve_status'),
     path('api/reject-status/<int:request_id>/', views.reject_status_change, name='reject_status'),
+    path('api/process-status-changes/', views.process_status_changes, name='process_status_changes'),
     path('api/pending-status-changes/', views.pending_status_changes, name='pending_status_changes'),
     path('api/approve-status-change/<uuid:item_id>/', views.approve_status_change_request, name='approve_status_change_request'),
     path('api/reject-status-change/<uuid:item_id>/', views.reject_status_change_request, name='reject_status_change_request'),
@@ -2,16 +2,21 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
-from django.http import JsonResponse
-from django.db.models import Sum, Count, Q
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse, Http404
 from django.views.decorators.http import require_http_methods
 from django.views.generic import DetailView
 from django.utils import timezone
+from django.conf import settings
 from django_ratelimit.decorators import ratelimit
+from asgiref.sync import sync_to_async
+from decimal import Decimal
 import logging
 import json
 
-from constants import MAX_JSON_SIZE, MAX_JSON_MOVE_SIZE
+from constants import (
+    MAX_JSON_SIZE, MAX_JSON_MOVE_SIZE, MAX_JSON_BULK_MOVE_SIZE, MAX_BULK_MOVE_ITEMS,
+    RATE_LIMIT_BULK_MOVE_EXPENSE
+)
 
 from .models import (
     KanbanBoard, KanbanColumn, ExpenseItem, ExpenseDocument, 
@@ -19,23 +24,32 @@ from .models import (
     StatusChangeRequest
 )
 from .forms import ExpenseItemForm, ExpenseDocumentForm, ExpenseCommentForm, ExpenseCommentAttachmentForm
+from .board_snapshot import get_or_create_board, build_board_snapshot
+from .board_changes import build_board_delta
+from .ordering import position_for_move, position_for_top
+from .bulk_moves import apply_bulk_moves
+from .project_stats import get_project_stats, stats_rows
+from .status_approvals import process_status_requests, ACTIONS as STATUS_REQUEST_ACTIONS
+from .live_events import publish_board_event, board_event_stream
 from projects.models import Project, ProjectActivity
+from projects.access import can_access_project
+from superpan.query_budget import query_budget
+from superpan.async_views import async_login_required, async_require_methods
 
 logger = logging.getLogger(__name__)
 
 
 def send_status_change_notification(expense_item, user, old_status, new_status):
-    """Отправляет уведомление админу о запросе на изменение статуса"""
+    """Ставит в очередь уведомления админам о запросе на изменение статуса"""
     try:
-        from telegram_bot.bot import send_message_to_user
+        from telegram_bot.outbox import enqueue_messages
         
         # Находим всех админов с Telegram ID
-        from accounts.models import TelegramUser
         admins = expense_item.project.members.filter(
             user__role='admin',
             is_active=True,
             user__telegram_profile__isnull=False
-        ).select_related('user', 'user__telegram_profile')
+        ).values_list('user__telegram_profile__telegram_id', flat=True)
         
         # Получаем отображаемые названия статусов
         status_choices = dict(ExpenseItem.Status.choices)
@@ -61,22 +75,12 @@ def send_status_change_notification(expense_item, user, old_status, new_status):
             f"<a href='{approval_url}'>Перейти к подтверждению</a>"
         )
         
-        for admin in admins:
-            telegram_id = admin.user.get_telegram_id()
-            if telegram_id:
-                success = send_message_to_user(
-                    telegram_id,
-                    message
-                )
-                if success:
-                    logger.info(f"Уведомление отправлено админу {admin.user.get_full_name()} (ID: {telegram_id})")
-                else:
-                    logger.error(f"Не удалось отправить уведомление админу {admin.user.get_full_name()} (ID: {telegram_id})")
-            else:
-                logger.warning(f"У админа {admin.user.get_full_name()} нет Telegram ID")
+        # Отправляет бот (telegram_bot/outbox.py), запрос не ждет Telegram
+        queued = enqueue_messages(list(admins), message)
+        logger.info(f"Уведомление о запросе статуса поставлено в очередь для {queued} админов")
                 
     except Exception as e:
-        logger.error(f"Ошибка отправки уведомления в Telegram: {e}")
+        logger.error(f"Ошибка постановки уведомления в очередь Telegram: {e}")
 
 
 @login_required
@@ -108,6 +112,7 @@ def approval_dashboard(request):
     return render(request, 'kanban/approval_dashboard.html', context)
 
 @login_required
+@query_budget(25)
 def kanban_board(request, project_id):
     """Канбан-доска проекта"""
     project = get_object_or_404(Project, pk=project_id)
@@ -118,69 +123,29 @@ def kanban_board(request, project_id):
         return redirect('projects:dashboard')
     
     # Получаем или создаем канбан-доску
-    board, created = KanbanBoard.objects.get_or_create(
-        project=project,
-        defaults={'created_by': request.user}
-    )
-    
-    # Создаем стандартные колонки, если доска была только что создана
-    if created:
-        default_columns = [
-            ('Новые', 'new', 0, '#f8f9fa'),
-            ('К выполнению', 'todo', 1, '#e3f2fd'),
-            ('В работе', 'in_progress', 2, '#fff3cd'),
-            ('На проверке', 'review', 3, '#d1edff'),
-            ('Выполнены', 'done', 4, '#d4edda'),
-            ('Отменены', 'cancelled', 5, '#f8d7da'),
-        ]
-        
-        for name, column_type, position, color in default_columns:
-            KanbanColumn.objects.create(
-                board=board,
-                name=name,
-                column_type=column_type,
-                position=position,
-                color=color
-            )
+    board = get_or_create_board(project, request.user)
     
-    # Получаем колонки и элементы
-    columns = board.columns.filter(is_active=True).prefetch_related(
-        'items__created_by',
-        'items__assigned_to',
-        'items__category'
-    )
+    # Колонки, карточки и статистика за фиксированное число запросов
+    snapshot = build_board_snapshot(board)
     
-    # Статистика задач
-    total_expenses = ExpenseItem.objects.filter(project=project).aggregate(
-        total_count=Count('id'),
-        completed_count=Count('id', filter=Q(status='done')),
-        in_progress_count=Count('id', filter=Q(status='in_progress')),
-        new_count=Count('id', filter=Q(status='new')),
-        total_hours=Sum('estimated_hours'),
-        completed_hours=Sum('estimated_hours', filter=Q(status='done')),
+    is_manager = (
+        request.user.is_admin_role() or
+        project.created_by_id == request.user.id or
+        project.foreman_id == request.user.id
     )
     
-    # Вычисляем процент выполнения
-    if total_expenses['total_count'] > 0:
-        total_expenses['completion_percent'] = (total_expenses['completed_count'] / total_expenses['total_count']) * 100
-    else:
-        total_expenses['completion_percent'] = 0
-    
     context = {
         'project': project,
         'board': board,
-        'columns': columns,
+        'columns': snapshot['columns'],
+        # SSE только под ASGI, под WSGI доска опрашивает board_delta
+        'live_stream': settings.SERVER_MODE == 'asgi',
+        'delta_poll_interval': settings.KANBAN_DELTA_POLL_INTERVAL,
         'categories': ExpenseCategory.objects.filter(is_active=True),
-        'total_expenses': total_expenses,
-        'can_manage': (
-            request.user.is_admin_role() or
-            project.created_by == request.user or
-            project.foreman == request.user
-        ),
+        'total_expenses': snapshot['stats'],
+        'can_manage': is_manager,
         'can_add_expenses': (
-            request.user.is_admin_role() or
-            project.created_by == request.user or
-            project.foreman == request.user or
+            is_manager or
             project.members.filter(
                 user=request.user,
                 can_add_expenses=True,
@@ -192,6 +157,61 @@ def kanban_board(request, project_id):
     return render(request, 'kanban/board.html', context)
 
 
+@async_login_required
+@async_require_methods("GET")
+@query_budget(15)
+async def board_delta(request, project_id):
+    """Изменения карточек доски после указанной ревизии"""
+    project = await Project.objects.filter(pk=project_id).afirst()
+    if project is None:
+        raise Http404('Проект не найден')
+    
+    # Проверяем доступ к проекту
+    if not await sync_to_async(can_access_project)(request.user, project.id):
+        return JsonResponse({'error': 'Недостаточно прав'}, status=403)
+    
+    try:
+        since = int(request.GET.get('since', 0))
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'Некорректная ревизия'}, status=400)
+    
+    if since < 0:
+        return JsonResponse({'error': 'Некорректная ревизия'}, status=400)
+    
+    board = await KanbanBoard.objects.filter(project=project).afirst()
+    if not board:
+        return JsonResponse({'revision': 0, 'reset': True, 'cards': [], 'deleted': []})
+    
+    return JsonResponse(await sync_to_async(build_board_delta)(board, since))
+
+
+@async_login_required
+@async_require_methods("GET")
+async def board_stream(request, project_id):
+    """Поток событий доски (server-sent events), работает под ASGI"""
+    # Под WSGI поток занял бы синхронный воркер и отдал события только по
+    # завершении; 204 останавливает переподключения EventSource
+    if settings.SERVER_MODE != 'asgi':
+        return HttpResponse(status=204)
+    
+    user = request.user
+    project = await Project.objects.filter(pk=project_id).afirst()
+    if project is None:
+        return JsonResponse({'error': 'Проект не найден'}, status=404)
+    
+    # Проверяем доступ к проекту
+    if not await sync_to_async(project.can_user_access)(user):
+        return JsonResponse({'error': 'Недостаточно прав'}, status=403)
+    
+    response = StreamingHttpResponse(
+        board_event_stream(project.id),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required
 @ratelimit(key='user', rate='30/h', method='POST', block=True)
 @require_http_methods(["POST"])
@@ -233,6 +253,7 @@ def create_expense_item(request, project_id):
         expense_item = ExpenseItem.objects.create(
             project=project,
             column=column,
+            position=position_for_top(column.id),
             title=data.get('title'),
             description=data.get('description', ''),
             task_type=data.get('task_type', 'other'),
@@ -258,6 +279,12 @@ def create_expense_item(request, project_id):
             description=f'Добавлен расход "{expense_item.title}" на сумму {expense_item.amount} ₽'
         )
         
+        publish_board_event(
+            project.id, 'created',
+            item_id=expense_item.id,
+            column_id=column.id
+        )
+        
         return JsonResponse({
             'success': True,
             'item': {
@@ -292,12 +319,18 @@ def move_expense_item(request):
         data = json.loads(request.body)
         item_id = data.get('item_id')
         target_column_id = data.get('target_column_id')
-        position = data.get('position', 0)
+        after_item_id = data.get('after_item_id')
         
         # Валидация обязательных полей
         if not item_id or not target_column_id:
             return JsonResponse({'error': 'Отсутствуют обязательные поля'}, status=400)
         
+        # position - индекс карточки в целевой колонке
+        try:
+            index = int(data.get('position', 0))
+        except (TypeError, ValueError):
+            return JsonResponse({'error': 'Некорректная позиция'}, status=400)
+        
         expense_item = get_object_or_404(ExpenseItem, pk=item_id)
         target_column = get_object_or_404(KanbanColumn, pk=target_column_id)
         
@@ -312,9 +345,15 @@ def move_expense_item(request):
         # Проверяем, может ли пользователь менять статус напрямую
         if expense_item.can_user_change_status(request.user):
             # Админ может менять статус напрямую
+            # Позиция берется между соседями, остальные карточки не переписываются
             expense_item.column = target_column
-            expense_item.position = position
-            expense_item.save()
+            expense_item.position = position_for_move(
+                target_column.id,
+                index=index,
+                after_item_id=after_item_id,
+                exclude_id=expense_item.id
+            )
+            expense_item.save(update_fields=['column', 'position', 'status', 'updated_at'])
             
             # Создаем запись в истории
             ExpenseHistory.objects.create(
@@ -325,6 +364,13 @@ def move_expense_item(request):
                 new_value=f"Колонка: {target_column.name}",
                 field_name='column'
             )
+            
+            publish_board_event(
+                expense_item.project_id, 'moved',
+                item_id=expense_item.id,
+                column_id=target_column.id,
+                status=expense_item.status
+            )
         else:
             # Обычные пользователи создают запрос на изменение
             # Проверяем, есть ли уже ожидающий запрос
@@ -342,9 +388,12 @@ def move_expense_item(request):
                 reason=data.get('reason', '')
             )
             
-            # Перемещаем только позицию, но не меняем статус
-            expense_item.position = position
-            expense_item.save(update_fields=['position'])
+            # Карточка остается в своей колонке до утверждения
+            publish_board_event(
+                expense_item.project_id, 'status_requested',
+                item_id=expense_item.id,
+                new_status=new_status
+            )
             
             # Отправляем уведомление админу в Telegram
             send_status_change_notification(expense_item, request.user, old_status, new_status)
@@ -377,6 +426,41 @@ def move_expense_item(request):
         return JsonResponse({'error': 'Внутренняя ошибка сервера'}, status=500)
 
 
+@login_required
+@ratelimit(key='user', rate=RATE_LIMIT_BULK_MOVE_EXPENSE, method='POST', block=True, group='kanban_bulk_move')
+@require_http_methods(["POST"])
+@query_budget(30)
+def bulk_move_expense_items(request):
+    """Пакетное перемещение элементов расхода между колонками"""
+    try:
+        if len(request.body) > MAX_JSON_BULK_MOVE_SIZE:
+            return JsonResponse({'error': 'Слишком большой запрос'}, status=400)
+        
+        data = json.loads(request.body)
+        moves = data.get('moves') if isinstance(data, dict) else None
+        
+        if not isinstance(moves, list) or not moves:
+            return JsonResponse({'error': 'Отсутствуют обязательные поля'}, status=400)
+        if len(moves) > MAX_BULK_MOVE_ITEMS:
+            return JsonResponse({
+                'error': f'Не более {MAX_BULK_MOVE_ITEMS} перемещений за запрос'
+            }, status=400)
+        
+        results = apply_bulk_moves(request.user, moves)
+        
+        return JsonResponse({
+            'success': True,
+            'moved': sum(1 for result in results if result['success']),
+            'results': results
+        })
+        
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Некорректные данные'}, status=400)
+    except Exception as e:
+        logger.error(f"Ошибка при пакетном перемещении элементов: {e}")
+        return JsonResponse({'error': 'Внутренняя ошибка сервера'}, status=500)
+
+
 class ExpenseItemDetailView(LoginRequiredMixin, DetailView):
     """Детальный вид элемента расхода"""
     model = ExpenseItem
@@ -387,7 +471,7 @@ class ExpenseItemDetailView(LoginRequiredMixin, DetailView):
         expense_item = get_object_or_404(ExpenseItem, pk=self.kwargs['pk'])
         
         # Проверяем доступ к проекту
-        if not expense_item.project.can_user_access(self.request.user):
+        if not can_access_project(self.request.user, expense_item.project_id):
             raise PermissionError("У вас нет доступа к этому проекту")
         
         return expense_item
@@ -400,9 +484,8 @@ class ExpenseItemDetailView(LoginRequiredMixin, DetailView):
         context['documents'] = expense_item.documents.select_related('uploaded_by')
         context['history'] = expense_item.history.select_related('user')[:10]
         context['can_edit'] = (
-            self.request.user.is_admin_role() or
-            expense_item.created_by == self.request.user or
-            expense_item.project.can_user_access(self.request.user)
+            expense_item.created_by_id == self.request.user.id or
+            can_access_project(self.request.user, expense_item.project_id)
         )
         
         return context
@@ -414,9 +497,8 @@ def edit_expense_item(request, pk):
     expense_item = get_object_or_404(ExpenseItem, pk=pk)
     
     # Проверяем права на редактирование
-    if not (request.user.is_admin_role() or 
-            expense_item.created_by == request.user or
-            expense_item.project.can_user_access(request.user)):
+    if not (expense_item.created_by_id == request.user.id or
+            can_access_project(request.user, expense_item.project_id)):
         messages.error(request, 'У вас нет прав для редактирования этого элемента.')
         return redirect('kanban:expense_detail', pk=pk)
     
@@ -492,6 +574,12 @@ def add_expense_comment(request, pk):
                         uploaded_by=request.user
                     )
                 
+                publish_board_event(
+                    expense_item.project_id, 'commented',
+                    item_id=expense_item.id,
+                    comment_id=comment.id
+                )
+                
                 return JsonResponse({
                     'success': True,
                     'comment': {
@@ -528,6 +616,12 @@ def add_expense_comment(request, pk):
                 is_internal=is_internal
             )
             
+            publish_board_event(
+                expense_item.project_id, 'commented',
+                item_id=expense_item.id,
+                comment_id=comment.id
+            )
+            
             return JsonResponse({
                 'success': True,
                 'comment': {
@@ -591,6 +685,12 @@ def reject_expense_item(request, pk):
                 is_internal=True
             )
             
+            publish_board_event(
+                expense_item.project_id, 'rejected',
+                item_id=expense_item.id,
+                column_id=rejected_column.id
+            )
+            
             return JsonResponse({'success': True})
         else:
             return JsonResponse({'error': 'Не найдена колонка для отклоненных элементов'}, status=500)
@@ -612,31 +712,17 @@ def expense_analytics(request, project_id):
         messages.error(request, 'У вас нет доступа к этому проекту.')
         return redirect('projects:dashboard')
     
-    # Собираем статистику
-    expenses_by_type = ExpenseItem.objects.filter(project=project).values(
-        'task_type'
-    ).annotate(
-        total_amount=Sum('amount'),
-        count=Count('id')
-    ).order_by('-total_amount')
-    
-    expenses_by_status = ExpenseItem.objects.filter(project=project).values(
-        'status'
-    ).annotate(
-        total_amount=Sum('amount'),
-        count=Count('id')
-    )
+    # Статистика хранится в ProjectStats и читается одной строкой
+    stats = get_project_stats(project.id)
+    expenses_by_type = stats_rows(stats['by_type'], 'task_type')
+    expenses_by_status = stats_rows(stats['by_status'], 'status')
     
-    expenses_by_category = ExpenseItem.objects.filter(
-        project=project,
-        category__isnull=False
-    ).values(
-        'category__name',
-        'category__color'
-    ).annotate(
-        total_amount=Sum('amount'),
-        count=Count('id')
-    ).order_by('-total_amount')
+    expenses_by_category = stats_rows(stats['by_category'], 'category_id')
+    categories = ExpenseCategory.objects.in_bulk([int(row['category_id']) for row in expenses_by_category])
+    for row in expenses_by_category:
+        category = categories.get(int(row['category_id']))
+        row['category__name'] = category.name if category else ''
+        row['category__color'] = category.color if category else ''
     
     context = {
         'project': project,
@@ -797,6 +883,13 @@ def approve_status_change(request, request_id):
             field_name='status'
         )
         
+        publish_board_event(
+            expense_item.project_id, 'status_approved',
+            item_id=expense_item.id,
+            column_id=expense_item.column_id,
+            status=expense_item.status
+        )
+        
         return JsonResponse({
             'success': True,
             'message': 'Статус задачи успешно изменен'
@@ -842,6 +935,11 @@ def reject_status_change(request, request_id):
             field_name='status'
         )
         
+        publish_board_event(
+            status_request.expense_item.project_id, 'status_rejected',
+            item_id=status_request.expense_item_id
+        )
+        
         return JsonResponse({
             'success': True,
             'message': 'Запрос на изменение статуса отклонен'
@@ -853,7 +951,52 @@ def reject_status_change(request, request_id):
 
 
 @login_required
-def pending_status_changes(request):
+@require_http_methods(["POST"])
+@query_budget(30)
+def process_status_changes(request):
+    """Пакетное утверждение или отклонение запросов на изменение статуса"""
+    try:
+        # Проверяем права (только админ)
+        if not request.user.is_admin_role():
+            return JsonResponse({'error': 'Недостаточно прав'}, status=403)
+        
+        if len(request.body) > MAX_JSON_BULK_MOVE_SIZE:
+            return JsonResponse({'error': 'Слишком большой запрос'}, status=400)
+        
+        data = json.loads(request.body)
+        action = data.get('action')
+        request_ids = data.get('request_ids')
+        reason = str(data.get('reason', '')).strip()
+        
+        if action not in STATUS_REQUEST_ACTIONS or not isinstance(request_ids, list) or not request_ids:
+            return JsonResponse({'error': 'Отсутствуют обязательные поля'}, status=400)
+        if len(request_ids) > MAX_BULK_MOVE_ITEMS:
+            return JsonResponse({
+                'error': f'Не более {MAX_BULK_MOVE_ITEMS} запросов за раз'
+            }, status=400)
+        
+        try:
+            request_ids = [int(request_id) for request_id in request_ids]
+        except (TypeError, ValueError):
+            return JsonResponse({'error': 'Некорректные данные'}, status=400)
+        
+        results = process_status_requests(request.user, request_ids, action, reason)
+        
+        return JsonResponse({
+            'success': True,
+            'processed': sum(1 for result in results if result['success']),
+            'results': results
+        })
+        
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Некорректные данные'}, status=400)
+    except Exception as e:
+        logger.error(f"Ошибка при пакетной обработке запросов: {e}")
+        return JsonResponse({'error': 'Ошибка сервера'}, status=500)
+
+
+@async_login_required
+async def pending_status_changes(request):
     """Список ожидающих утверждения изменений статуса"""
     if not request.user.is_admin_role():
         return JsonResponse({'error': 'Недостаточно прав'}, status=403)
@@ -866,7 +1009,7 @@ def pending_status_changes(request):
     ).order_by('-created_at')
     
     requests_data = []
-    for req in pending_requests:
+    async for req in pending_requests:
         requests_data.append({
             'id': req.id,
             'task_title': req.expense_item.title,
@@ -936,6 +1079,13 @@ def approve_status_change_request(request, item_id):
             field_name='status'
         )
         
+        publish_board_event(
+            expense_item.project_id, 'status_approved',
+            item_id=expense_item.id,
+            column_id=expense_item.column_id,
+            status=expense_item.status
+        )
+        
         return JsonResponse({
             'success': True,
             'message': f'Статус задачи "{expense_item.title}" утвержден и изменен на "{status_request.get_new_status_display()}"'
@@ -984,6 +1134,11 @@ def reject_status_change_request(request, item_id):
             field_name='status'
         )
         
+        publish_board_event(
+            status_request.expense_item.project_id, 'status_rejected',
+            item_id=status_request.expense_item_id
+        )
+        
         return JsonResponse({
             'success': True,
             'message': f'Запрос на изменение статуса задачи "{status_request.expense_item.title}" отклонен'
@@ -0,0 +1,125 @@
+"""
+Разрешение доступа пользователей к проектам
+
+Множества ID проектов, доступных пользователю (свои проекты, ключи доступа,
+участие в проекте), вычисляются один раз за запрос и хранятся в общем кэше
+по пользователю. Кэш сбрасывается сигналами при изменении ProjectAccessKey,
+ProjectMember и создателя/прораба проекта (см. projects/signals.py);
+о сбросе сообщает сигнал project_access_changed (для кэшей, построенных на
+доступе к проектам, например кэша пользователей бота).
+"""
+
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.dispatch import Signal
+from django.utils import timezone
+
+# Время жизни записи в общем кэше (секунды)
+ACCESS_CACHE_TIMEOUT = 300
+
+# Атрибут пользователя с результатом для текущего запроса
+_REQUEST_ATTR = '_project_access'
+
+# owned - проекты, где пользователь создатель или прораб;
+# keyed - проекты по активным ключам доступа;
+# member - проекты, где пользователь активный участник
+ProjectAccess = namedtuple('ProjectAccess', ['owned', 'keyed', 'member'])
+
+# Доступ пользователей изменился; аргумент user_ids - множество ID
+project_access_changed = Signal()
+
+
+def _cache_key(user_id):
+    return f"project_access:{user_id}"
+
+
+def _load_project_access(user_id):
+    """Загрузить множества проектов; возвращает (ProjectAccess, время жизни в кэше)"""
+    from accounts.models import ProjectAccessKey
+
+    from .models import Project, ProjectMember
+
+    now = timezone.now()
+    owned = Project.objects.filter(
+        Q(created_by_id=user_id) | Q(foreman_id=user_id)
+    ).values_list('id', flat=True)
+    keys = list(
+        ProjectAccessKey.objects.valid(now).filter(
+            assigned_to_id=user_id
+        ).values_list('project_id', 'expires_at')
+    )
+    member = ProjectMember.objects.filter(
+        user_id=user_id,
+        is_active=True
+    ).values_list('project_id', flat=True)
+
+    # Запись не должна пережить истечение ближайшего ключа
+    timeout = ACCESS_CACHE_TIMEOUT
+    expirations = [expires_at for _project_id, expires_at in keys if expires_at]
+    if expirations:
+        timeout = max(1, min(timeout, int((min(expirations) - now).total_seconds())))
+
+    access = ProjectAccess(
+        frozenset(owned),
+        frozenset(project_id for project_id, _expires_at in keys),
+        frozenset(member)
+    )
+    return access, timeout
+
+
+def get_project_access(user):
+    """Множества доступных пользователю проектов (кэш запроса, затем общий кэш)"""
+    access = getattr(user, _REQUEST_ATTR, None)
+    if access is not None:
+        return access
+
+    key = _cache_key(user.pk)
+    access = cache.get(key)
+    if access is None:
+        access, timeout = _load_project_access(user.pk)
+        cache.set(key, access, timeout)
+
+    setattr(user, _REQUEST_ATTR, access)
+    return access
+
+
+def invalidate_project_access(*user_ids):
+    """Сбросить кэш доступа пользователей"""
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if user_ids:
+        cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+        project_access_changed.send(sender=None, user_ids=user_ids)
+
+
+def can_access_project(user, project_id):
+    """Может ли пользователь получить доступ к проекту"""
+    if not user.is_authenticated:
+        return False
+    if user.is_admin_role():
+        return True
+
+    access = get_project_access(user)
+    return project_id in access.owned or project_id in access.keyed
+
+
+def is_project_member(user, project_id):
+    """Является ли пользователь активным участником проекта"""
+    return user.is_authenticated and project_id in get_project_access(user).member
+
+
+def accessible_projects(user):
+    """QuerySet проектов, доступных пользователю"""
+    from .models import Project
+
+    access = get_project_access(user)
+
+    if user.is_admin_role():
+        # Администраторы видят все проекты + проекты через ключи доступа
+        return Project.objects.filter(Q(is_active=True) | Q(id__in=access.keyed))
+    if user.is_foreman_role():
+        # Прорабы видят свои проекты + проекты через ключи доступа
+        return Project.objects.filter(id__in=access.owned | access.keyed, is_active=True)
+    # Остальные роли видят только проекты через ключи доступа
+    return Project.objects.filter(id__in=access.keyed, is_active=True)
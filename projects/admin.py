@@ -17,7 +17,8 @@ class ProjectAdmin(admin.ModelAdmin):
     list_display = ('name', 'status', 'budget', 'spent_amount', 'foreman', 'created_at')
     list_filter = ('status', 'created_at')
     search_fields = ('name', 'description')
-    readonly_fields = ('id', 'created_at', 'updated_at')
+    # spent_amount ведется по выполненным задачам (kanban/project_stats.py)
+    readonly_fields = ('id', 'spent_amount', 'created_at', 'updated_at')
     inlines = [ProjectMemberInline]
     
     fieldsets = (
@@ -57,7 +58,7 @@ class ProjectEstimateAdmin(admin.ModelAdmin):
     list_display = ('project', 'estimate_type', 'total_amount', 'spent_amount', 'is_approved', 'created_at')
     list_filter = ('estimate_type', 'is_approved', 'created_at')
     search_fields = ('project__name', 'name')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('spent_amount', 'created_at', 'updated_at')
 
 
 @admin.register(EstimateCategory)
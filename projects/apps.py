@@ -5,3 +5,6 @@ class ProjectsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'projects'
     verbose_name = 'Управление проектами'
+
+    def ready(self):
+        from . import signals  # noqa: F401
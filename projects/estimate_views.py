@@ -4,9 +4,12 @@ from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.core.paginator import Paginator
-from django.db.models import Sum, Count
+from django.db.models import Sum, Count, F
+from decimal import Decimal
 import logging
 
+from superpan.query_budget import query_budget
+
 from .models import Project, ProjectEstimate
 from .estimate_models import (
     EstimateCategory, EstimateUnit, EstimateRate, EstimateTemplate,
@@ -22,6 +25,39 @@ from .estimate_forms import (
 logger = logging.getLogger(__name__)
 
 
+ESTIMATE_TOTAL_FIELDS = ('labor_amount', 'material_amount', 'equipment_amount', 'total_amount')
+
+
+def _apply_estimate_totals(estimate, labor, material, equipment):
+    """
+    Записать суммы сметы, если они изменились.
+    spent_amount не сохраняется: его ведут F()-выражения (kanban/project_stats.py)
+    """
+    cent = Decimal('0.01')
+    old_totals = [getattr(estimate, field) for field in ESTIMATE_TOTAL_FIELDS]
+    estimate.labor_amount = Decimal(labor).quantize(cent)
+    estimate.material_amount = Decimal(material).quantize(cent)
+    estimate.equipment_amount = Decimal(equipment).quantize(cent)
+    estimate.total_amount = estimate.calculated_total
+    if [getattr(estimate, field) for field in ESTIMATE_TOTAL_FIELDS] != old_totals:
+        estimate.save(update_fields=[*ESTIMATE_TOTAL_FIELDS, 'updated_at'])
+
+
+def _recalculate_estimate(estimate):
+    """Пересчитать суммы сметы по позициям одним запросом"""
+    totals = estimate.items.aggregate(
+        labor=Sum(F('rate__labor_cost') * F('quantity')),
+        material=Sum(F('rate__material_cost') * F('quantity')),
+        equipment=Sum(F('rate__equipment_cost') * F('quantity')),
+    )
+    _apply_estimate_totals(
+        estimate,
+        totals['labor'] or Decimal('0.00'),
+        totals['material'] or Decimal('0.00'),
+        totals['equipment'] or Decimal('0.00'),
+    )
+
+
 @login_required
 def estimate_rates_list(request):
     """Список расценок"""
@@ -118,6 +154,7 @@ def calculate_estimate_cost(request):
 
 
 @login_required
+@query_budget(20)
 def project_estimate_detailed(request, pk):
     """Детализированная смета проекта"""
     project = get_object_or_404(Project, pk=pk)
@@ -137,17 +174,18 @@ def project_estimate_detailed(request, pk):
     )
     
     # Получаем позиции сметы
-    items = estimate.items.all().order_by('position')
-    
-    # Пересчитываем суммы
-    estimate.labor_amount = sum(item.rate.labor_cost * item.quantity for item in items)
-    estimate.material_amount = sum(item.rate.material_cost * item.quantity for item in items)
-    estimate.equipment_amount = sum(item.rate.equipment_cost * item.quantity for item in items)
-    estimate.total_amount = estimate.calculated_total
-    estimate.save()
+    items = list(estimate.items.select_related('rate__unit', 'rate__category').order_by('position'))
+    
+    # Пересчитываем суммы (запись только если позиции или расценки изменились)
+    _apply_estimate_totals(
+        estimate,
+        sum((item.rate.labor_cost * item.quantity for item in items), Decimal('0.00')),
+        sum((item.rate.material_cost * item.quantity for item in items), Decimal('0.00')),
+        sum((item.rate.equipment_cost * item.quantity for item in items), Decimal('0.00')),
+    )
     
     # Статистика
-    total_items = items.count()
+    total_items = len(items)
     total_quantity = sum(item.quantity for item in items)
     total_labor_hours = sum(item.rate.labor_hours * item.quantity for item in items)
     
@@ -204,11 +242,7 @@ def add_estimate_item(request, pk):
         )
         
         # Пересчитываем смету
-        estimate.labor_amount = sum(i.rate.labor_cost * i.quantity for i in estimate.items.all())
-        estimate.material_amount = sum(i.rate.material_cost * i.quantity for i in estimate.items.all())
-        estimate.equipment_amount = sum(i.rate.equipment_cost * i.quantity for i in estimate.items.all())
-        estimate.total_amount = estimate.calculated_total
-        estimate.save()
+        _recalculate_estimate(estimate)
         
         return JsonResponse({
             'success': True,
@@ -246,11 +280,7 @@ def remove_estimate_item(request, pk, item_id):
         
         # Пересчитываем смету
         estimate = project.estimate
-        estimate.labor_amount = sum(i.rate.labor_cost * i.quantity for i in estimate.items.all())
-        estimate.material_amount = sum(i.rate.material_cost * i.quantity for i in estimate.items.all())
-        estimate.equipment_amount = sum(i.rate.equipment_cost * i.quantity for i in estimate.items.all())
-        estimate.total_amount = estimate.calculated_total
-        estimate.save()
+        _recalculate_estimate(estimate)
         
         return JsonResponse({'success': True, 'message': 'Позиция удалена из сметы'})
         
@@ -399,7 +429,7 @@ def apply_template_to_project(request, pk, template_id):
         estimate.items.all().delete()
         
         # Добавляем позиции из шаблона
-        for template_item in template.items.all():
+        for template_item in template.items.select_related('rate'):
             ProjectEstimateItem.objects.create(
                 estimate=estimate,
                 rate=template_item.rate,
@@ -409,11 +439,7 @@ def apply_template_to_project(request, pk, template_id):
             )
         
         # Пересчитываем смету
-        estimate.labor_amount = sum(i.rate.labor_cost * i.quantity for i in estimate.items.all())
-        estimate.material_amount = sum(i.rate.material_cost * i.quantity for i in estimate.items.all())
-        estimate.equipment_amount = sum(i.rate.equipment_cost * i.quantity for i in estimate.items.all())
-        estimate.total_amount = estimate.calculated_total
-        estimate.save()
+        _recalculate_estimate(estimate)
         
         return JsonResponse({
             'success': True,
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from kanban.project_stats import compute_spent_amount
+from projects.models import Project, ProjectEstimate
+
+
+class Command(BaseCommand):
+    help = 'Сверяет потраченные суммы проектов и смет с выполненными задачами'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Исправить найденные расхождения'
+        )
+
+    def handle(self, *args, **options):
+        estimates = dict(ProjectEstimate.objects.values_list('project_id', 'spent_amount'))
+        mismatches = 0
+
+        for project_id, name, spent_amount in Project.objects.order_by('name').values_list(
+            'id', 'name', 'spent_amount'
+        ):
+            expected = compute_spent_amount(project_id)
+            estimate_spent = estimates.get(project_id, expected)
+            if spent_amount == expected and estimate_spent == expected:
+                continue
+
+            mismatches += 1
+            self.stdout.write(self.style.WARNING(
+                f'{name}: проект {spent_amount}, смета {estimate_spent}, по задачам {expected}'
+            ))
+
+            if options['fix']:
+                Project.objects.filter(pk=project_id).update(spent_amount=expected)
+                ProjectEstimate.objects.filter(project_id=project_id).update(spent_amount=expected)
+
+        if mismatches:
+            action = 'Исправлено' if options['fix'] else 'Найдено'
+            self.stdout.write(self.style.WARNING(f'{action} расхождений: {mismatches}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Расхождений не найдено'))
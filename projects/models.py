@@ -80,6 +80,16 @@ class Project(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем создателя и прораба, чтобы сбросить кэш доступа при их смене
+        instance._loaded_access_user_ids = (
+            instance.__dict__.get('created_by_id'),
+            instance.__dict__.get('foreman_id'),
+        )
+        return instance
+
     @property
     def remaining_budget(self):
         """Оставшийся бюджет"""
@@ -95,26 +105,26 @@ class Project(models.Model):
     def get_team_members(self):
         """Получить всех участников проекта"""
         from accounts.models import ProjectAccessKey
-        return ProjectAccessKey.objects.filter(
+        return ProjectAccessKey.objects.valid().filter(
             project_id=self.id,
-            is_active=True,
             assigned_to__isnull=False
         ).select_related('assigned_to')
 
     def can_user_access(self, user):
         """Проверить, может ли пользователь получить доступ к проекту"""
-        if user.is_admin_role():
-            return True
-        
-        if self.created_by == user or self.foreman == user:
-            return True
-            
-        from accounts.models import ProjectAccessKey
-        return ProjectAccessKey.objects.filter(
-            project_id=self.id,
-            assigned_to=user,
-            is_active=True
-        ).exists()
+        from .access import can_access_project
+        return can_access_project(user, self.id)
+
+    def save(self, *args, **kwargs):
+        # spent_amount ведется F()-выражениями при изменении задач
+        # (kanban/project_stats.py): полное сохранение загруженного проекта
+        # не должно затирать его устаревшим значением
+        if not self._state.adding and kwargs.get('update_fields') is None and len(args) < 4:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'spent_amount'
+            ]
+        super().save(*args, **kwargs)
 
     def update_spent_amount(self):
         """Обновить потраченную сумму на основе расходов"""
@@ -127,8 +137,10 @@ class Project(models.Model):
             total=models.Sum('amount')
         )['total'] or Decimal('0.00')
         
-        self.spent_amount = total_spent
-        self.save(update_fields=['spent_amount'])
+        # Обычно сумма уже актуальна (поддерживается при изменении задач)
+        if self.spent_amount != total_spent:
+            self.spent_amount = total_spent
+            self.save(update_fields=['spent_amount'])
 
 
 class ProjectMember(models.Model):
@@ -375,6 +387,16 @@ class ProjectEstimate(models.Model):
     def __str__(self):
         return f"Смета проекта {self.project.name}"
 
+    def save(self, *args, **kwargs):
+        # spent_amount ведется F()-выражениями, как и у проекта: полное
+        # сохранение загруженной сметы не должно затирать его
+        if not self._state.adding and kwargs.get('update_fields') is None and len(args) < 4:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'spent_amount'
+            ]
+        super().save(*args, **kwargs)
+
     @property
     def remaining_amount(self):
         """Оставшаяся сумма"""
@@ -416,5 +438,7 @@ class ProjectEstimate(models.Model):
             total=models.Sum('amount')
         )['total'] or Decimal('0.00')
         
-        self.spent_amount = total_spent
-        self.save(update_fields=['spent_amount'])
\ No newline at end of file
+        # Обычно сумма уже актуальна (поддерживается при изменении задач)
+        if self.spent_amount != total_spent:
+            self.spent_amount = total_spent
+            self.save(update_fields=['spent_amount'])
\ No newline at end of file
@@ -0,0 +1,42 @@
+"""
+Сигналы проектов: сброс кэша доступа (projects/access.py)
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.models import ProjectAccessKey
+
+from .access import invalidate_project_access
+from .models import Project, ProjectMember
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def project_changed(sender, instance, **kwargs):
+    """Создатель или прораб проекта изменился"""
+    current = (instance.created_by_id, instance.foreman_id)
+    loaded = getattr(instance, '_loaded_access_user_ids', (None, None))
+    if kwargs.get('created') is False and current == loaded:
+        return
+
+    invalidate_project_access(*current, *loaded)
+    instance._loaded_access_user_ids = current
+
+
+@receiver(post_save, sender=ProjectAccessKey)
+@receiver(post_delete, sender=ProjectAccessKey)
+def access_key_changed(sender, instance, **kwargs):
+    """Ключ доступа выдан, изменен или удален"""
+    invalidate_project_access(
+        instance.assigned_to_id,
+        getattr(instance, '_loaded_assigned_to_id', None)
+    )
+    instance._loaded_assigned_to_id = instance.assigned_to_id
+
+
+@receiver(post_save, sender=ProjectMember)
+@receiver(post_delete, sender=ProjectMember)
+def project_member_changed(sender, instance, **kwargs):
+    """Участник проекта добавлен, изменен или удален"""
+    invalidate_project_access(instance.user_id)
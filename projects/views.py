@@ -247,10 +247,9 @@ def generate_access_key(request, pk):
         # Создаем или получаем существующий ключ доступа
         if assigned_user:
             # Проверяем, есть ли уже активный ключ для этого пользователя
-            existing_key = ProjectAccessKey.objects.filter(
+            existing_key = ProjectAccessKey.objects.valid().filter(
                 project_id=project.id,
-                assigned_to=assigned_user,
-                is_active=True
+                assigned_to=assigned_user
             ).first()
             
             if existing_key:
@@ -299,9 +298,8 @@ def project_members(request, pk):
     
     members = project.members.filter(is_active=True).select_related('user')
     from accounts.models import ProjectAccessKey
-    access_keys = ProjectAccessKey.objects.filter(
-        project_id=project.id,
-        is_active=True
+    access_keys = ProjectAccessKey.objects.valid().filter(
+        project_id=project.id
     ).select_related('assigned_to')
     
     context = {
@@ -332,12 +330,12 @@ def project_estimate(request, pk):
         project=project,
         defaults={
             'total_amount': project.budget,
+            'spent_amount': project.spent_amount,
             'created_by': request.user
         }
     )
     
-    # Обновляем потраченную сумму
-    estimate.update_spent_amount()
+    # Потраченная сумма поддерживается при изменении задач (kanban/project_stats.py)
     
     # Получаем расходы проекта
     from kanban.models import ExpenseItem
@@ -397,7 +395,7 @@ def create_estimate(request, pk):
         
         if not created:
             estimate.total_amount = total_amount
-            estimate.save()
+            estimate.save(update_fields=['total_amount', 'updated_at'])
         
         return JsonResponse({
             'success': True,
@@ -0,0 +1,54 @@
+"""
+ASGI config for superpan project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+Запуск: gunicorn -k uvicorn.workers.UvicornWorker superpan.asgi:application
+(или SERVER_MODE=asgi в Docker). Все middleware проекта работают в обоих
+режимах, поэтому async-представления (дельта доски, статусы, SSE) не
+занимают поток на время ожидания.
+
+События lifespan запускают и останавливают бота в режиме webhook
+(TELEGRAM_BOT_MODE=webhook), остальное обрабатывает Django.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'superpan.settings')
+
+django_application = get_asgi_application()
+
+
+async def lifespan(scope, receive, send):
+    """Запуск и остановка Application бота вместе с воркером"""
+    from telegram_bot.webhook import (
+        is_webhook_mode,
+        shutdown_application,
+        start_application,
+    )
+
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            try:
+                if is_webhook_mode():
+                    await start_application()
+            except Exception as e:
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                return
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await shutdown_application()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(scope, receive, send)
+    return await django_application(scope, receive, send)
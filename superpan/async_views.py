@@ -0,0 +1,49 @@
+"""
+Вспомогательные функции для асинхронных представлений (ASGI)
+
+В Django 4.2 login_required и require_http_methods не поддерживают
+async-представления, а request.user загружается лениво синхронным
+запросом. Здесь - их асинхронные аналоги.
+"""
+
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+
+from django.http import HttpResponseNotAllowed, JsonResponse
+
+
+def _load_user(request):
+    return request.user if request.user.is_authenticated else None
+
+
+async def get_authenticated_user(request):
+    """Пользователь запроса или None (загрузка - в потоке)"""
+    return await sync_to_async(_load_user)(request)
+
+
+async def get_session_value(request, key, default=None):
+    """Значение из сессии (загрузка сессии - в потоке)"""
+    return await sync_to_async(request.session.get)(key, default)
+
+
+def async_login_required(view):
+    """Аналог login_required для async-представлений: 401 в JSON"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if await get_authenticated_user(request) is None:
+            return JsonResponse({'error': 'Требуется авторизация'}, status=401)
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def async_require_methods(*methods):
+    """Аналог require_http_methods для async-представлений"""
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return HttpResponseNotAllowed(methods)
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
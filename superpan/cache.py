@@ -0,0 +1,156 @@
+"""
+Общий кэш приложения
+
+Настройки CACHES строятся из REDIS_URL: при его наличии все псевдонимы
+работают через Redis и общие для всех воркеров gunicorn и бота. Без Redis
+используется файловый кэш (общий для процессов одной машины) или, для
+тестов, locmem.
+
+Бэкенды считают попадания и промахи по каждому псевдониму; счетчики
+ведутся в памяти процесса и отдаются мониторингу через cache_stats().
+
+Защита webhook от повторов (telegram_bot/webhook.py), RateLimiter очереди
+Telegram (telegram_bot/outbox.py) и django_ratelimit опираются на атомарные
+add()/incr(). Атомарны они только в Redis: в файловом кэше параллельные
+процессы могут пропустить повтор или недосчитать запросы, locmem не общий
+для процессов. Поэтому в продакшене с несколькими процессами нужен
+REDIS_URL; без него check_shared_cache выдает предупреждение.
+"""
+
+import threading
+from collections import defaultdict
+
+from django.core import checks
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+
+try:
+    from django.core.cache.backends.redis import RedisCache
+except ImportError:  # pragma: no cover - Django без поддержки Redis
+    RedisCache = None
+
+# Псевдонимы кэша: (время жизни по умолчанию, назначение)
+CACHE_ALIASES = {
+    'default': (300, 'Общие данные: доступ к проектам, сессии пользователей'),
+    'sessions': (8 * 60 * 60, 'Сессии Django (SESSION_CACHE_ALIAS)'),
+    'ratelimit': (3600, 'Счетчики rate limiting и защита webhook от повторов'),
+}
+# Отдельных псевдонимов для снимков досок и отчетов нет: снимок доски
+# строится за два запроса (kanban/board_snapshot.py), а ревизия доски
+# учитывает не все данные карточки (категории, авторы), так что кэш снимка
+# пришлось бы сбрасывать еще и по этим изменениям; отчеты строятся по запросу
+# и не кэшируются. Псевдоним добавляется здесь вместе с первым кэшем.
+
+# Маркер отсутствующего значения (None может быть сохраненным значением)
+_MISSING = object()
+
+_lock = threading.Lock()
+_stats = defaultdict(lambda: {'hits': 0, 'misses': 0})
+
+
+def _record(alias, hits, misses):
+    with _lock:
+        entry = _stats[alias]
+        entry['hits'] += hits
+        entry['misses'] += misses
+
+
+def cache_stats():
+    """Счетчики попаданий/промахов по псевдонимам (в этом процессе)"""
+    with _lock:
+        return {alias: dict(entry) for alias, entry in _stats.items()}
+
+
+def reset_cache_stats():
+    with _lock:
+        _stats.clear()
+
+
+class CacheStatsMixin:
+    """Подсчет попаданий и промахов get/get_many"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Псевдоним совпадает с префиксом ключей (см. build_caches)
+        self.stats_alias = self.key_prefix or 'default'
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version=version)
+        if value is _MISSING:
+            _record(self.stats_alias, 0, 1)
+            return default
+        _record(self.stats_alias, 1, 0)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = super().get_many(keys, version=version)
+        _record(self.stats_alias, len(found), len(keys) - len(found))
+        return found
+
+
+class CountingLocMemCache(CacheStatsMixin, LocMemCache):
+    pass
+
+
+class CountingFileBasedCache(CacheStatsMixin, FileBasedCache):
+    pass
+
+
+if RedisCache is not None:
+    class CountingRedisCache(CacheStatsMixin, RedisCache):
+        pass
+
+
+def build_caches(redis_url='', fallback='file', cache_dir=None, version=1):
+    """
+    Настройки CACHES для всех псевдонимов.
+    redis_url - адрес Redis; если пуст, используется fallback
+    ('file' - файловый кэш в cache_dir, 'locmem' - память процесса).
+    version - версия ключей: ее увеличение делает недействительными все
+    записи (например, после изменения формата кэшируемых структур).
+    """
+    caches = {}
+    for alias, (timeout, _purpose) in CACHE_ALIASES.items():
+        config = {
+            'TIMEOUT': timeout,
+            'KEY_PREFIX': alias,
+            'VERSION': version,
+        }
+        if redis_url:
+            config.update(
+                BACKEND='superpan.cache.CountingRedisCache',
+                LOCATION=redis_url,
+            )
+        elif fallback == 'file':
+            config.update(
+                BACKEND='superpan.cache.CountingFileBasedCache',
+                LOCATION=str(cache_dir / alias),
+                OPTIONS={'MAX_ENTRIES': 10000},
+            )
+        else:
+            config.update(
+                BACKEND='superpan.cache.CountingLocMemCache',
+                LOCATION=alias,
+            )
+        caches[alias] = config
+    return caches
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Предупреждение, если rate limiting и защита от повторов работают без Redis.
+    Выдается вне DEBUG, в том числе при migrate в командах запуска.
+    """
+    from django.conf import settings
+
+    backend = settings.CACHES.get('ratelimit', {}).get('BACKEND', '')
+    if settings.DEBUG or backend.endswith('RedisCache'):
+        return []
+    return [checks.Warning(
+        'Кэш ratelimit работает без Redis: add()/incr() не атомарны между процессами',
+        hint='Задайте REDIS_URL: защита webhook от повторов и rate limiting '
+             'корректны только в общем кэше Redis',
+        id='superpan.W001',
+    )]
@@ -0,0 +1,17 @@
+"""
+SQLite с настройкой соединения через PRAGMA
+
+Django 4.2 не поддерживает init_command для SQLite, поэтому PRAGMA из
+ключа PRAGMAS настроек базы выполняются при открытии каждого соединения.
+"""
+
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict.get('PRAGMAS', {}).items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
@@ -0,0 +1,215 @@
+"""
+Метрики запросов
+
+Время ответа, число SQL-запросов и время в БД по имени URL собираются в
+гистограммы с логарифмическими корзинами (как в HDR Histogram: точность
+относительная, память фиксированная). Отдаются в текстовом формате
+Prometheus на /management/metrics.
+
+Каждый воркер gunicorn ведет свои гистограммы в памяти и не чаще раза в
+FLUSH_INTERVAL секунд записывает их снимок в METRICS_DIR (файл на процесс).
+Опрос любого воркера суммирует снимки всех процессов, поэтому счетчики не
+скачут между воркерами. Снимки завершившихся процессов остаются в сумме,
+чтобы счетчики не уменьшались; каталог можно очищать при перезапуске сервиса.
+Без METRICS_DIR отдаются метрики только опрошенного процесса.
+"""
+
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+
+from .cache import cache_stats
+
+logger = logging.getLogger(__name__)
+
+# Снимок процесса записывается не чаще раза в N секунд
+FLUSH_INTERVAL = 1.0
+
+
+def _log_buckets(start, end, per_doubling=2):
+    """Границы корзин от start до end, per_doubling корзин на удвоение"""
+    bounds = []
+    factor = 2 ** (1 / per_doubling)
+    value = start
+    while value < end:
+        bounds.append(round(value, 6))
+        value *= factor
+    bounds.append(end)
+    return tuple(bounds)
+
+
+# Время (секунды): от 1 мс до ~1 минуты
+SECONDS_BUCKETS = _log_buckets(0.001, 65.536)
+# Число SQL-запросов
+QUERY_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин"""
+
+    __slots__ = ('bounds', 'counts', 'total', 'count')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        # Последняя корзина - значения больше верхней границы (+Inf)
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+# name -> (описание, границы корзин)
+METRICS = {
+    'superpan_request_duration_seconds': ('Время обработки запроса', SECONDS_BUCKETS),
+    'superpan_request_db_queries': ('Число SQL-запросов на запрос', QUERY_BUCKETS),
+    'superpan_request_db_seconds': ('Время SQL-запросов на запрос', SECONDS_BUCKETS),
+}
+
+_lock = threading.Lock()
+_histograms = {name: defaultdict(lambda bounds=bounds: Histogram(bounds)) for name, (_, bounds) in METRICS.items()}
+
+
+_last_flush = 0.0
+
+
+def observe_request(view, duration, queries, db_time):
+    """Записать один запрос"""
+    global _last_flush
+    with _lock:
+        _histograms['superpan_request_duration_seconds'][view].observe(duration)
+        _histograms['superpan_request_db_queries'][view].observe(queries)
+        _histograms['superpan_request_db_seconds'][view].observe(db_time)
+        now = time.monotonic()
+        flush = now - _last_flush >= FLUSH_INTERVAL
+        if flush:
+            _last_flush = now
+
+    if flush:
+        _flush_snapshot()
+
+
+def reset_metrics():
+    with _lock:
+        for histograms in _histograms.values():
+            histograms.clear()
+
+
+def _metrics_dir():
+    directory = getattr(settings, 'METRICS_DIR', '')
+    return Path(directory) if directory else None
+
+
+def _snapshot():
+    """Метрики этого процесса в виде, пригодном для JSON"""
+    with _lock:
+        histograms = {
+            name: {
+                view: {'counts': list(histogram.counts), 'total': histogram.total, 'count': histogram.count}
+                for view, histogram in by_view.items()
+            }
+            for name, by_view in _histograms.items()
+        }
+    return {'histograms': histograms, 'cache': cache_stats()}
+
+
+def _flush_snapshot(snapshot=None):
+    """Записать снимок этого процесса в METRICS_DIR"""
+    directory = _metrics_dir()
+    if directory is None:
+        return
+    if snapshot is None:
+        snapshot = _snapshot()
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f'{os.getpid()}.json'
+        temp_path = directory / f'{os.getpid()}.{threading.get_ident()}.tmp'
+        temp_path.write_text(json.dumps(snapshot))
+        # Замена атомарна: читатель не увидит недописанный файл
+        os.replace(temp_path, path)
+    except OSError as e:
+        logger.error(f"Ошибка записи метрик: {e}")
+
+
+def _merge(total, snapshot):
+    for name, by_view in snapshot.get('histograms', {}).items():
+        if name not in METRICS:
+            continue
+        size = len(METRICS[name][1]) + 1
+        for view, entry in by_view.items():
+            # Снимок с другими границами корзин (после обновления) пропускаем
+            if len(entry['counts']) != size:
+                continue
+            merged = total['histograms'][name].setdefault(
+                view, {'counts': [0] * size, 'total': 0, 'count': 0}
+            )
+            merged['counts'] = [a + b for a, b in zip(merged['counts'], entry['counts'])]
+            merged['total'] += entry['total']
+            merged['count'] += entry['count']
+    for alias, entry in snapshot.get('cache', {}).items():
+        merged = total['cache'].setdefault(alias, {'hits': 0, 'misses': 0})
+        merged['hits'] += entry['hits']
+        merged['misses'] += entry['misses']
+
+
+def collect_metrics():
+    """Метрики всех процессов (при METRICS_DIR) или только этого процесса"""
+    snapshot = _snapshot()
+    directory = _metrics_dir()
+    if directory is None:
+        return snapshot
+
+    _flush_snapshot(snapshot)
+    total = {'histograms': {name: {} for name in METRICS}, 'cache': {}}
+    for path in directory.glob('*.json'):
+        try:
+            _merge(total, json.loads(path.read_text()))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Пропущен снимок метрик {path.name}: {e}")
+    return total
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_bound(bound):
+    return f'{bound:g}'
+
+
+def render_prometheus():
+    """Все метрики в текстовом формате Prometheus"""
+    lines = []
+    collected = collect_metrics()
+    for name, (description, bounds) in METRICS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} histogram')
+        for view, histogram in sorted(collected['histograms'][name].items()):
+            label = f'view="{_escape(view)}"'
+            cumulative = 0
+            for bound, count in zip(bounds, histogram['counts']):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{label},le="{_format_bound(bound)}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{label},le="+Inf"}} {histogram["count"]}')
+            lines.append(f'{name}_sum{{{label}}} {histogram["total"]:g}')
+            lines.append(f'{name}_count{{{label}}} {histogram["count"]}')
+
+    stats = collected['cache']
+    for result in ('hits', 'misses'):
+        name = f'superpan_cache_{result}_total'
+        lines.append(f'# HELP {name} Обращения к кэшу ({result})')
+        lines.append(f'# TYPE {name} counter')
+        for alias, entry in sorted(stats.items()):
+            lines.append(f'{name}{{alias="{_escape(alias)}"}} {entry[result]}')
+
+    return '\n'.join(lines) + '\n'
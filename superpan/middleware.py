@@ -1,29 +1,246 @@
 import logging
+import random
 import time
 import traceback
-from django.utils.deprecation import MiddlewareMixin
+from contextlib import ExitStack, asynccontextmanager
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.http import JsonResponse
 from django.conf import settings
+from django.db import connection
+
+from .metrics import observe_request
+from .query_budget import QueryRecorder, check_queries, get_query_budget, DEFAULT_REPEAT_THRESHOLD
 
 logger = logging.getLogger(__name__)
 
 
-class ErrorLoggingMiddleware(MiddlewareMixin):
+class _QueryTimer:
+    """Обертка выполнения SQL: число запросов и суммарное время"""
+
+    __slots__ = ('count', 'elapsed')
+
+    def __init__(self):
+        self.count = 0
+        self.elapsed = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.elapsed += time.perf_counter() - started
+            self.count += 1
+
+
+@asynccontextmanager
+async def request_thread_execute_wrapper(wrapper):
+    """
+    connection.execute_wrapper для async-цепочки middleware (ASGI).
+    Соединения Django привязаны к потоку, а синхронный код запроса (ORM,
+    sync-представления) выполняется не в потоке event loop, а в потоке
+    sync_to_async этого запроса - обертка ставится на его соединение.
     """
-    Middleware для логирования ошибок и мониторинга производительности
+    stack = ExitStack()
+    await sync_to_async(lambda: stack.enter_context(connection.execute_wrapper(wrapper)))()
+    try:
+        yield
+    finally:
+        await sync_to_async(stack.close)()
+
+
+class MetricsMiddleware:
+    """
+    Middleware для сбора метрик запросов: время ответа, число и время
+    SQL-запросов по имени URL (см. superpan/metrics.py).
+    Замеряется доля запросов METRICS_SAMPLE_RATE (от 0 до 1).
+    Под ASGI SQL считается на соединении потока sync_to_async запроса.
     """
     
-    def process_request(self, request):
-        """Начало обработки запроса"""
-        request.start_time = time.time()
-        logger.info(f"Request started: {request.method} {request.path}")
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'METRICS_SAMPLE_RATE', 1.0)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+    
+    def _sampled(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+    
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+        
+        timer = _QueryTimer()
+        started = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        self._observe(request, started, timer)
+        return response
+    
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+        
+        timer = _QueryTimer()
+        started = time.perf_counter()
+        async with request_thread_execute_wrapper(timer):
+            response = await self.get_response(request)
+        self._observe(request, started, timer)
+        return response
+    
+    @staticmethod
+    def _observe(request, started, timer):
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        view = match.view_name if match is not None else 'unresolved'
+        observe_request(view, duration, timer.count, timer.elapsed)
+
+
+class QueryInspectionMiddleware:
+    """
+    Middleware для разработки и тестов: поиск N+1 и проверка бюджета
+    SQL-запросов представлений (см. superpan/query_budget.py)
+    """
+    
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.threshold = getattr(settings, 'QUERY_REPEAT_THRESHOLD', DEFAULT_REPEAT_THRESHOLD)
+        self.strict = getattr(settings, 'QUERY_BUDGET_STRICT', False)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        request.query_budget = None
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        self._check(request, recorder)
+        return response
+    
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        request.query_budget = None
+        async with request_thread_execute_wrapper(recorder):
+            response = await self.get_response(request)
+        self._check(request, recorder)
+        return response
+    
+    def _check(self, request, recorder):
+        match = request.resolver_match
+        view = match.view_name if match is not None else request.path
+        check_queries(view, recorder, request.query_budget, self.threshold, self.strict)
+    
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_query_budget(view_func)
         return None
+
+
+# Security headers: строки собираются один раз при импорте
+CONTENT_SECURITY_POLICY = (
+    "default-src 'self'; "
+    "script-src 'self' 'unsafe-inline' 'unsafe-eval' https://cdn.jsdelivr.net; "
+    "style-src 'self' 'unsafe-inline' https://fonts.googleapis.com https://cdn.jsdelivr.net; "
+    "font-src 'self' https://fonts.gstatic.com; "
+    "img-src 'self' data: https:; "
+    "connect-src 'self'; "
+    "frame-ancestors 'none';"
+)
+
+PERMISSIONS_POLICY = (
+    "geolocation=(), "
+    "microphone=(), "
+    "camera=(), "
+    "payment=(), "
+    "usb=(), "
+    "magnetometer=(), "
+    "accelerometer=(), "
+    "gyroscope=()"
+)
+
+SECURITY_HEADERS = (
+    ('Content-Security-Policy', CONTENT_SECURITY_POLICY),
+    ('Referrer-Policy', 'strict-origin-when-cross-origin'),
+    ('Permissions-Policy', PERMISSIONS_POLICY),
+)
+
+
+class PrefixTrie:
+    """Поиск самого длинного префикса пути среди заданных"""
+    
+    __slots__ = ('root',)
+    
+    _END = object()
+    
+    def __init__(self, prefixes=()):
+        self.root = {}
+        for prefix in prefixes:
+            self.add(prefix)
+    
+    def add(self, prefix, value=True):
+        node = self.root
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node[self._END] = value
+    
+    def match(self, path):
+        """Значение самого длинного префикса path или None"""
+        node = self.root
+        found = node.get(self._END)
+        for char in path:
+            node = node.get(char)
+            if node is None:
+                break
+            found = node.get(self._END, found)
+        return found
+
+
+class ResponseMiddleware:
+    """
+    Middleware для security headers, кодировки UTF-8 и логирования ошибок.
+    Работает и под WSGI, и под ASGI без переключения потоков; заголовки
+    собраны заранее, исключенные пути (SECURITY_HEADERS_EXEMPT_PATHS)
+    определяются по дереву префиксов.
+    """
+    
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.headers = SECURITY_HEADERS
+        self.exempt = PrefixTrie(getattr(settings, 'SECURITY_HEADERS_EXEMPT_PATHS', ()))
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.start_time = time.time()
+        return self.process_response(request, self.get_response(request))
+    
+    async def __acall__(self, request):
+        request.start_time = time.time()
+        return self.process_response(request, await self.get_response(request))
     
     def process_response(self, request, response):
-        """Окончание обработки запроса"""
-        if hasattr(request, 'start_time'):
-            duration = time.time() - request.start_time
-            logger.info(f"Request completed: {request.method} {request.path} - {response.status_code} ({duration:.3f}s)")
+        if not self.exempt.match(request.path):
+            for name, value in self.headers:
+                response[name] = value
+        
+        # Принудительно устанавливаем UTF-8 кодировку для текстовых ответов
+        content_type = response.get('Content-Type', '')
+        if content_type.startswith('text/') and 'charset=' not in content_type:
+            response['Content-Type'] = f"{content_type}; charset=utf-8"
+        
         return response
     
     def process_exception(self, request, exception):
@@ -58,39 +275,3 @@ class ErrorLoggingMiddleware(MiddlewareMixin):
             'error': 'Internal server error',
             'path': request.path,
         }, status=500)
-
-
-class SecurityHeadersMiddleware(MiddlewareMixin):
-    """
-    Middleware для добавления security headers
-    """
-    
-    def process_response(self, request, response):
-        """Добавляем security headers"""
-        # Content Security Policy
-        response['Content-Security-Policy'] = (
-            "default-src 'self'; "
-            "script-src 'self' 'unsafe-inline' 'unsafe-eval' https://cdn.jsdelivr.net; "
-            "style-src 'self' 'unsafe-inline' https://fonts.googleapis.com https://cdn.jsdelivr.net; "
-            "font-src 'self' https://fonts.gstatic.com; "
-            "img-src 'self' data: https:; "
-            "connect-src 'self'; "
-            "frame-ancestors 'none';"
-        )
-        
-        # Referrer Policy
-        response['Referrer-Policy'] = 'strict-origin-when-cross-origin'
-        
-        # Permissions Policy
-        response['Permissions-Policy'] = (
-            "geolocation=(), "
-            "microphone=(), "
-            "camera=(), "
-            "payment=(), "
-            "usb=(), "
-            "magnetometer=(), "
-            "accelerometer=(), "
-            "gyroscope=()"
-        )
-        
-        return response
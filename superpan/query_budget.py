@@ -0,0 +1,79 @@
+"""
+Бюджет SQL-запросов представлений и поиск N+1
+
+Представление объявляет бюджет декоратором @query_budget(N) (для DRF и
+классов - атрибутом query_budget). QueryInspectionMiddleware, включаемый в
+разработке и тестах (QUERY_INSPECTION), считает запросы, группирует их по
+форме SQL и сообщает о повторах одной формы (признак N+1) и о превышении
+бюджета. При QUERY_BUDGET_STRICT превышение бюджета - исключение, так что
+тесты падают на регрессиях.
+"""
+
+import logging
+import re
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Сколько повторов одной формы SQL считается N+1
+DEFAULT_REPEAT_THRESHOLD = 5
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+class QueryBudgetExceeded(Exception):
+    """Представление выполнило больше запросов, чем объявлено"""
+
+
+def query_budget(max_queries):
+    """Объявить максимальное число SQL-запросов представления"""
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+def get_query_budget(view_func):
+    """Бюджет представления (функции, класса Django или DRF) или None"""
+    budget = getattr(view_func, 'query_budget', None)
+    if budget is None:
+        view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+        budget = getattr(view_class, 'query_budget', None)
+    return budget
+
+
+def sql_shape(sql):
+    """Форма запроса: SQL без значений, списки IN свернуты"""
+    return _LITERAL.sub('?', _IN_LIST.sub('IN (...)', sql))
+
+
+class QueryRecorder:
+    """Обертка выполнения SQL: запоминает формы запросов"""
+
+    def __init__(self):
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.shapes[sql_shape(sql)] += 1
+        return execute(sql, params, many, context)
+
+    @property
+    def count(self):
+        return sum(self.shapes.values())
+
+    def repeated(self, threshold=DEFAULT_REPEAT_THRESHOLD):
+        """Формы, повторенные не менее threshold раз: [(форма, количество)]"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+def check_queries(view_name, recorder, budget=None, threshold=DEFAULT_REPEAT_THRESHOLD, strict=False):
+    """Сообщить о N+1 и превышении бюджета; при strict - исключение"""
+    for shape, count in recorder.repeated(threshold):
+        logger.warning(f"Possible N+1 in {view_name}: {count} x {shape[:300]}")
+
+    if budget is not None and recorder.count > budget:
+        message = f"{view_name}: {recorder.count} SQL queries, budget {budget}"
+        if strict:
+            raise QueryBudgetExceeded(message)
+        logger.error(f"Query budget exceeded in {message}")
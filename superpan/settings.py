@@ -70,6 +70,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'superpan.middleware.MetricsMiddleware',  # Метрики запросов (/management/metrics)
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -77,10 +78,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'superpan.middleware.ErrorLoggingMiddleware',  # Логирование ошибок
-    'superpan.middleware.SecurityHeadersMiddleware',  # Security headers
+    'superpan.middleware.ResponseMiddleware',  # Security headers, UTF-8, логирование ошибок
     'telegram_bot.middleware.TelegramWebhookSecurityMiddleware',  # Безопасность webhook
-    'superpan.encoding_middleware.UTF8EncodingMiddleware',  # Кодировка UTF-8
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -104,28 +103,67 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'superpan.wsgi.application'
+ASGI_APPLICATION = 'superpan.asgi.application'
+
+# Режим сервера: 'wsgi' (gunicorn) или 'asgi' (uvicorn), задается в Dockerfile и Makefile
+SERVER_MODE = config('SERVER_MODE', default='wsgi')
 
 # Database
 import dj_database_url
 
+# Постоянные соединения: соединение живет DB_CONN_MAX_AGE секунд и
+# переиспользуется между запросами, перед запросом проверяется его состояние
+DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=60, cast=int)
+# Под ASGI синхронный код каждого запроса выполняется в новом потоке, и
+# постоянное соединение этого потока больше не используется и не закрывается.
+# Соединения закрываются после каждого запроса; переиспользование
+# соединений под ASGI - через pgbouncer (DB_PGBOUNCER=True)
+if SERVER_MODE == 'asgi':
+    DB_CONN_MAX_AGE = 0
+DB_CONN_HEALTH_CHECKS = config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool)
+
 # Настройка базы данных для продакшена
 if config('DATABASE_URL', default=None):
     DATABASES = {
-        'default': dj_database_url.parse(config('DATABASE_URL'))
+        'default': dj_database_url.parse(
+            config('DATABASE_URL'),
+            conn_max_age=DB_CONN_MAX_AGE,
+            conn_health_checks=DB_CONN_HEALTH_CHECKS,
+        )
     }
+    # pgbouncer в режиме transaction pooling: серверные курсоры не переживают
+    # смену соединения между транзакциями
+    if config('DB_PGBOUNCER', default=False, cast=bool):
+        DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
 else:
-    # SQLite для разработки
+    # SQLite для разработки и установок на одном сервере
     DATABASES = {
         'default': {
-            'ENGINE': 'django.db.backends.sqlite3',
+            'ENGINE': 'superpan.db_backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
-            'OPTIONS': {
-                'timeout': 20,
-                'init_command': "PRAGMA encoding='UTF-8'",
-            }
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
+            # WAL: чтение не блокируется записью; NORMAL достаточно для WAL
+            'PRAGMAS': {
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'busy_timeout': 20000,
+            },
         }
     }
 
+# Кэш: Redis из REDIS_URL, без него - файловый кэш ('locmem' для тестов)
+from superpan.cache import build_caches
+
+CACHES = build_caches(
+    redis_url=config('REDIS_URL', default=''),
+    fallback=config('CACHE_FALLBACK', default='file'),
+    cache_dir=BASE_DIR / '.cache',
+    version=config('CACHE_VERSION', default=1, cast=int),
+)
+SESSION_CACHE_ALIAS = 'sessions'
+RATELIMIT_USE_CACHE = 'ratelimit'
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -179,6 +217,43 @@ CSRF_TRUSTED_ORIGINS = [
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', '8367784150:AAF7m6ZWW9BcoV17YOqnkLp1ScPmYpssy_E')
 TELEGRAM_BOT_USERNAME = os.getenv('TELEGRAM_BOT_USERNAME', 'projectpanell_bot').replace('@', '')
 TELEGRAM_WEBHOOK_URL = os.getenv('TELEGRAM_WEBHOOK_URL', '')
+# Прием обновлений: 'polling' (отдельный процесс run_telegram_bot.py) или
+# 'webhook' (ASGI-процесс Django, /telegram/webhook/)
+TELEGRAM_BOT_MODE = config('TELEGRAM_BOT_MODE', default='polling')
+
+# Очередь исходящих сообщений бота (telegram_bot/outbox.py): общий предел
+# сообщений в секунду, интервал между сообщениями в один чат, число попыток
+TELEGRAM_OUTBOX_GLOBAL_RATE = config('TELEGRAM_OUTBOX_GLOBAL_RATE', default=25, cast=int)
+TELEGRAM_OUTBOX_CHAT_INTERVAL = config('TELEGRAM_OUTBOX_CHAT_INTERVAL', default=1.0, cast=float)
+TELEGRAM_OUTBOX_MAX_ATTEMPTS = config('TELEGRAM_OUTBOX_MAX_ATTEMPTS', default=5, cast=int)
+
+# Живые события канбан-доски (SSE)
+KANBAN_EVENTS_BACKEND = config('KANBAN_EVENTS_BACKEND', default='kanban.live_events.InProcessBroker')
+KANBAN_EVENTS_KEEPALIVE = config('KANBAN_EVENTS_KEEPALIVE', default=15, cast=int)
+# Максимальная длительность одного SSE-соединения (секунды), затем клиент переподключается
+KANBAN_EVENTS_MAX_LIFETIME = config('KANBAN_EVENTS_MAX_LIFETIME', default=300, cast=int)
+# Под WSGI потока событий нет: доска опрашивает board_delta с этим интервалом (секунды)
+KANBAN_DELTA_POLL_INTERVAL = config('KANBAN_DELTA_POLL_INTERVAL', default=15, cast=int)
+
+# Префиксы путей без security headers. По умолчанию заголовки получают все
+# ответы, включая загруженные файлы (/media/), которым CSP нужнее всего
+SECURITY_HEADERS_EXEMPT_PATHS = []
+
+# Поиск N+1 и бюджеты SQL-запросов представлений (разработка и тесты);
+# QUERY_BUDGET_STRICT превращает превышение бюджета в исключение
+QUERY_INSPECTION = config('QUERY_INSPECTION', default=DEBUG, cast=bool)
+QUERY_BUDGET_STRICT = config('QUERY_BUDGET_STRICT', default=False, cast=bool)
+QUERY_REPEAT_THRESHOLD = config('QUERY_REPEAT_THRESHOLD', default=5, cast=int)
+if QUERY_INSPECTION:
+    MIDDLEWARE.insert(1, 'superpan.middleware.QueryInspectionMiddleware')
+
+# Метрики запросов: доля замеряемых запросов и токен для Prometheus
+# (без токена /management/metrics доступен только суперпользователям)
+METRICS_SAMPLE_RATE = config('METRICS_SAMPLE_RATE', default=1.0, cast=float)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+# Каталог снимков метрик процессов: /management/metrics суммирует все воркеры
+# (пустая строка - метрики только опрошенного процесса)
+METRICS_DIR = config('METRICS_DIR', default=str(BASE_DIR / '.metrics'))
 
 # Настройки cookies - безопасные для продакшена
 CSRF_COOKIE_SECURE = not DEBUG  # True для HTTPS в продакшене
@@ -281,6 +356,23 @@ SESSION_COOKIE_SAMESITE = 'Lax'  # Изменено на Lax для мобиль
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 SESSION_COOKIE_AGE = 8 * 60 * 60  # 8 hours
 
+# Сессии читаются из кэша, БД - только при промахе
+# ('django.contrib.sessions.backends.cache' - без БД совсем)
+SESSION_ENGINE = config('SESSION_ENGINE', default='django.contrib.sessions.backends.cached_db')
+
+# Время последней активности пишется в БД не чаще раза в N секунд
+SESSION_ACTIVITY_FLUSH_INTERVAL = config('SESSION_ACTIVITY_FLUSH_INTERVAL', default=60, cast=int)
+
+# Контроль сессий: тайм-аут неактивности (SESSION_TIMEOUT_MINUTES), единственная
+# активная сессия (вход завершает прежние сессии Django) и привязка к устройству.
+# По умолчанию выключен, как и до появления UserSessionMiddleware
+SESSION_ENFORCEMENT = config('SESSION_ENFORCEMENT', default=False, cast=bool)
+if SESSION_ENFORCEMENT:
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('django.contrib.messages.middleware.MessageMiddleware') + 1,
+        'accounts.middleware.UserSessionMiddleware'  # Тайм-аут, единственная сессия, устройство
+    )
+
 # CSRF settings for security
 CSRF_COOKIE_SECURE = not DEBUG
 CSRF_COOKIE_HTTPONLY = True
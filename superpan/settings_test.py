@@ -0,0 +1,24 @@
+"""
+Настройки для тестов (pytest.ini: DJANGO_SETTINGS_MODULE)
+
+Бюджеты SQL-запросов проверяются строго: превышение бюджета - исключение,
+поэтому тест представления падает на регрессии (см. superpan/query_budget.py).
+"""
+
+from .cache import build_caches
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, MIDDLEWARE
+
+QUERY_INSPECTION = True
+QUERY_BUDGET_STRICT = True
+if 'superpan.middleware.QueryInspectionMiddleware' not in MIDDLEWARE:
+    MIDDLEWARE.insert(1, 'superpan.middleware.QueryInspectionMiddleware')
+
+# Кэш в памяти процесса: тесты не зависят от Redis и друг от друга
+CACHES = build_caches(fallback='locmem', cache_dir=BASE_DIR / '.cache')
+
+# Метрики только в памяти процесса
+METRICS_DIR = ''
+
+# Быстрое хеширование паролей
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
@@ -20,6 +20,7 @@ urlpatterns = [
     path('kanban/', include('kanban.urls')),
     path('warehouse/', include('warehouse.urls')),
     path('api/', include('api.urls')),
+    path('telegram/', include('telegram_bot.urls')),
     
     # API Documentation - временно отключено
     # path('api/schema/', include('drf_spectacular.urls')),
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class TelegramBotConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'telegram_bot'
+    verbose_name = 'Telegram бот'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -1,7 +1,8 @@
 import os
+import asyncio
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters, ContextTypes
+from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, TypeHandler, filters, ContextTypes
 from django.conf import settings
 from asgiref.sync import sync_to_async
 
@@ -18,22 +19,39 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'superpan.settings')
 django.setup()
 
 from accounts.models import TelegramUser, User, TelegramAuthToken
-from projects.models import Project, ProjectMember
-from kanban.models import ExpenseItem, ConstructionStage, ExpenseCategory
-from django.db import models
-from django.db.models import Q
+from projects.models import Project
+from kanban.models import ExpenseItem, ConstructionStage
+from django.core.exceptions import PermissionDenied
+from django.db import close_old_connections
+
+from . import screens
 
 
 class ConstructionBot:
     """Telegram бот для управления строительными проектами"""
     
     def __init__(self):
+        from .webhook import is_webhook_mode
+
         self.token = settings.TELEGRAM_BOT_TOKEN
-        self.application = Application.builder().token(self.token).build()
+        self.outbox_task = None
+        builder = Application.builder().token(self.token)
+        if is_webhook_mode():
+            # Обновления приходят через представление webhook, user_data -
+            # в общем кэше, т.к. обновления пользователя попадают в разные воркеры
+            from .persistence import CacheUserDataPersistence
+            builder = builder.updater(None).persistence(CacheUserDataPersistence())
+        else:
+            # В режиме webhook отправителя запускает telegram_bot.webhook
+            builder = builder.post_init(self.start_outbox).post_shutdown(self.stop_outbox)
+        self.application = builder.build()
         self.setup_handlers()
     
     def setup_handlers(self):
         """Настройка обработчиков команд"""
+        # Перед каждым обновлением закрываем устаревшие соединения с БД
+        self.application.add_handler(TypeHandler(Update, self.refresh_db_connections), group=-1)
+        
         # Команды
         self.application.add_handler(CommandHandler("start", self.start_command))
         self.application.add_handler(CommandHandler("help", self.help_command))
@@ -54,6 +72,41 @@ class ConstructionBot:
         
         # Обработчик текстовых сообщений
         self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
+        
+        # После всех обработчиков сохраняем user_data (только в режиме webhook)
+        if self.application.persistence is not None:
+            self.application.add_handler(TypeHandler(Update, self.save_user_data), group=100)
+    
+    async def refresh_db_connections(self, update, context):
+        """Соединения с истекшим CONN_MAX_AGE или разорванные закрываются, как после запроса Django"""
+        await sync_to_async(close_old_connections)()
+    
+    async def save_user_data(self, update, context):
+        """
+        Записать user_data в кэш сразу после обновления: PTB перечитывает их
+        из кэша перед каждым обновлением, а сам пишет только раз в update_interval
+        """
+        if update.effective_user is not None:
+            await self.application.persistence.update_user_data(
+                update.effective_user.id, context.user_data
+            )
+    
+    async def start_outbox(self, application):
+        """Запустить отправителя очереди исходящих сообщений (telegram_bot/outbox.py)"""
+        from .outbox import OutboxSender
+        
+        if self.outbox_task is None:
+            self.outbox_task = asyncio.create_task(OutboxSender(application.bot).run())
+    
+    async def stop_outbox(self, application=None):
+        """Остановить отправителя; неотправленные сообщения останутся в очереди"""
+        if self.outbox_task is not None:
+            self.outbox_task.cancel()
+            try:
+                await self.outbox_task
+            except asyncio.CancelledError:
+                pass
+            self.outbox_task = None
     
     async def send_message(self, update, text, reply_markup=None):
         """Универсальная функция для отправки сообщений"""
@@ -76,6 +129,28 @@ class ConstructionBot:
             logger.error(f"Ошибка отправки сообщения пользователю {user_id}: {e}")
             return False
     
+    def menu_text(self, user):
+        """Текст главного меню"""
+        return f"""
+🏗️ Добро пожаловать в систему управления проектами, {user.full_name}!
+
+Ваша роль: {user.role_display}
+
+Выберите действие:
+            """
+    
+    def menu_keyboard(self, panel_url, with_help=True):
+        """Кнопки главного меню"""
+        keyboard = [
+            [InlineKeyboardButton("🌐 Вернуться в панель", url=panel_url)],
+            [InlineKeyboardButton("📋 Мои задачи", callback_data="tasks")],
+            [InlineKeyboardButton("🏗️ Проекты", callback_data="projects")],
+            [InlineKeyboardButton("➕ Создать задачу", callback_data="create_task")],
+        ]
+        if with_help:
+            keyboard.append([InlineKeyboardButton("❓ Помощь", callback_data="help")])
+        return InlineKeyboardMarkup(keyboard)
+    
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда /start"""
         user = update.effective_user
@@ -92,71 +167,12 @@ class ConstructionBot:
             if context.args[0].startswith('auth_'):
                 auth_token = context.args[0][5:]  # Убираем префикс 'auth_'
                 print(f"[AUTH] Найден токен авторизации: {auth_token}")
-                await self.handle_auth_token(update, context, auth_token, user)
+                await self.confirm_auth_token(update, auth_token)
                 return
             elif context.args[0] == 'login':
                 # Пользователь отправил /start login - проверяем авторизацию
                 try:
-                    # Проверяем, есть ли пользователь в системе
-                    telegram_user = await sync_to_async(TelegramUser.objects.get)(telegram_id=user.id)
-                    django_user = await sync_to_async(lambda: telegram_user.user)()
-                    user_name = await sync_to_async(lambda: django_user.get_full_name())()
-                    user_role_display = await sync_to_async(lambda: django_user.get_role_display())()
-                    
-                    # Пользователь найден - показываем стандартное меню
-                    welcome_text = f"""
-🏗️ Добро пожаловать в систему управления проектами, {user_name}!
-
-Ваша роль: {user_role_display}
-
-Выберите действие:
-                    """
-                    
-                    # Создаем URL для перехода в панель
-                    from django.urls import reverse
-                    from django.contrib.sites.models import Site
-                    
-                    # Получаем домен сайта
-                    try:
-                        current_site = await sync_to_async(Site.objects.get_current)()
-                        domain = current_site.domain
-                    except:
-                        domain = "127.0.0.1:8000"  # Fallback для разработки
-                    
-                    # Создаем токен для автоматического входа
-                    from accounts.models import TelegramAuthToken
-                    import uuid
-                    from datetime import datetime, timedelta
-                    
-                    # Создаем временный токен для входа в панель
-                    login_token = str(uuid.uuid4())
-                    from django.utils import timezone
-                    expires_at = timezone.now() + timedelta(minutes=30)  # Токен действует 30 минут
-                    
-                    login_auth_token = await sync_to_async(TelegramAuthToken.objects.create)(
-                        token=login_token,
-                        user=django_user,
-                        telegram_user=telegram_user,
-                        expires_at=expires_at,
-                        is_used=False
-                    )
-                    
-                    print(f"[AUTH] Создан токен для входа: {login_token}, истекает: {expires_at}")
-                    
-                    # URL для автоматического входа
-                    panel_url = f"http://{domain}{reverse('accounts:telegram_login')}?auth_token={login_token}"
-                    
-                    keyboard = [
-                        [InlineKeyboardButton("🌐 Вернуться в панель", url=panel_url)],
-                        [InlineKeyboardButton("📋 Мои задачи", callback_data="tasks")],
-                        [InlineKeyboardButton("🏗️ Проекты", callback_data="projects")],
-                        [InlineKeyboardButton("➕ Создать задачу", callback_data="create_task")],
-                    ]
-                    
-                    reply_markup = InlineKeyboardMarkup(keyboard)
-                    await update.message.reply_text(welcome_text, reply_markup=reply_markup)
-                    return
-                    
+                    menu = await sync_to_async(screens.load_menu)(user.id)
                 except TelegramUser.DoesNotExist:
                     # Пользователь не найден в системе
                     await update.message.reply_text(
@@ -165,6 +181,13 @@ class ConstructionBot:
                         "Обратитесь к администратору для получения доступа."
                     )
                     return
+                
+                # Пользователь найден - показываем стандартное меню
+                await update.message.reply_text(
+                    self.menu_text(menu.user),
+                    reply_markup=self.menu_keyboard(menu.panel_url, with_help=False)
+                )
+                return
             else:
                 print(f"[WARN] Первый аргумент не содержит 'auth_': '{context.args[0]}'")
                 await update.message.reply_text(
@@ -175,62 +198,10 @@ class ConstructionBot:
             print("[WARN] Нет аргументов в команде /start")
         
         try:
-            # Проверяем, есть ли пользователь в системе
-            telegram_user = await sync_to_async(TelegramUser.objects.get)(telegram_id=user.id)
-            django_user = await sync_to_async(lambda: telegram_user.user)()
-            user_name = await sync_to_async(lambda: django_user.get_full_name())()
-            
-            user_role_display = await sync_to_async(lambda: django_user.get_role_display())()
-            welcome_text = f"""
-🏗️ Добро пожаловать в систему управления проектами, {user_name}!
-
-Ваша роль: {user_role_display}
-
-Выберите действие:
-            """
-            
-            # Создаем URL для перехода в панель
-            from django.urls import reverse
-            from django.contrib.sites.models import Site
-            
-            # Получаем домен сайта
-            try:
-                current_site = await sync_to_async(Site.objects.get_current)()
-                domain = current_site.domain
-            except:
-                domain = "127.0.0.1:8000"  # Fallback для разработки
-            
-            # Создаем токен для автоматического входа
-            from accounts.models import TelegramAuthToken
-            import uuid
-            from datetime import datetime, timedelta
-            
-            # Создаем временный токен для входа в панель
-            login_token = str(uuid.uuid4())
-            from django.utils import timezone
-            expires_at = timezone.now() + timedelta(minutes=30)  # Токен действует 30 минут
-            
-            login_auth_token = await sync_to_async(TelegramAuthToken.objects.create)(
-                token=login_token,
-                user=django_user,
-                telegram_user=telegram_user,
-                expires_at=expires_at,
-                is_used=False
-            )
-            
-            print(f"[AUTH] Создан токен для входа: {login_token}, истекает: {expires_at}")
-            
-            # URL для автоматического входа
-            panel_url = f"http://{domain}{reverse('accounts:telegram_login')}?auth_token={login_token}"
-            
-            keyboard = [
-                [InlineKeyboardButton("🌐 Вернуться в панель", url=panel_url)],
-                [InlineKeyboardButton("📋 Мои задачи", callback_data="tasks")],
-                [InlineKeyboardButton("🏗️ Проекты", callback_data="projects")],
-                [InlineKeyboardButton("➕ Создать задачу", callback_data="create_task")],
-                [InlineKeyboardButton("❓ Помощь", callback_data="help")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
+            # Пользователь, ссылка входа в панель - одним обращением к БД
+            menu = await sync_to_async(screens.load_menu)(user.id)
+            welcome_text = self.menu_text(menu.user)
+            reply_markup = self.menu_keyboard(menu.panel_url)
             
         except TelegramUser.DoesNotExist:
             welcome_text = f"""
@@ -260,6 +231,35 @@ class ConstructionBot:
         
         await self.send_message(update, welcome_text, reply_markup=reply_markup)
     
+    async def confirm_auth_token(self, update: Update, auth_token: str):
+        """
+        Запросить подтверждение входа: QR-код мог показать чужой браузер,
+        и без подтверждения сканирование авторизовало бы его
+        """
+        keyboard = [
+            [InlineKeyboardButton("✅ Войти", callback_data=f"auth_confirm:{auth_token}")],
+            [InlineKeyboardButton("❌ Отмена", callback_data=f"auth_cancel:{auth_token}")],
+        ]
+        await update.message.reply_text(
+            "🔐 Войти в веб-панель?\n\n"
+            "Браузер, показавший этот QR-код, будет авторизован под вашим аккаунтом.\n"
+            "Подтверждайте, только если вы сами открыли страницу входа.",
+            reply_markup=InlineKeyboardMarkup(keyboard)
+        )
+    
+    async def cancel_auth_token(self, query, auth_token: str):
+        """Отмена входа: токен больше нельзя подтвердить"""
+        from django.utils import timezone
+        
+        try:
+            await TelegramAuthToken.objects.filter(
+                token=auth_token, is_used=False
+            ).aupdate(expires_at=timezone.now())
+        except Exception as e:
+            # Невалидный UUID - отменять нечего
+            logger.warning(f"Ошибка отмены токена авторизации: {e}")
+        await query.edit_message_text("Вход в веб-панель отменен.")
+    
     async def handle_auth_token(self, update: Update, context: ContextTypes.DEFAULT_TYPE, auth_token: str, user):
         """Обработка токена авторизации"""
         print(f"[AUTH] Обрабатываем токен авторизации: {auth_token}")
@@ -273,7 +273,7 @@ class ConstructionBot:
                 uuid.UUID(auth_token)
             except ValueError:
                 print(f"[ERROR] Невалидный формат токена: {auth_token}")
-                await update.message.reply_text("Неверный формат токена авторизации.")
+                await self.send_message(update, "Неверный формат токена авторизации.")
                 return
             
             # Ищем токен в базе данных
@@ -286,18 +286,18 @@ class ConstructionBot:
                 print(f"[AUTH] Токен использован: {auth_token_obj.is_used}")
             except TelegramAuthToken.DoesNotExist:
                 print(f"[ERROR] Токен не найден в базе данных: {auth_token}")
-                await update.message.reply_text("Неверный токен авторизации.")
+                await self.send_message(update, "Неверный токен авторизации.")
                 return
             
             # Проверяем, не истек ли токен
             if await sync_to_async(auth_token_obj.is_expired)():
-                await update.message.reply_text("Токен авторизации истек. Попробуйте еще раз.")
+                await self.send_message(update, "Токен авторизации истек. Попробуйте еще раз.")
                 return
             
             # Проверяем, не использован ли токен
             if auth_token_obj.is_used:
                 print(f"[ERROR] Токен уже использован: {auth_token_obj.is_used}")
-                await update.message.reply_text("Токен уже использован.")
+                await self.send_message(update, "Токен уже использован.")
                 return
             
             print(f"[AUTH] Токен валиден, продолжаем авторизацию...")
@@ -368,12 +368,9 @@ class ConstructionBot:
             
             # Создаем URL для автоматического входа в панель
             from django.urls import reverse
-            from django.contrib.sites.models import Site
-            from django.conf import settings
             
             # Получаем домен сайта
             try:
-                from django.conf import settings
                 domain = settings.SITE_URL.replace('http://', '').replace('https://', '')
             except:
                 domain = "194.31.174.153"  # Fallback для продакшена
@@ -381,7 +378,7 @@ class ConstructionBot:
             # Создаем токен для автоматического входа
             from accounts.models import TelegramAuthToken
             import uuid
-            from datetime import datetime, timedelta
+            from datetime import timedelta
             
             # Создаем временный токен для входа в панель
             login_token = str(uuid.uuid4())
@@ -410,11 +407,11 @@ class ConstructionBot:
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
             
-            await update.message.reply_text(welcome_text, reply_markup=reply_markup)
+            await self.send_message(update, welcome_text, reply_markup=reply_markup)
             
         except Exception as e:
             logger.error(f"Ошибка в handle_auth_token: {e}")
-            await update.message.reply_text("❌ Произошла ошибка при авторизации. Попробуйте еще раз.")
+            await self.send_message(update, "❌ Произошла ошибка при авторизации. Попробуйте еще раз.")
     
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда /help"""
@@ -440,79 +437,42 @@ class ConstructionBot:
     async def projects_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда /projects - показать проекты пользователя"""
         try:
-            telegram_user = await sync_to_async(TelegramUser.objects.get)(telegram_id=update.effective_user.id)
-            user = telegram_user.user
-            user_role = user.role
-            
-            # Получаем проекты через метод get_accessible_projects()
-            projects = await sync_to_async(lambda: list(user.get_accessible_projects().order_by('-created_at')[:10]))()
+            screen = await sync_to_async(screens.load_projects)(update.effective_user.id)
+            user = screen.user
             
-            if not projects:
+            if not screen.projects:
                 role_text = {
                     'admin': 'администратор',
                     'foreman': 'прораб',
                     'warehouse_keeper': 'кладовщик',
                     'supplier': 'снабженец',
                     'contractor': 'подрядчик'
-                }.get(user_role, 'пользователь')
+                }.get(user.role, 'пользователь')
                 
                 await self.send_message(update, f"📭 У вас как {role_text} пока нет проектов.")
                 return
             
-            user_role_display = await sync_to_async(lambda: user.get_role_display())()
-            text = f"🏗️ Проекты ({user_role_display}):\n\n"
+            text = f"🏗️ Проекты ({user.role_display}):\n\n"
             keyboard = []
             
-            # Подготавливаем данные для всех проектов
-            project_data = []
-            for project in projects:
-                try:
-                    project_status = project.status
-                except:
-                    project_status = 'unknown'
-                
+            for project in screen.projects:
                 status_emoji = {
                     'planning': '📋',
                     'in_progress': '🚧',
                     'on_hold': '⏸️',
                     'completed': '✅',
                     'cancelled': '❌'
-                }.get(project_status, '❓')
-                
-                project_data.append({
-                    'project': project,
-                    'status_emoji': status_emoji
-                })
-            
-            # Теперь обрабатываем данные асинхронно
-            for data in project_data:
-                project = data['project']
-                status_emoji = data['status_emoji']
-                
-                # Получаем роль пользователя в проекте
-                project_role = "👤 Участник"
-                project_created_by = await sync_to_async(lambda: project.created_by)()
-                project_foreman = await sync_to_async(lambda: project.foreman)()
+                }.get(project.status, '❓')
                 
-                if project_created_by == user:
-                    project_role = "👑 Создатель"
-                elif project_foreman == user:
-                    project_role = "👷 Прораб"
-                
-                project_name = await sync_to_async(lambda: project.name)()
-                project_budget = await sync_to_async(lambda: project.budget)()
-                project_spent = await sync_to_async(lambda: project.spent_amount)()
-                project_id = await sync_to_async(lambda: project.id)()
-                
-                if project_budget > 0:
-                    progress = (project_spent / project_budget) * 100
-                    text += f"{status_emoji} {project_name}\n💰 {project_budget:,.0f}₽ | 💸 {project_spent:,.0f}₽ | 📊 {progress:.0f}%\n\n"
+                if project.budget > 0:
+                    progress = (project.spent_amount / project.budget) * 100
+                    text += f"{status_emoji} {project.name}\n💰 {project.budget:,.0f}₽ | 💸 {project.spent_amount:,.0f}₽ | 📊 {progress:.0f}%\n\n"
                 else:
-                    text += f"{status_emoji} {project_name}\n💰 {project_budget:,.0f}₽ | 💸 {project_spent:,.0f}₽\n\n"
+                    text += f"{status_emoji} {project.name}\n💰 {project.budget:,.0f}₽ | 💸 {project.spent_amount:,.0f}₽\n\n"
                 
                 keyboard.append([InlineKeyboardButton(
-                    f"📋 {project_name[:30]}{'...' if len(project_name) > 30 else ''}",
-                    callback_data=f"project_{project_id}"
+                    f"📋 {project.name[:30]}{'...' if len(project.name) > 30 else ''}",
+                    callback_data=f"project_{project.id}"
                 )])
             
             reply_markup = InlineKeyboardMarkup(keyboard)
@@ -527,120 +487,53 @@ class ConstructionBot:
     async def show_main_menu(self, query, context: ContextTypes.DEFAULT_TYPE):
         """Показать главное меню"""
         try:
-            telegram_user = await sync_to_async(TelegramUser.objects.get)(telegram_id=query.from_user.id)
-            user = await sync_to_async(lambda: telegram_user.user)()
-            user_name = await sync_to_async(lambda: user.get_full_name())()
-            user_role_display = await sync_to_async(lambda: user.get_role_display())()
-            
-            welcome_text = f"""
-🏗️ Добро пожаловать в систему управления проектами, {user_name}!
-
-Ваша роль: {user_role_display}
-
-Выберите действие:
-            """
-            
-            # Создаем URL для перехода в панель
-            from django.urls import reverse
-            from django.contrib.sites.models import Site
-            
-            # Получаем домен сайта
-            try:
-                current_site = await sync_to_async(Site.objects.get_current)()
-                domain = current_site.domain
-            except:
-                domain = "127.0.0.1:8000"  # Fallback для разработки
-            
-            # Создаем токен для автоматического входа
-            from accounts.models import TelegramAuthToken
-            import uuid
-            from datetime import datetime, timedelta
-            
-            # Создаем временный токен для входа в панель
-            login_token = str(uuid.uuid4())
-            from django.utils import timezone
-            expires_at = timezone.now() + timedelta(minutes=30)  # Токен действует 30 минут
-            
-            login_auth_token = await sync_to_async(TelegramAuthToken.objects.create)(
-                token=login_token,
-                user=user,
-                telegram_user=telegram_user,
-                expires_at=expires_at,
-                is_used=False
+            menu = await sync_to_async(screens.load_menu)(query.from_user.id)
+            await query.edit_message_text(
+                self.menu_text(menu.user),
+                reply_markup=self.menu_keyboard(menu.panel_url)
             )
             
-            print(f"[AUTH] Создан токен для входа: {login_token}, истекает: {expires_at}")
-            
-            # URL для автоматического входа
-            panel_url = f"http://{domain}{reverse('accounts:telegram_login')}?auth_token={login_token}"
-            
-            keyboard = [
-                [InlineKeyboardButton("🌐 Вернуться в панель", url=panel_url)],
-                [InlineKeyboardButton("📋 Мои задачи", callback_data="tasks")],
-                [InlineKeyboardButton("🏗️ Проекты", callback_data="projects")],
-                [InlineKeyboardButton("➕ Создать задачу", callback_data="create_task")],
-                [InlineKeyboardButton("❓ Помощь", callback_data="help")]
-            ]
-            
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await query.edit_message_text(welcome_text, reply_markup=reply_markup)
-            
         except Exception as e:
             logger.error(f"Ошибка в show_main_menu: {e}")
             await query.edit_message_text("❌ Произошла ошибка при загрузке главного меню.")
-
     async def handle_projects_callback(self, query, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик callback для проектов"""
         try:
-            telegram_user = await sync_to_async(TelegramUser.objects.get)(telegram_id=query.from_user.id)
-            user = await sync_to_async(lambda: telegram_user.user)()
-            user_role = await sync_to_async(lambda: user.role)()
-            
-            # Получаем проекты через метод get_accessible_projects()
-            projects = await sync_to_async(lambda: list(user.get_accessible_projects().order_by('-created_at')[:10]))()
+            screen = await sync_to_async(screens.load_projects)(query.from_user.id)
+            user = screen.user
             
-            if not projects:
+            if not screen.projects:
                 role_text = {
                     'admin': 'администратор',
                     'foreman': 'прораб',
                     'warehouse_keeper': 'кладовщик',
                     'supplier': 'снабженец',
                     'contractor': 'подрядчик'
-                }.get(user_role, 'пользователь')
+                }.get(user.role, 'пользователь')
                 
                 await query.edit_message_text(f"📭 У вас как {role_text} пока нет доступных проектов.")
                 return
             
-            user_role_display = await sync_to_async(lambda: user.get_role_display())()
-            text = f"🏗️ Проекты ({user_role_display}):\n\n"
+            text = f"🏗️ Проекты ({user.role_display}):\n\n"
             keyboard = []
             
-            # Подготавливаем данные для всех проектов
-            for project in projects[:10]:  # Показываем только первые 10
-                try:
-                    project_name = await sync_to_async(lambda: project.name[:30] + "..." if len(project.name) > 30 else project.name)()
-                    project_budget = await sync_to_async(lambda: project.budget)()
-                    project_status = await sync_to_async(lambda: project.status)()
-                    
-                    status_emoji = {
-                        'planning': '📋',
-                        'active': '🚧',
-                        'completed': '✅',
-                        'on_hold': '⏸️',
-                        'cancelled': '❌'
-                    }.get(project_status, '📝')
-                    
-                    text += f"{status_emoji} {project_name}\n"
-                    text += f"   💰 Бюджет: {project_budget:,}₽\n\n"
-                    
-                    keyboard.append([InlineKeyboardButton(
-                        f"{status_emoji} {project_name[:20]}...",
-                        callback_data=f"project_{project.id}"
-                    )])
-                    
-                except Exception as e:
-                    logger.error(f"Ошибка при обработке проекта: {e}")
-                    continue
+            for project in screen.projects:
+                project_name = project.name[:30] + "..." if len(project.name) > 30 else project.name
+                status_emoji = {
+                    'planning': '📋',
+                    'active': '🚧',
+                    'completed': '✅',
+                    'on_hold': '⏸️',
+                    'cancelled': '❌'
+                }.get(project.status, '📝')
+                
+                text += f"{status_emoji} {project_name}\n"
+                text += f"   💰 Бюджет: {project.budget:,}₽\n\n"
+                
+                keyboard.append([InlineKeyboardButton(
+                    f"{status_emoji} {project_name[:20]}...",
+                    callback_data=f"project_{project.id}"
+                )])
             
             keyboard.append([InlineKeyboardButton("🔙 Главное меню", callback_data="main_menu")])
             reply_markup = InlineKeyboardMarkup(keyboard)
@@ -650,56 +543,28 @@ class ConstructionBot:
         except Exception as e:
             logger.error(f"Ошибка в handle_projects_callback: {e}")
             await query.edit_message_text("❌ Произошла ошибка при получении проектов.")
-
     async def handle_tasks_callback(self, query, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик callback для задач"""
         try:
-            telegram_user = await sync_to_async(TelegramUser.objects.get)(telegram_id=query.from_user.id)
-            user = await sync_to_async(lambda: telegram_user.user)()
-            user_role = await sync_to_async(lambda: user.role)()
-            
-            # Получаем задачи в зависимости от роли
-            if user_role == 'admin':
-                # Администратор видит все задачи
-                tasks = await sync_to_async(lambda: list(ExpenseItem.objects.all().order_by('-created_at')[:15]))()
-            elif user_role == 'foreman':
-                # Прораб видит задачи своих проектов
-                projects = await sync_to_async(lambda: list(Project.objects.filter(
-                    Q(foreman=user) | Q(created_by=user)
-                ).values_list('id', flat=True)))()
-                tasks = await sync_to_async(lambda: list(ExpenseItem.objects.filter(
-                    project_id__in=projects
-                ).order_by('-created_at')[:15]))()
-            else:
-                # Остальные роли видят свои задачи
-                tasks = await sync_to_async(lambda: list(ExpenseItem.objects.filter(
-                    Q(created_by=user) | Q(assigned_to=user)
-                ).order_by('-created_at')[:15]))()
+            screen = await sync_to_async(screens.load_tasks)(query.from_user.id)
+            user = screen.user
             
-            if not tasks:
+            if not screen.tasks:
                 role_text = {
                     'admin': 'администратор',
                     'foreman': 'прораб',
                     'warehouse_keeper': 'кладовщик',
                     'supplier': 'снабженец',
                     'contractor': 'подрядчик'
-                }.get(user_role, 'пользователь')
+                }.get(user.role, 'пользователь')
                 
                 await query.edit_message_text(f"📭 У вас как {role_text} пока нет задач.")
                 return
             
-            user_role_display = await sync_to_async(lambda: user.get_role_display())()
-            text = f"📋 Задачи ({user_role_display}):\n\n"
+            text = f"📋 Задачи ({user.role_display}):\n\n"
             keyboard = []
             
-            # Подготавливаем данные для всех задач
-            task_data = []
-            for task in tasks:
-                try:
-                    task_status = await sync_to_async(lambda: task.status)()
-                except:
-                    task_status = 'unknown'
-                
+            for task in screen.tasks[:10]:  # Показываем только первые 10
                 status_emoji = {
                     'new': '🆕',
                     'todo': '📝',
@@ -707,51 +572,24 @@ class ConstructionBot:
                     'review': '👀',
                     'done': '✅',
                     'cancelled': '❌'
-                }.get(task_status, '❓')
+                }.get(task.status, '❓')
                 
-                # Получаем информацию о проекте
-                project_name = "Без проекта"
-                try:
-                    has_project = await sync_to_async(lambda: hasattr(task, 'project') and task.project is not None)()
-                    if has_project:
-                        project_name = await sync_to_async(lambda: task.project.name[:20] + "..." if len(task.project.name) > 20 else task.project.name)()
-                except:
-                    project_name = "Проект"
+                project_name = task.project_name[:20] + "..." if len(task.project_name) > 20 else task.project_name
                 
                 # Определяем роль в задаче
                 task_role = "👤 Участник"
-                if await sync_to_async(lambda: task.created_by == user)():
+                if task.created_by_id == user.id:
                     task_role = "👑 Создатель"
-                else:
-                    try:
-                        has_assigned_to = await sync_to_async(lambda: hasattr(task, 'assigned_to') and task.assigned_to is not None)()
-                        if has_assigned_to and await sync_to_async(lambda: task.assigned_to == user)():
-                            task_role = "🎯 Исполнитель"
-                    except:
-                        pass
-                
-                task_data.append({
-                    'task': task,
-                    'status_emoji': status_emoji,
-                    'project_name': project_name,
-                    'task_role': task_role
-                })
-            
-            # Формируем сообщение и клавиатуру
-            for i, task_info in enumerate(task_data[:10]):  # Показываем только первые 10
-                task = task_info['task']
-                status_emoji = task_info['status_emoji']
-                project_name = task_info['project_name']
-                task_role = task_info['task_role']
+                elif task.assigned_to_id == user.id:
+                    task_role = "🎯 Исполнитель"
                 
-                task_title = await sync_to_async(lambda: task.title[:30] + "..." if len(task.title) > 30 else task.title)()
+                task_title = task.title[:30] + "..." if len(task.title) > 30 else task.title
                 text += f"{status_emoji} {task_title}\n"
                 text += f"   📁 {project_name} | {task_role}\n\n"
                 
-                task_id = await sync_to_async(lambda: task.id)()
                 keyboard.append([InlineKeyboardButton(
                     f"{status_emoji} {task_title[:20]}...",
-                    callback_data=f"task_{task_id}"
+                    callback_data=f"task_{task.id}"
                 )])
             
             keyboard.append([InlineKeyboardButton("🔙 Главное меню", callback_data="main_menu")])
@@ -764,56 +602,28 @@ class ConstructionBot:
             import traceback
             logger.error(f"Traceback: {traceback.format_exc()}")
             await query.edit_message_text("❌ Произошла ошибка при получении задач.")
-
     async def tasks_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда /tasks - показать задачи пользователя"""
         try:
-            telegram_user = await sync_to_async(TelegramUser.objects.get)(telegram_id=update.effective_user.id)
-            user = telegram_user.user
-            user_role = user.role
-            
-            # Получаем задачи в зависимости от роли
-            if user_role == 'admin':
-                # Администратор видит все задачи
-                tasks = await sync_to_async(lambda: list(ExpenseItem.objects.all().order_by('-created_at')[:15]))()
-            elif user_role == 'foreman':
-                # Прораб видит задачи своих проектов
-                projects = await sync_to_async(lambda: list(Project.objects.filter(
-                    Q(foreman=user) | Q(created_by=user)
-                ).values_list('id', flat=True)))()
-                tasks = await sync_to_async(lambda: list(ExpenseItem.objects.filter(
-                    project_id__in=projects
-                ).order_by('-created_at')[:15]))()
-            else:
-                # Остальные роли видят свои задачи
-                tasks = await sync_to_async(lambda: list(ExpenseItem.objects.filter(
-                    Q(created_by=user) | Q(assigned_to=user)
-                ).order_by('-created_at')[:15]))()
+            screen = await sync_to_async(screens.load_tasks)(update.effective_user.id)
+            user = screen.user
             
-            if not tasks:
+            if not screen.tasks:
                 role_text = {
                     'admin': 'администратор',
                     'foreman': 'прораб',
                     'warehouse_keeper': 'кладовщик',
                     'supplier': 'снабженец',
                     'contractor': 'подрядчик'
-                }.get(user_role, 'пользователь')
+                }.get(user.role, 'пользователь')
                 
                 await self.send_message(update, f"📭 У вас как {role_text} пока нет задач.")
                 return
             
-            user_role_display = await sync_to_async(lambda: user.get_role_display())()
-            text = f"📋 Задачи ({user_role_display}):\n\n"
+            text = f"📋 Задачи ({user.role_display}):\n\n"
             keyboard = []
             
-            # Подготавливаем данные для всех задач
-            task_data = []
-            for task in tasks:
-                try:
-                    task_status = task.status
-                except:
-                    task_status = 'unknown'
-                
+            for task in screen.tasks:
                 status_emoji = {
                     'new': '🆕',
                     'todo': '📝',
@@ -821,50 +631,17 @@ class ConstructionBot:
                     'review': '👀',
                     'done': '✅',
                     'cancelled': '❌'
-                }.get(task_status, '❓')
-                
-                # Получаем информацию о проекте
-                project_name = "Без проекта"
-                if hasattr(task, 'project') and task.project:
-                    try:
-                        project_name = task.project.name[:20] + "..." if len(task.project.name) > 20 else task.project.name
-                    except:
-                        project_name = "Проект"
-                
-                # Определяем роль в задаче
-                task_role = "👤 Участник"
-                if task.created_by == user:
-                    task_role = "👑 Создатель"
-                elif hasattr(task, 'assigned_to') and task.assigned_to == user:
-                    task_role = "🎯 Исполнитель"
-                
-                task_data.append({
-                    'task': task,
-                    'status_emoji': status_emoji,
-                    'project_name': project_name,
-                    'task_role': task_role
-                })
-            
-            # Теперь обрабатываем данные асинхронно
-            for data in task_data:
-                task = data['task']
-                status_emoji = data['status_emoji']
-                project_name = data['project_name']
-                task_role = data['task_role']
+                }.get(task.status, '❓')
                 
-                task_status_display = await sync_to_async(lambda: task.get_status_display())()
-                task_created_date = await sync_to_async(lambda: task.created_at.strftime('%d.%m.%Y'))()
+                project_name = task.project_name[:20] + "..." if len(task.project_name) > 20 else task.project_name
+                description = task.description
                 
-                task_description = await sync_to_async(lambda: task.description)()
-                task_amount = await sync_to_async(lambda: task.amount)()
-                task_id = await sync_to_async(lambda: task.id)()
-                
-                text += f"{status_emoji} {task_description[:35]}{'...' if len(task_description) > 35 else ''}\n"
-                text += f"🏗️ {project_name} | 💰 {task_amount:,.0f}₽ | {task_status_display}\n\n"
+                text += f"{status_emoji} {description[:35]}{'...' if len(description) > 35 else ''}\n"
+                text += f"🏗️ {project_name} | 💰 {task.amount:,.0f}₽ | {task.status_display}\n\n"
                 
                 keyboard.append([InlineKeyboardButton(
-                    f"{status_emoji} {task_description[:25]}{'...' if len(task_description) > 25 else ''}",
-                    callback_data=f"task_{task_id}"
+                    f"{status_emoji} {description[:25]}{'...' if len(description) > 25 else ''}",
+                    callback_data=f"task_{task.id}"
                 )])
             
             reply_markup = InlineKeyboardMarkup(keyboard)
@@ -880,40 +657,8 @@ class ConstructionBot:
         """Показать детали проекта"""
         try:
             print(f"[PROJECT_DETAILS] Получен project_id: {project_id}")
-            telegram_user = await sync_to_async(TelegramUser.objects.get)(telegram_id=update.effective_user.id)
-            user = await sync_to_async(lambda: telegram_user.user)()
-            
-            # Получаем проект
-            project = await sync_to_async(Project.objects.get)(id=project_id)
-            
-            # Проверяем доступ к проекту
-            has_access = False
-            user_role = await sync_to_async(lambda: user.role)()
-            
-            # Администратор имеет доступ ко всем проектам
-            if user_role == 'admin':
-                has_access = True
-            else:
-                project_created_by = await sync_to_async(lambda: project.created_by)()
-                project_foreman = await sync_to_async(lambda: project.foreman)()
-                
-                if project_created_by == user or project_foreman == user:
-                    has_access = True
-                elif await sync_to_async(ProjectMember.objects.filter(project=project, user=user).exists)():
-                    has_access = True
-            
-            if not has_access:
-                await self.send_message(update, "❌ У вас нет доступа к этому проекту.")
-                return
-            
-            # Получаем статистику проекта
-            total_tasks = await sync_to_async(ExpenseItem.objects.filter(project=project).count)()
-            completed_tasks = await sync_to_async(ExpenseItem.objects.filter(project=project, status='done').count)()
-            
-            try:
-                project_status = project.status
-            except:
-                project_status = 'unknown'
+            screen = await sync_to_async(screens.load_project)(update.effective_user.id, project_id)
+            project = screen.project
             
             status_emoji = {
                 'planning': '📋',
@@ -921,24 +666,20 @@ class ConstructionBot:
                 'on_hold': '⏸️',
                 'completed': '✅',
                 'cancelled': '❌'
-            }.get(project_status, '❓')
-            
-            project_status_display = await sync_to_async(lambda: project.get_status_display())()
-            foreman_name = await sync_to_async(lambda: project.foreman.get_full_name() if project.foreman else 'Не назначен')()
+            }.get(project.status, '❓')
             
-            project_name = await sync_to_async(lambda: project.name)()
-            project_budget = await sync_to_async(lambda: project.budget)()
-            project_spent = await sync_to_async(lambda: project.spent_amount)()
-            project_description = await sync_to_async(lambda: project.description)()
-            
-            if project_budget > 0:
-                progress = (project_spent / project_budget) * 100
-                text = f"🏗️ {project_name}\n{status_emoji} {project_status_display}\n💰 {project_budget:,.0f}₽ | 💸 {project_spent:,.0f}₽ | 📊 {progress:.0f}%\n📋 {total_tasks} задач ({completed_tasks} выполнено)\n👷 {foreman_name}\n"
+            summary = (
+                f"📋 {screen.total_tasks} задач ({screen.completed_tasks} выполнено)\n"
+                f"👷 {screen.foreman_name}\n"
+            )
+            if project.budget > 0:
+                progress = (project.spent_amount / project.budget) * 100
+                text = f"🏗️ {project.name}\n{status_emoji} {project.status_display}\n💰 {project.budget:,.0f}₽ | 💸 {project.spent_amount:,.0f}₽ | 📊 {progress:.0f}%\n{summary}"
             else:
-                text = f"🏗️ {project_name}\n{status_emoji} {project_status_display}\n💰 {project_budget:,.0f}₽ | 💸 {project_spent:,.0f}₽\n📋 {total_tasks} задач ({completed_tasks} выполнено)\n👷 {foreman_name}\n"
+                text = f"🏗️ {project.name}\n{status_emoji} {project.status_display}\n💰 {project.budget:,.0f}₽ | 💸 {project.spent_amount:,.0f}₽\n{summary}"
             
-            if project_description:
-                text += f"\n📝 Описание:\n{project_description[:200]}{'...' if len(project_description) > 200 else ''}\n"
+            if screen.description:
+                text += f"\n📝 Описание:\n{screen.description[:200]}{'...' if len(screen.description) > 200 else ''}\n"
             
             # Кнопки действий
             keyboard = [
@@ -950,6 +691,8 @@ class ConstructionBot:
             reply_markup = InlineKeyboardMarkup(keyboard)
             await self.send_message(update, text, reply_markup=reply_markup)
             
+        except PermissionDenied:
+            await self.send_message(update, "❌ У вас нет доступа к этому проекту.")
         except Project.DoesNotExist:
             await self.send_message(update, "❌ Проект не найден.")
         except Exception as e:
@@ -959,50 +702,17 @@ class ConstructionBot:
     async def show_project_tasks(self, update: Update, context: ContextTypes.DEFAULT_TYPE, project_id: str):
         """Показать задачи проекта"""
         try:
-            telegram_user = await sync_to_async(TelegramUser.objects.get)(telegram_id=update.effective_user.id)
-            user = await sync_to_async(lambda: telegram_user.user)()
-            
-            # Получаем проект
-            project = await sync_to_async(Project.objects.get)(id=project_id)
-            
-            # Проверяем доступ к проекту
-            user_role = await sync_to_async(lambda: user.role)()
-            has_access = False
+            screen = await sync_to_async(screens.load_project_tasks)(update.effective_user.id, project_id)
+            project_name = screen.project.name
             
-            # Администратор имеет доступ ко всем проектам
-            if user_role == 'admin':
-                has_access = True
-            else:
-                project_created_by = await sync_to_async(lambda: project.created_by)()
-                project_foreman = await sync_to_async(lambda: project.foreman)()
-                
-                if project_created_by == user or project_foreman == user:
-                    has_access = True
-                elif await sync_to_async(ProjectMember.objects.filter(project=project, user=user).exists)():
-                    has_access = True
-            
-            if not has_access:
-                await self.send_message(update, "❌ У вас нет доступа к этому проекту.")
-                return
-            
-            # Получаем задачи проекта
-            tasks = await sync_to_async(list)(ExpenseItem.objects.filter(project=project).order_by('-created_at')[:10])
-            
-            project_name = await sync_to_async(lambda: project.name)()
-            
-            if not tasks:
+            if not screen.tasks:
                 await self.send_message(update, f"📭 В проекте '{project_name}' пока нет задач.")
                 return
             
             text = f"📋 Задачи: {project_name}\n\n"
             keyboard = []
             
-            for task in tasks:
-                try:
-                    task_status = task.status
-                except:
-                    task_status = 'unknown'
-                
+            for task in screen.tasks:
                 status_emoji = {
                     'new': '🆕',
                     'todo': '📝',
@@ -1010,32 +720,23 @@ class ConstructionBot:
                     'review': '👀',
                     'done': '✅',
                     'cancelled': '❌'
-                }.get(task_status, '❓')
-                
-                task_status_display = await sync_to_async(lambda: task.get_status_display())()
-                task_creator_name = await sync_to_async(lambda: task.created_by.get_full_name())()
+                }.get(task.status, '❓')
                 
-                try:
-                    task_description = task.description
-                    task_amount = task.amount
-                    task_id = task.id
-                except:
-                    task_description = "Задача"
-                    task_amount = 0
-                    task_id = "unknown"
-                
-                text += f"{status_emoji} {task_description[:40]}{'...' if len(task_description) > 40 else ''}\n"
-                text += f"💰 {task_amount:,.0f}₽ | {task_status_display} | 👤 {task_creator_name}\n\n"
+                description = task.description
+                text += f"{status_emoji} {description[:40]}{'...' if len(description) > 40 else ''}\n"
+                text += f"💰 {task.amount:,.0f}₽ | {task.status_display} | 👤 {task.created_by_name}\n\n"
                 
                 keyboard.append([InlineKeyboardButton(
-                    f"{status_emoji} {task_description[:25]}{'...' if len(task_description) > 25 else ''}",
-                    callback_data=f"task_{task_id}"
+                    f"{status_emoji} {description[:25]}{'...' if len(description) > 25 else ''}",
+                    callback_data=f"task_{task.id}"
                 )])
             
             keyboard.append([InlineKeyboardButton("🔙 Назад к проекту", callback_data=f"project_{project_id}")])
             reply_markup = InlineKeyboardMarkup(keyboard)
             await self.send_message(update, text, reply_markup=reply_markup)
             
+        except PermissionDenied:
+            await self.send_message(update, "❌ У вас нет доступа к этому проекту.")
         except Project.DoesNotExist:
             await self.send_message(update, "❌ Проект не найден.")
         except Exception as e:
@@ -1045,39 +746,28 @@ class ConstructionBot:
     async def show_project_stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE, project_id: str):
         """Показать статистику проекта"""
         try:
-            telegram_user = await sync_to_async(TelegramUser.objects.get)(telegram_id=update.effective_user.id)
-            user = await sync_to_async(lambda: telegram_user.user)()
-            
-            # Получаем проект
-            project = await sync_to_async(Project.objects.get)(id=project_id)
-            
-            # Получаем статистику
-            total_tasks = await sync_to_async(ExpenseItem.objects.filter(project=project).count)()
-            completed_tasks = await sync_to_async(ExpenseItem.objects.filter(project=project, status='done').count)()
-            pending_tasks = await sync_to_async(ExpenseItem.objects.filter(project=project, status='todo').count)()
-            in_progress_tasks = await sync_to_async(ExpenseItem.objects.filter(project=project, status='in_progress').count)()
-            
-            # Общая сумма задач
-            total_amount = await sync_to_async(ExpenseItem.objects.filter(project=project).aggregate(
-                total=models.Sum('amount')
-            ))()
-            total_amount = total_amount['total'] or 0
-            
-            project_name = await sync_to_async(lambda: project.name)()
-            project_budget = await sync_to_async(lambda: project.budget)()
-            project_spent = await sync_to_async(lambda: project.spent_amount)()
-            
-            text = f"📊 Статистика проекта '{project_name}':\n\n"
+            screen = await sync_to_async(screens.load_project_stats)(update.effective_user.id, project_id)
+            project = screen.project
+            
+            # Сводная статистика проекта (одна строка ProjectStats)
+            stats = screen.stats
+            total_tasks = stats['total_count']
+            completed_tasks = stats['completed_count']
+            pending_tasks = stats['todo_count']
+            in_progress_tasks = stats['in_progress_count']
+            total_amount = stats['total_amount']
+            
+            text = f"📊 Статистика проекта '{project.name}':\n\n"
             text += f"📋 Всего задач: {total_tasks}\n"
             text += f"✅ Выполнено: {completed_tasks}\n"
             text += f"⏳ В ожидании: {pending_tasks}\n"
             text += f"🚧 В работе: {in_progress_tasks}\n\n"
             text += f"💰 Общая сумма задач: {total_amount:,.2f} ₽\n"
-            text += f"💰 Бюджет проекта: {project_budget:,.2f} ₽\n"
-            text += f"💸 Потрачено: {project_spent:,.2f} ₽\n"
+            text += f"💰 Бюджет проекта: {project.budget:,.2f} ₽\n"
+            text += f"💸 Потрачено: {project.spent_amount:,.2f} ₽\n"
             
-            if project_budget > 0:
-                budget_progress = (project_spent / project_budget) * 100
+            if project.budget > 0:
+                budget_progress = (project.spent_amount / project.budget) * 100
                 text += f"📊 Использование бюджета: {budget_progress:.1f}%\n"
             
             if total_tasks > 0:
@@ -1120,31 +810,17 @@ class ConstructionBot:
     async def create_task_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда /create_task - создать новую задачу"""
         try:
-            telegram_user = await sync_to_async(TelegramUser.objects.get)(telegram_id=update.effective_user.id)
-            user = await sync_to_async(lambda: telegram_user.user)()
+            screen = await sync_to_async(screens.load_projects)(update.effective_user.id)
             
-            # Получаем проекты через метод get_accessible_projects()
-            projects = await sync_to_async(list)(user.get_accessible_projects().order_by('-created_at')[:10])
-            
-            if not projects:
+            if not screen.projects:
                 await self.send_message(update, "❌ У вас нет проектов для создания задач.")
                 return
             
             text = "➕ Создание новой задачи\n\nВыберите проект:"
-            keyboard = []
-            
-            for project in projects:
-                try:
-                    project_name = project.name
-                    project_id = project.id
-                except:
-                    project_name = "Проект"
-                    project_id = "unknown"
-                
-                keyboard.append([InlineKeyboardButton(
-                    f"🏗️ {project_name}",
-                    callback_data=f"create_task_project_{project_id}"
-                )])
+            keyboard = [
+                [InlineKeyboardButton(f"🏗️ {project.name}", callback_data=f"create_task_project_{project.id}")]
+                for project in screen.projects
+            ]
             
             reply_markup = InlineKeyboardMarkup(keyboard)
             await self.send_message(update, text, reply_markup=reply_markup)
@@ -1168,7 +844,11 @@ class ConstructionBot:
         data = query.data
         print(f"[CALLBACK] Получен callback: {data}")
         
-        if data == "my_tasks":
+        if data.startswith("auth_confirm:"):
+            await self.handle_auth_token(update, context, data.split(":", 1)[1], update.effective_user)
+        elif data.startswith("auth_cancel:"):
+            await self.cancel_auth_token(query, data.split(":", 1)[1])
+        elif data == "my_tasks":
             # Создаем мок объект update для команд
             mock_update = Update(update_id=update.update_id, callback_query=query)
             await self.tasks_command(mock_update, context)
@@ -1209,48 +889,30 @@ class ConstructionBot:
     async def show_task_details(self, update: Update, context: ContextTypes.DEFAULT_TYPE, task_id):
         """Показать детали задачи"""
         try:
-            task = await sync_to_async(ExpenseItem.objects.get)(id=task_id)
-            
-            try:
-                task_status = task.status
-            except:
-                task_status = 'unknown'
+            task = await sync_to_async(screens.load_task)(task_id)
             
             status_emoji = {
                 'new': '🆕', 'todo': '📝', 'in_progress': '🚧',
                 'review': '👀', 'done': '✅', 'cancelled': '❌'
-            }.get(task_status, '📝')
-            
-            task_status_display = await sync_to_async(lambda: task.get_status_display())()
-            task_creator_name = await sync_to_async(lambda: task.created_by.get_full_name())()
-            task_assigned_name = await sync_to_async(lambda: task.assigned_to.get_full_name() if task.assigned_to else None)()
-            
-            task_project_name = await sync_to_async(lambda: task.project.name)()
-            task_stage_name = await sync_to_async(lambda: task.stage.name if task.stage else None)()
+            }.get(task.status, '📝')
             
-            task_title = await sync_to_async(lambda: task.title)()
-            task_created_date = await sync_to_async(lambda: task.created_at.strftime('%d.%m.%Y %H:%M'))()
-            task_amount = await sync_to_async(lambda: task.amount)()
-            task_description = await sync_to_async(lambda: task.description)()
+            text = f"{status_emoji} {task.title}\n"
+            text += f"📊 {task.status_display} | 💰 {task.amount:,.0f}₽\n"
+            text += f"🏗️ {task.project_name}\n"
+            text += f"👤 {task.created_by_name}"
+            if task.assigned_to_name:
+                text += f" → {task.assigned_to_name}"
+            text += f"\n📅 {task.created_at.strftime('%d.%m.%Y %H:%M')}\n"
             
-            text = f"{status_emoji} {task_title}\n"
-            text += f"📊 {task_status_display} | 💰 {task_amount:,.0f}₽\n"
-            text += f"🏗️ {task_project_name}\n"
-            text += f"👤 {task_creator_name}"
-            if task_assigned_name:
-                text += f" → {task_assigned_name}"
-            text += f"\n📅 {task_created_date}\n"
+            if task.description:
+                text += f"\n📝 {task.description[:100]}{'...' if len(task.description) > 100 else ''}\n"
             
-            if task_description:
-                text += f"\n📝 {task_description[:100]}{'...' if len(task_description) > 100 else ''}\n"
+            if task.stage_name:
+                text += f"🏗️ Этап: {task.stage_name}\n"
             
-            if task_stage_name:
-                text += f"🏗️ Этап: {task_stage_name}\n"
-            
-            task_project_id = await sync_to_async(lambda: task.project.id)()
             keyboard = [
                 [InlineKeyboardButton("🔙 Назад к задачам", callback_data="my_tasks")],
-                [InlineKeyboardButton("🏗️ Проект", callback_data=f"project_{task_project_id}")]
+                [InlineKeyboardButton("🏗️ Проект", callback_data=f"project_{task.project_id}")]
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
             
@@ -1265,14 +927,13 @@ class ConstructionBot:
     async def start_create_task(self, update: Update, context: ContextTypes.DEFAULT_TYPE, project_id):
         """Начать создание задачи"""
         try:
-            project = await sync_to_async(Project.objects.get)(id=project_id)
+            project_name = await sync_to_async(screens.load_project_name)(project_id)
             
             # Сохраняем project_id в контексте
             context.user_data['creating_task'] = {
                 'project_id': project_id
             }
             
-            project_name = await sync_to_async(lambda: project.name)()
             text = f"➕ Создание задачи для проекта: {project_name}\n\n"
             text += "📝 Напишите задачу в любом формате:\n"
             text += "• Название задачи. Описание. 1000₽\n"
@@ -1415,70 +1076,36 @@ class ConstructionBot:
         return task_data
     
     async def create_task_smart(self, update: Update, context: ContextTypes.DEFAULT_TYPE, project_id: str, tasks_data: list):
-        """Умное создание задач"""
+        """Умное создание задач (все задачи сообщения - одной транзакцией)"""
         try:
-            # Получаем пользователя
-            telegram_user = await sync_to_async(TelegramUser.objects.get)(telegram_id=update.effective_user.id)
-            user = await sync_to_async(lambda: telegram_user.user)()
-            
-            # Получаем проект
-            project = await sync_to_async(Project.objects.get)(id=project_id)
-            
-            # Получаем первую колонку проекта (колонка "Новые")
-            from kanban.models import KanbanColumn
-            column = await sync_to_async(KanbanColumn.objects.filter(board__project=project).first)()
+            from kanban.bulk_tasks import create_tasks
             
-            if not column:
-                # Создаем колонку если её нет
-                from kanban.models import KanbanBoard
-                board, created = await sync_to_async(KanbanBoard.objects.get_or_create)(
-                    project=project,
-                    defaults={'created_by': user}
-                )
-                column = await sync_to_async(KanbanColumn.objects.create)(
-                    board=board,
-                    name="Новые",
-                    order=0
-                )
+            # Информация о вложениях добавляется в описание первой задачи
+            attachments = context.user_data['creating_task'].get('attachments', [])
+            attachment_info = []
+            for attachment in attachments:
+                if attachment['type'] == 'photo':
+                    attachment_info.append(f"📸 {attachment['filename']}")
+                elif attachment['type'] == 'document':
+                    attachment_info.append(f"📎 {attachment['original_filename']}")
+            
+            tasks = [dict(task_data) for task_data in tasks_data]
+            if attachment_info and tasks:
+                description = tasks[0]['description']
+                if description:
+                    description += f"\n\nВложения:\n" + "\n".join(attachment_info)
+                else:
+                    description = "Вложения:\n" + "\n".join(attachment_info)
+                tasks[0]['description'] = description
             
-            created_tasks = []
+            telegram_id = update.effective_user.id
             
-            # Создаем задачи
-            for task_data in tasks_data:
-                task = await sync_to_async(ExpenseItem.objects.create)(
-                    title=task_data['title'],
-                    description=task_data['description'],
-                    amount=task_data['amount'],
-                    project=project,
-                    column=column,
-                    created_by=user,
-                    status='new'
-                )
-                created_tasks.append(task)
+            def create():
+                user = TelegramUser.objects.select_related('user').get(telegram_id=telegram_id).user
+                project = Project.objects.get(id=project_id)
+                return create_tasks(user, project, tasks)
             
-            # Обрабатываем вложения (прикрепляем к первой задаче)
-            attachments = context.user_data['creating_task'].get('attachments', [])
-            if attachments and created_tasks:
-                # Сохраняем информацию о вложениях в описании первой задачи
-                attachment_info = []
-                for attachment in attachments:
-                    if attachment['type'] == 'photo':
-                        attachment_info.append(f"📸 {attachment['filename']}")
-                    elif attachment['type'] == 'document':
-                        attachment_info.append(f"📎 {attachment['original_filename']}")
-                
-                if attachment_info:
-                    # Обновляем описание первой задачи с информацией о вложениях
-                    first_task = created_tasks[0]
-                    updated_description = first_task.description
-                    if updated_description:
-                        updated_description += f"\n\nВложения:\n" + "\n".join(attachment_info)
-                    else:
-                        updated_description = "Вложения:\n" + "\n".join(attachment_info)
-                    
-                    # Обновляем задачу
-                    first_task.description = updated_description
-                    await sync_to_async(first_task.save)()
+            created_tasks = await sync_to_async(create)()
             
             # Очищаем данные создания задачи
             del context.user_data['creating_task']
@@ -1729,8 +1356,17 @@ class ConstructionBot:
     
     def run(self):
         """Запуск бота"""
+        from .webhook import is_webhook_mode, apply_bot_mode
+
+        if is_webhook_mode():
+            # Обновления обрабатывает ASGI-процесс Django, отдельный процесс не нужен
+            info = asyncio.run(apply_bot_mode(self.application.bot))
+            logger.info(f"Режим webhook: обновления принимает {info.url}")
+            return
+
         logger.info("Запуск Construction Bot...")
         try:
+            # run_polling сам удаляет webhook, оставшийся от режима webhook
             self.application.run_polling()
         except Exception as e:
             logger.error(f"Ошибка запуска бота: {e}")
@@ -1747,31 +1383,6 @@ def get_bot_instance():
         _bot_instance = ConstructionBot()
     return _bot_instance
 
-def send_message_to_user(user_id, text, reply_markup=None):
-    """Синхронная обертка для отправки сообщения пользователю"""
-    import asyncio
-    
-    async def _send():
-        bot = get_bot_instance()
-        return await bot.send_message_to_user(user_id, text, reply_markup)
-    
-    try:
-        # Пытаемся использовать существующий event loop
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            # Если loop уже запущен, создаем задачу
-            import threading
-            import concurrent.futures
-            
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(asyncio.run, _send())
-                return future.result()
-        else:
-            return loop.run_until_complete(_send())
-    except RuntimeError:
-        # Если нет event loop, создаем новый
-        return asyncio.run(_send())
-
 if __name__ == '__main__':
     bot = ConstructionBot()
     bot.run()
@@ -0,0 +1,123 @@
+import asyncio
+import itertools
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import sync_to_async
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from accounts.models import TelegramUser
+from kanban.models import ExpenseItem
+from projects.models import Project
+from telegram_bot import screens
+
+
+class Command(BaseCommand):
+    help = 'Замеряет обновления/сек бота на имитированном потоке обновлений (экраны только читают данные)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--updates', type=int, default=300, help='Количество имитируемых обновлений')
+        parser.add_argument('--concurrency', type=int, default=8, help='Одновременно обрабатываемых обновлений')
+        parser.add_argument(
+            '--legacy', action='store_true',
+            help='Дополнительно замерить прежний подход (sync_to_async на каждый атрибут) для списка задач'
+        )
+
+    def handle(self, *args, **options):
+        telegram_ids = list(TelegramUser.objects.values_list('telegram_id', flat=True)[:50])
+        project_ids = list(Project.objects.values_list('id', flat=True)[:50])
+        task_ids = list(ExpenseItem.objects.values_list('id', flat=True)[:50])
+        if not (telegram_ids and project_ids and task_ids):
+            raise CommandError('Нужны привязанные Telegram пользователи, проекты и задачи (например, create_demo_data)')
+        connection.close()
+
+        stream = self._stream(telegram_ids, project_ids, task_ids, options['updates'])
+        self._report('Один sync_to_async на экран', asyncio.run(self._run(stream, options['concurrency'])))
+
+        if options['legacy']:
+            stream = [
+                (self._legacy_tasks, (telegram_id,))
+                for telegram_id in itertools.islice(itertools.cycle(telegram_ids), options['updates'])
+            ]
+            self._report('Прежний подход, список задач', asyncio.run(self._run(stream, options['concurrency'], wrap=False)))
+            stream = [
+                (screens.load_tasks, (telegram_id,))
+                for telegram_id in itertools.islice(itertools.cycle(telegram_ids), options['updates'])
+            ]
+            self._report('Экран, список задач', asyncio.run(self._run(stream, options['concurrency'])))
+
+    def _stream(self, telegram_ids, project_ids, task_ids, count):
+        """Поток обновлений вперемешку по экранам (главное меню пишет токены и не участвует)"""
+        users = itertools.cycle(telegram_ids)
+        projects = itertools.cycle(project_ids)
+        tasks = itertools.cycle(task_ids)
+        kinds = itertools.cycle([
+            lambda: (screens.load_projects, (next(users),)),
+            lambda: (screens.load_tasks, (next(users),)),
+            lambda: (screens.load_project, (next(users), next(projects))),
+            lambda: (screens.load_project_tasks, (next(users), next(projects))),
+            lambda: (screens.load_task, (next(tasks),)),
+        ])
+        return [next(kinds)() for _ in range(count)]
+
+    async def _run(self, stream, concurrency, wrap=True):
+        queries = [0]
+        hops = [0]
+
+        def count_query(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        # Все вызовы sync_to_async идут в одном потоке - там и считаем запросы
+        stack = ExitStack()
+        await sync_to_async(lambda: stack.enter_context(connection.execute_wrapper(count_query)))()
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def handle_update(loader, args):
+            async with semaphore:
+                try:
+                    if wrap:
+                        hops[0] += 1
+                        await sync_to_async(loader)(*args)
+                    else:
+                        hops[0] += await loader(*args)
+                except Exception:
+                    # Нет доступа, удаленный объект - обработчик бота ответил бы сообщением
+                    pass
+
+        started = time.perf_counter()
+        await asyncio.gather(*(handle_update(loader, args) for loader, args in stream))
+        elapsed = time.perf_counter() - started
+
+        await sync_to_async(stack.close)()
+        await sync_to_async(connection.close)()
+        return len(stream), elapsed, queries[0], hops[0]
+
+    async def _legacy_tasks(self, telegram_id):
+        """Список задач так, как его строил обработчик до выделения screens; возвращает число переходов в поток"""
+        telegram_user = await sync_to_async(TelegramUser.objects.get)(telegram_id=telegram_id)
+        user = await sync_to_async(lambda: telegram_user.user)()
+        tasks = await sync_to_async(lambda: list(
+            ExpenseItem.objects.filter(created_by=user).order_by('-created_at')[:screens.TASKS_LIMIT]
+        ))()
+        await sync_to_async(user.get_role_display)()
+        hops = 4
+        for task in tasks:
+            await sync_to_async(lambda: task.status)()
+            await sync_to_async(lambda: task.project.name)()
+            await sync_to_async(lambda: task.created_by == user)()
+            await sync_to_async(lambda: task.assigned_to)()
+            await sync_to_async(lambda: task.title)()
+            await sync_to_async(lambda: task.id)()
+            hops += 6
+        return hops
+
+    def _report(self, label, result):
+        updates, elapsed, queries, hops = result
+        self.stdout.write(self.style.MIGRATE_HEADING(label))
+        self.stdout.write(f"  обновлений/сек:       {updates / elapsed:.1f}")
+        self.stdout.write(f"  SQL-запросов/обн.:    {queries / updates:.1f}")
+        self.stdout.write(f"  sync_to_async/обн.:   {hops / updates:.1f}")
@@ -0,0 +1,39 @@
+import asyncio
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from telegram_bot.outbox import OutboxSender, purge_sent
+
+
+class Command(BaseCommand):
+    help = (
+        'Отправляет очередь исходящих сообщений Telegram. Обычно отправитель '
+        'работает внутри бота; команда нужна для отправки без бота и очистки очереди'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--drain', action='store_true', help='Отправить готовые сообщения и завершиться')
+        parser.add_argument(
+            '--purge-days', type=int, default=None,
+            help='Удалить отправленные сообщения старше N дней и завершиться'
+        )
+
+    def handle(self, *args, **options):
+        if options['purge_days'] is not None:
+            deleted = purge_sent(timedelta(days=options['purge_days']))
+            self.stdout.write(self.style.SUCCESS(f"Удалено отправленных сообщений: {deleted}"))
+            return
+
+        from telegram_bot.bot import get_bot_instance
+
+        asyncio.run(self._run(get_bot_instance().application.bot, options['drain']))
+
+    async def _run(self, bot, drain):
+        async with bot:
+            sender = OutboxSender(bot)
+            if drain:
+                sent = await sender.drain()
+                self.stdout.write(self.style.SUCCESS(f"Обработано сообщений: {sent}"))
+            else:
+                await sender.run()
@@ -0,0 +1,27 @@
+import asyncio
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from telegram_bot.webhook import POLLING, WEBHOOK, apply_bot_mode
+
+
+class Command(BaseCommand):
+    help = 'Регистрирует или удаляет webhook бота в Telegram по TELEGRAM_BOT_MODE'
+
+    def handle(self, *args, **options):
+        mode = settings.TELEGRAM_BOT_MODE
+        if mode not in (WEBHOOK, POLLING):
+            raise CommandError(f"Неизвестный TELEGRAM_BOT_MODE: {mode}")
+        if mode == WEBHOOK and not (settings.TELEGRAM_WEBHOOK_URL and settings.TELEGRAM_WEBHOOK_SECRET):
+            raise CommandError('Для режима webhook нужны TELEGRAM_WEBHOOK_URL и TELEGRAM_WEBHOOK_SECRET')
+
+        from telegram_bot.bot import get_bot_instance
+
+        info = asyncio.run(apply_bot_mode(get_bot_instance().application.bot))
+        if mode == WEBHOOK:
+            self.stdout.write(self.style.SUCCESS(f"Webhook: {info.url}"))
+            if info.last_error_message:
+                self.stdout.write(self.style.WARNING(f"Последняя ошибка Telegram: {info.last_error_message}"))
+        else:
+            self.stdout.write(self.style.SUCCESS('Webhook удален, бот работает в режиме polling'))
@@ -4,26 +4,50 @@ import logging
 import time
 from django.http import HttpResponseForbidden, JsonResponse
 from django.conf import settings
-from django.utils.deprecation import MiddlewareMixin
-from django.core.cache import cache
+from django.core.cache import caches
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 
 logger = logging.getLogger(__name__)
 
 
-class TelegramWebhookSecurityMiddleware(MiddlewareMixin):
+class TelegramWebhookSecurityMiddleware:
     """
     Middleware для проверки подписи Telegram webhook запросов
-    Включает защиту от replay атак и проверку HMAC подписи
+    Проверяет secret token и HMAC подпись; ограничение частоты действует
+    только для запросов без верного secret token. Повторные доставки
+    Telegram отсекает представление по update_id (telegram_bot/webhook.py)
+    Остальные запросы проходят без проверок (и без переключения потоков под ASGI)
     """
 
-    def process_request(self, request):
+    sync_capable = True
+    async_capable = True
+
+    webhook_prefix = '/telegram/webhook/'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
         # Проверяем только webhook endpoints
-        if not request.path.startswith('/telegram/webhook/'):
-            return None
+        if request.path.startswith(self.webhook_prefix):
+            response = self.process_request(request)
+            if response is not None:
+                return response
+        return self.get_response(request)
 
-        # Получаем тело запроса для проверки HMAC
-        request_body = request.body
-        
+    async def __acall__(self, request):
+        if request.path.startswith(self.webhook_prefix):
+            # Проверка обращается к кэшу - в потоке
+            response = await sync_to_async(self.process_request)(request)
+            if response is not None:
+                return response
+        return await self.get_response(request)
+
+    def process_request(self, request):
         # Получаем заголовки
         telegram_signature = request.META.get('HTTP_X_TELEGRAM_BOT_API_SECRET_TOKEN')
         telegram_init_data = request.META.get('HTTP_X_TELEGRAM_INIT_DATA')
@@ -47,14 +71,11 @@ class TelegramWebhookSecurityMiddleware(MiddlewareMixin):
                 logger.warning("Неверная HMAC подпись Telegram webhook")
                 return HttpResponseForbidden("Invalid HMAC signature")
 
-        # Проверка 3: Защита от replay атак
-        if not self._check_replay_protection(request_body, telegram_signature):
-            logger.warning("Обнаружена попытка replay атаки")
-            return HttpResponseForbidden("Replay attack detected")
-
-        # Проверка 4: Rate limiting
+        # Проверка 3: Rate limiting - только для непроверенных запросов,
+        # поток обновлений от Telegram с верным токеном не ограничиваем
+        verified = bool(telegram_signature) and hmac.compare_digest(telegram_signature, webhook_secret)
         client_ip = self._get_client_ip(request)
-        if not self._check_rate_limit(client_ip):
+        if not verified and not self._check_rate_limit(client_ip):
             logger.warning(f"Rate limit превышен для IP: {client_ip}")
             return HttpResponseForbidden("Rate limit exceeded")
 
@@ -89,44 +110,27 @@ class TelegramWebhookSecurityMiddleware(MiddlewareMixin):
             logger.error(f"Ошибка проверки HMAC: {e}")
             return False
 
-    def _check_replay_protection(self, request_body, signature):
-        """
-        Защита от replay атак
-        """
-        try:
-            # Создаем уникальный ключ для запроса
-            request_hash = hashlib.sha256(
-                (request_body.decode('utf-8') + str(signature)).encode()
-            ).hexdigest()
-            
-            # Проверяем, не был ли этот запрос уже обработан
-            cache_key = f"telegram_webhook_{request_hash}"
-            if cache.get(cache_key):
-                return False
-            
-            # Сохраняем запрос на 5 минут
-            cache.set(cache_key, True, timeout=300)
-            return True
-            
-        except Exception as e:
-            logger.error(f"Ошибка replay защиты: {e}")
-            return False
-
     def _check_rate_limit(self, client_ip):
         """
         Проверка rate limiting
         """
         try:
+            cache = caches['ratelimit']
             cache_key = f"telegram_rate_limit_{client_ip}"
-            requests_count = cache.get(cache_key, 0)
             
-            # Максимум 10 запросов в минуту
-            if requests_count >= 10:
-                return False
+            # Увеличиваем общий для всех воркеров счетчик
+            if cache.add(cache_key, 1, timeout=60):
+                requests_count = 1
+            else:
+                try:
+                    requests_count = cache.incr(cache_key)
+                except ValueError:
+                    # Ключ истек между add() и incr()
+                    cache.add(cache_key, 1, timeout=60)
+                    requests_count = 1
             
-            # Увеличиваем счетчик
-            cache.set(cache_key, requests_count + 1, timeout=60)
-            return True
+            # Максимум 10 запросов в минуту
+            return requests_count <= 10
             
         except Exception as e:
             logger.error(f"Ошибка rate limiting: {e}")
@@ -0,0 +1,47 @@
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+class OutboundMessage(models.Model):
+    """
+    Исходящее сообщение Telegram.
+    Веб-запросы только ставят сообщения в очередь, отправляет их
+    долгоживущий отправитель бота (см. telegram_bot/outbox.py).
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', _('В очереди')
+        SENDING = 'sending', _('Отправляется')
+        SENT = 'sent', _('Отправлено')
+        FAILED = 'failed', _('Ошибка')
+
+    chat_id = models.BigIntegerField(_('ID чата Telegram'))
+    text = models.TextField(_('Текст'))
+    parse_mode = models.CharField(_('Режим разметки'), max_length=20, blank=True, default='HTML')
+    status = models.CharField(
+        _('Статус'),
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(_('Попыток'), default=0)
+    next_attempt_at = models.DateTimeField(
+        _('Следующая попытка'),
+        default=timezone.now,
+        help_text=_('Для отправляемых - окончание аренды отправителем')
+    )
+    last_error = models.TextField(_('Последняя ошибка'), blank=True)
+    created_at = models.DateTimeField(_('Создано'), auto_now_add=True)
+    sent_at = models.DateTimeField(_('Отправлено'), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('Исходящее сообщение Telegram')
+        verbose_name_plural = _('Исходящие сообщения Telegram')
+        db_table = 'telegram_outbound_messages'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='tg_outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"Сообщение {self.pk} -> {self.chat_id} ({self.get_status_display()})"
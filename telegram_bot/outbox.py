@@ -0,0 +1,279 @@
+"""
+Очередь исходящих сообщений Telegram
+
+enqueue_messages() сохраняет сообщения в БД (OutboundMessage), и веб-запрос
+на этом заканчивается. OutboxSender работает внутри Application бота
+(процесс polling или ASGI-воркер в режиме webhook) либо командой
+telegram_outbox. Он забирает готовые сообщения пачками с арендой,
+отправляет их через один клиент бота с учетом ограничений Telegram (общего
+и на чат) и повторяет неудачные попытки с экспоненциальной задержкой.
+Ограничения хранятся в общем кэше и действуют на все отправители вместе.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundMessage
+
+logger = logging.getLogger(__name__)
+
+# Ограничения Telegram: около 30 сообщений в секунду всего и 1 в секунду в чат
+DEFAULT_GLOBAL_RATE = 25
+DEFAULT_CHAT_INTERVAL = 1.0
+DEFAULT_MAX_ATTEMPTS = 5
+
+BATCH_SIZE = 100
+POLL_INTERVAL = 1.0
+
+# Аренда пачки отправителем (секунды): после сбоя сообщения вернутся в очередь
+LEASE_SECONDS = 300
+
+# Задержка повтора: BACKOFF_BASE * 2 ** (попытка - 1), не больше BACKOFF_MAX
+BACKOFF_BASE = 5
+BACKOFF_MAX = 30 * 60
+
+
+def enqueue_messages(chat_ids, text, parse_mode='HTML'):
+    """Поставить сообщение в очередь для нескольких чатов; возвращает число сообщений"""
+    chat_ids = list(dict.fromkeys(chat_id for chat_id in chat_ids if chat_id))
+    OutboundMessage.objects.bulk_create(
+        [OutboundMessage(chat_id=chat_id, text=text, parse_mode=parse_mode) for chat_id in chat_ids],
+        batch_size=500
+    )
+    return len(chat_ids)
+
+
+def enqueue_message(chat_id, text, parse_mode='HTML'):
+    """Поставить сообщение в очередь для одного чата"""
+    return enqueue_messages([chat_id], text, parse_mode)
+
+
+def claim_batch(limit=BATCH_SIZE):
+    """
+    Забрать готовые к отправке сообщения.
+    Сообщения в аренде с истекшим сроком (отправитель упал) забираются снова.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        messages = list(
+            OutboundMessage.objects.select_for_update(skip_locked=True)
+            .filter(
+                status__in=[OutboundMessage.Status.PENDING, OutboundMessage.Status.SENDING],
+                next_attempt_at__lte=now
+            )
+            .order_by('id')[:limit]
+        )
+        if messages:
+            lease_until = now + timedelta(seconds=LEASE_SECONDS)
+            OutboundMessage.objects.filter(pk__in=[message.pk for message in messages]).update(
+                status=OutboundMessage.Status.SENDING,
+                next_attempt_at=lease_until
+            )
+            for message in messages:
+                message.status = OutboundMessage.Status.SENDING
+                message.next_attempt_at = lease_until
+    return messages
+
+
+def save_results(messages):
+    OutboundMessage.objects.bulk_update(
+        messages,
+        ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at'],
+        batch_size=500
+    )
+
+
+def purge_sent(older_than):
+    """Удалить отправленные сообщения старше older_than (timedelta)"""
+    deleted, _ = OutboundMessage.objects.filter(
+        status=OutboundMessage.Status.SENT,
+        sent_at__lt=timezone.now() - older_than
+    ).delete()
+    return deleted
+
+
+def backoff(attempts):
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+
+
+def _seconds(value):
+    # RetryAfter.retry_after - число секунд или timedelta (новые версии PTB)
+    return value.total_seconds() if isinstance(value, timedelta) else float(value)
+
+
+class RateLimiter:
+    """
+    Общий предел сообщений в секунду и минимальный интервал между сообщениями в чат.
+    Счетчики лежат в общем кэше (псевдоним ratelimit), поэтому предел общий
+    для всех отправителей: ASGI-воркеров в режиме webhook и telegram_outbox.
+    Интервал чата округляется до целых секунд (время жизни ключа кэша).
+    """
+
+    # Пауза перед повторной попыткой занять слот чата (секунды)
+    CHAT_RETRY_DELAY = 0.2
+
+    def __init__(self, rate, chat_interval, cache_alias='ratelimit'):
+        self.rate = rate
+        self.chat_interval = max(1, math.ceil(chat_interval))
+        self.cache = caches[cache_alias]
+
+    @staticmethod
+    def _chat_key(chat_id):
+        return f"telegram_outbox_chat:{chat_id}"
+
+    async def wait(self, chat_id):
+        # Слот чата: add() атомарен, ключ живет chat_interval секунд
+        while not await self.cache.aadd(self._chat_key(chat_id), True, timeout=self.chat_interval):
+            await asyncio.sleep(self.CHAT_RETRY_DELAY)
+
+        # Общий слот: счетчик отправок в текущую секунду
+        while True:
+            now = time.time()
+            key = f"telegram_outbox_rate:{int(now)}"
+            await self.cache.aadd(key, 0, timeout=2)
+            try:
+                sent = await self.cache.aincr(key)
+            except ValueError:
+                # Ключ истек между add() и incr() - секунда уже прошла
+                continue
+            if sent <= self.rate:
+                return
+            await asyncio.sleep(math.floor(now) + 1 - now)
+
+    async def pause(self, chat_id, seconds):
+        """Telegram попросил подождать (RetryAfter)"""
+        await self.cache.aset(self._chat_key(chat_id), True, timeout=max(1, math.ceil(seconds)))
+
+
+class OutboxSender:
+    """Отправитель очереди исходящих сообщений"""
+
+    def __init__(self, bot, batch_size=BATCH_SIZE, poll_interval=POLL_INTERVAL):
+        self.bot = bot
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = getattr(settings, 'TELEGRAM_OUTBOX_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+        self.limiter = RateLimiter(
+            getattr(settings, 'TELEGRAM_OUTBOX_GLOBAL_RATE', DEFAULT_GLOBAL_RATE),
+            getattr(settings, 'TELEGRAM_OUTBOX_CHAT_INTERVAL', DEFAULT_CHAT_INTERVAL)
+        )
+
+    async def run(self):
+        """Отправлять сообщения, пока задачу не отменят"""
+        logger.info("Отправитель исходящих сообщений Telegram запущен")
+        while True:
+            try:
+                processed = await self.process_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Ошибка обработки очереди исходящих сообщений")
+                processed = 0
+            if not processed:
+                await asyncio.sleep(self.poll_interval)
+
+    async def drain(self):
+        """Отправить все готовые сообщения; возвращает их число"""
+        total = 0
+        while True:
+            processed = await self.process_batch()
+            if not processed:
+                return total
+            total += processed
+
+    async def process_batch(self):
+        messages = await sync_to_async(claim_batch)(self.batch_size)
+        if not messages:
+            return 0
+
+        by_chat = defaultdict(list)
+        for message in messages:
+            by_chat[message.chat_id].append(message)
+
+        chats = list(by_chat.values())
+        try:
+            # Чаты обрабатываются параллельно, сообщения одного чата - по порядку
+            results = await asyncio.gather(
+                *(self._send_chat(chat_messages) for chat_messages in chats),
+                return_exceptions=True
+            )
+            for chat_messages, result in zip(chats, results):
+                if isinstance(result, Exception):
+                    logger.error(
+                        f"Ошибка отправки в чат {chat_messages[0].chat_id}: {result}",
+                        exc_info=result
+                    )
+                    # Неотправленные сообщения чата повторяются позже
+                    for message in chat_messages:
+                        if message.status == OutboundMessage.Status.SENDING:
+                            self._retry(message, backoff(message.attempts + 1), str(result))
+        finally:
+            # Результаты сохраняются всегда (и при остановке отправителя);
+            # необработанные сообщения остаются в аренде до ее истечения
+            await sync_to_async(save_results)(messages)
+        return len(messages)
+
+    async def _send_chat(self, messages):
+        for index, message in enumerate(messages):
+            await self.limiter.wait(message.chat_id)
+            delay = await self._send(message)
+            if delay is not None:
+                # Чат ограничен по частоте: остальные сообщения откладываем без попытки
+                for rest in messages[index + 1:]:
+                    self._retry(rest, delay, message.last_error)
+                return
+
+    async def _send(self, message):
+        """Отправить сообщение; возвращает задержку, если Telegram ограничил частоту"""
+        from telegram.error import BadRequest, Forbidden, RetryAfter
+
+        try:
+            await self.bot.send_message(
+                chat_id=message.chat_id,
+                text=message.text,
+                parse_mode=message.parse_mode or None
+            )
+        except RetryAfter as e:
+            # Ограничение частоты не считается неудачной попыткой
+            delay = _seconds(e.retry_after)
+            await self.limiter.pause(message.chat_id, delay)
+            self._retry(message, delay, str(e))
+            return delay
+        except (Forbidden, BadRequest) as e:
+            # Бот заблокирован, чат не найден, ошибка разметки - повтор не поможет
+            message.attempts += 1
+            self._fail(message, str(e))
+        except Exception as e:
+            # TelegramError (сеть, ошибка сервера) и непредвиденные ошибки
+            message.attempts += 1
+            if message.attempts >= self.max_attempts:
+                self._fail(message, str(e))
+            else:
+                self._retry(message, backoff(message.attempts), str(e))
+        else:
+            message.attempts += 1
+            message.status = OutboundMessage.Status.SENT
+            message.sent_at = timezone.now()
+            message.last_error = ''
+        return None
+
+    def _retry(self, message, delay, error):
+        message.status = OutboundMessage.Status.PENDING
+        message.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+        message.last_error = error
+
+    def _fail(self, message, error):
+        logger.error(f"Сообщение {message.pk} в чат {message.chat_id} не отправлено: {error}")
+        message.status = OutboundMessage.Status.FAILED
+        message.last_error = error
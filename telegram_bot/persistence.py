@@ -0,0 +1,82 @@
+"""
+Хранение user_data бота в общем кэше Django
+
+В режиме webhook обновления одного пользователя могут попасть в разные
+воркеры. user_data (например, состояние создания задачи) перечитывается из
+кэша перед каждым обновлением и записывается обратно в конце обработки
+обновления (ConstructionBot.save_user_data), а не только раз в update_interval.
+Остальные данные PTB (chat_data, bot_data, разговоры) бот не использует.
+"""
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from django.core.cache import cache
+
+# Время жизни user_data в кэше (секунды)
+USER_DATA_TIMEOUT = 24 * 60 * 60
+
+
+def _user_key(user_id):
+    return f"telegram_user_data:{user_id}"
+
+
+class CacheUserDataPersistence(BasePersistence):
+    """user_data бота в кэше Django"""
+
+    def __init__(self, update_interval=1):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+
+    async def get_user_data(self):
+        # Данные загружаются по пользователю в refresh_user_data
+        return {}
+
+    async def refresh_user_data(self, user_id, user_data):
+        stored = await cache.aget(_user_key(user_id))
+        user_data.clear()
+        if stored:
+            user_data.update(stored)
+
+    async def update_user_data(self, user_id, data):
+        await cache.aset(_user_key(user_id), dict(data), USER_DATA_TIMEOUT)
+
+    async def drop_user_data(self, user_id):
+        await cache.adelete(_user_key(user_id))
+
+    async def get_chat_data(self):
+        return {}
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def get_bot_data(self):
+        return {}
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def get_callback_data(self):
+        return None
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def get_conversations(self, name):
+        return {}
+
+    async def update_conversation(self, name, key, new_state):
+        pass
+
+    async def flush(self):
+        pass
@@ -0,0 +1,263 @@
+"""
+Загрузка данных для экранов Telegram бота
+
+Каждый экран загружается одной синхронной функцией: связанные объекты
+читаются через select_related, а результат - неизменяемые dataclass без
+ленивых связей. Обработчик делает один вызов sync_to_async на экран вместо
+отдельного перехода в поток (и отдельного запроса) на каждый атрибут.
+Пользователь бота берется из кэша процесса (telegram_bot/user_cache.py).
+"""
+
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import List, Optional
+
+from django.core.exceptions import PermissionDenied
+from django.db.models import Count, Q
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import TelegramAuthToken
+from kanban.models import ExpenseItem
+from kanban.project_stats import get_project_stats
+from projects.models import Project, ProjectMember
+
+from .user_cache import BotUser, get_bot_user
+
+# Время действия токена входа в панель из меню бота
+PANEL_TOKEN_LIFETIME = timedelta(minutes=30)
+
+# Размеры списков
+PROJECTS_LIMIT = 10
+TASKS_LIMIT = 15
+PROJECT_TASKS_LIMIT = 10
+
+# Домен для ссылок, если Site не настроен (разработка)
+FALLBACK_DOMAIN = "127.0.0.1:8000"
+
+
+@dataclass(frozen=True)
+class ProjectRow:
+    id: int
+    name: str
+    status: str
+    status_display: str
+    budget: Decimal
+    spent_amount: Decimal
+    created_by_id: int
+    foreman_id: Optional[int]
+
+
+@dataclass(frozen=True)
+class TaskRow:
+    id: uuid.UUID
+    title: str
+    description: str
+    status: str
+    status_display: str
+    amount: Decimal
+    created_at: datetime
+    project_id: int
+    project_name: str
+    created_by_id: int
+    created_by_name: str
+    assigned_to_id: Optional[int]
+    assigned_to_name: Optional[str]
+    stage_name: Optional[str]
+
+
+@dataclass(frozen=True)
+class MenuScreen:
+    user: BotUser
+    panel_url: str
+
+
+@dataclass(frozen=True)
+class ProjectsScreen:
+    user: BotUser
+    projects: List[ProjectRow]
+
+
+@dataclass(frozen=True)
+class TasksScreen:
+    user: BotUser
+    tasks: List[TaskRow]
+
+
+@dataclass(frozen=True)
+class ProjectScreen:
+    project: ProjectRow
+    description: str
+    foreman_name: str
+    total_tasks: int
+    completed_tasks: int
+
+
+@dataclass(frozen=True)
+class ProjectTasksScreen:
+    project: ProjectRow
+    tasks: List[TaskRow]
+
+
+@dataclass(frozen=True)
+class ProjectStatsScreen:
+    project: ProjectRow
+    stats: dict
+
+
+def _project_row(project):
+    return ProjectRow(
+        id=project.id,
+        name=project.name,
+        status=project.status,
+        status_display=project.get_status_display(),
+        budget=project.budget,
+        spent_amount=project.spent_amount,
+        created_by_id=project.created_by_id,
+        foreman_id=project.foreman_id
+    )
+
+
+def _task_row(task):
+    """Строка задачи; связи должны быть загружены через select_related"""
+    return TaskRow(
+        id=task.id,
+        title=task.title,
+        description=task.description,
+        status=task.status,
+        status_display=task.get_status_display(),
+        amount=task.amount,
+        created_at=task.created_at,
+        project_id=task.project_id,
+        project_name=task.project.name,
+        created_by_id=task.created_by_id,
+        created_by_name=task.created_by.get_full_name(),
+        assigned_to_id=task.assigned_to_id,
+        assigned_to_name=task.assigned_to.get_full_name() if task.assigned_to_id else None,
+        stage_name=task.stage.name if task.stage_id else None
+    )
+
+
+def _tasks_queryset():
+    return ExpenseItem.objects.select_related('project', 'created_by', 'assigned_to', 'stage')
+
+
+def _accessible_projects(user):
+    """Доступные проекты по записи из кэша пользователей"""
+    if user.sees_all_active:
+        return Project.objects.filter(Q(is_active=True) | Q(id__in=user.project_ids))
+    return Project.objects.filter(id__in=user.project_ids)
+
+
+def _has_project_access(user, project):
+    # Администратор имеет доступ ко всем проектам
+    if user.role == 'admin' or project.id in user.project_ids:
+        return True
+    if user.id in (project.created_by_id, project.foreman_id):
+        return True
+    return ProjectMember.objects.filter(project=project, user_id=user.id).exists()
+
+
+def _accessible_project(user, project_id):
+    project = Project.objects.select_related('foreman').get(id=project_id)
+    if not _has_project_access(user, project):
+        raise PermissionDenied
+    return project
+
+
+def _site_domain():
+    from django.contrib.sites.models import Site
+
+    try:
+        return Site.objects.get_current().domain
+    except Exception:
+        return FALLBACK_DOMAIN
+
+
+def load_menu(telegram_id):
+    """Главное меню: пользователь и одноразовая ссылка входа в панель"""
+    user = get_bot_user(telegram_id)
+
+    login_token = TelegramAuthToken.objects.create(
+        token=str(uuid.uuid4()),
+        user_id=user.id,
+        telegram_user_id=user.telegram_user_id,
+        expires_at=timezone.now() + PANEL_TOKEN_LIFETIME,
+        is_used=False
+    )
+    panel_url = f"http://{_site_domain()}{reverse('accounts:telegram_login')}?auth_token={login_token.token}"
+    return MenuScreen(user=user, panel_url=panel_url)
+
+
+def load_projects(telegram_id):
+    """Последние проекты, доступные пользователю"""
+    user = get_bot_user(telegram_id)
+    projects = _accessible_projects(user).order_by('-created_at')[:PROJECTS_LIMIT]
+    return ProjectsScreen(
+        user=user,
+        projects=[_project_row(project) for project in projects]
+    )
+
+
+def load_tasks(telegram_id):
+    """Последние задачи пользователя в зависимости от роли"""
+    user = get_bot_user(telegram_id)
+    tasks = _tasks_queryset().order_by('-created_at')
+
+    if user.role == 'foreman':
+        # Прораб видит задачи своих проектов
+        tasks = tasks.filter(Q(project__foreman_id=user.id) | Q(project__created_by_id=user.id))
+    elif user.role != 'admin':
+        # Остальные роли видят свои задачи, администратор - все
+        tasks = tasks.filter(Q(created_by_id=user.id) | Q(assigned_to_id=user.id))
+
+    return TasksScreen(
+        user=user,
+        tasks=[_task_row(task) for task in tasks[:TASKS_LIMIT]]
+    )
+
+
+def load_project(telegram_id, project_id):
+    """Карточка проекта со счетчиками задач; PermissionDenied без доступа"""
+    user = get_bot_user(telegram_id)
+    project = _accessible_project(user, project_id)
+    counts = ExpenseItem.objects.filter(project=project).aggregate(
+        total=Count('id'),
+        completed=Count('id', filter=Q(status='done'))
+    )
+    return ProjectScreen(
+        project=_project_row(project),
+        description=project.description,
+        foreman_name=project.foreman.get_full_name() if project.foreman else 'Не назначен',
+        total_tasks=counts['total'],
+        completed_tasks=counts['completed']
+    )
+
+
+def load_project_tasks(telegram_id, project_id):
+    """Последние задачи проекта; PermissionDenied без доступа"""
+    user = get_bot_user(telegram_id)
+    project = _accessible_project(user, project_id)
+    tasks = _tasks_queryset().filter(project=project).order_by('-created_at')[:PROJECT_TASKS_LIMIT]
+    return ProjectTasksScreen(
+        project=_project_row(project),
+        tasks=[_task_row(task) for task in tasks]
+    )
+
+
+def load_project_stats(telegram_id, project_id):
+    """Сводная статистика проекта"""
+    get_bot_user(telegram_id)
+    project = Project.objects.get(id=project_id)
+    return ProjectStatsScreen(project=_project_row(project), stats=get_project_stats(project.id))
+
+
+def load_task(task_id):
+    """Карточка задачи"""
+    return _task_row(_tasks_queryset().get(id=task_id))
+
+
+def load_project_name(project_id):
+    return Project.objects.values_list('name', flat=True).get(id=project_id)
@@ -0,0 +1,31 @@
+"""
+Сигналы бота: сброс кэша пользователей (telegram_bot/user_cache.py)
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.models import TelegramUser, User
+from projects.access import project_access_changed
+
+from .user_cache import invalidate_bot_users
+
+
+@receiver(post_save, sender=TelegramUser)
+@receiver(post_delete, sender=TelegramUser)
+def telegram_user_changed(sender, instance, **kwargs):
+    """Привязка Telegram создана, изменена или удалена"""
+    invalidate_bot_users(user_ids=[instance.user_id], telegram_ids=[instance.telegram_id])
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    """Смена роли или имени пользователя"""
+    if update_fields is None or {'role', 'first_name', 'last_name'} & set(update_fields):
+        invalidate_bot_users(user_ids=[instance.pk])
+
+
+@receiver(project_access_changed)
+def project_access_updated(sender, user_ids, **kwargs):
+    """Ключи доступа, участие или владение проектами изменились"""
+    invalidate_bot_users(user_ids=user_ids)
@@ -0,0 +1,147 @@
+"""
+Кэш пользователей бота: telegram_id -> пользователь Django
+
+Запись (ID пользователя, роль, имя, доступные проекты) хранится в памяти
+процесса (LRU с временем жизни) и загружается при промахе запросом с join.
+Бот и веб-приложение работают в разных процессах, поэтому сброс записи
+(сигналы TelegramUser и User, project_access_changed) также меняет метки
+версии в общем кэше. Попадание сверяет метки одним обращением к кэшу -
+без запросов к БД.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Tuple
+
+from django.core.cache import cache
+from django.db.models import Min
+from django.utils import timezone
+
+# Время жизни записи в памяти процесса (секунды)
+BOT_USER_TTL = 300
+
+# Максимальное число записей в памяти процесса
+BOT_USER_MAXSIZE = 1024
+
+# Время жизни меток версии в общем кэше (секунды)
+VERSION_TIMEOUT = 24 * 60 * 60
+
+
+@dataclass(frozen=True)
+class BotUser:
+    id: int
+    telegram_user_id: int
+    role: str
+    role_display: str
+    full_name: str
+    # Доступные проекты, новые первыми (для администраторов - только по ключам)
+    project_ids: Tuple[int, ...]
+    # Администратору доступны все активные проекты; их список не кэшируется
+    sees_all_active: bool
+
+
+# telegram_id -> (BotUser, метки версии, момент истечения по time.monotonic)
+_entries = OrderedDict()
+_lock = threading.Lock()
+
+
+def _user_version_key(user_id):
+    return f"bot_user_version:user:{user_id}"
+
+
+def _telegram_version_key(telegram_id):
+    return f"bot_user_version:telegram:{telegram_id}"
+
+
+def _versions(telegram_id, user_id):
+    keys = [_telegram_version_key(telegram_id), _user_version_key(user_id)]
+    stamps = cache.get_many(keys)
+    return tuple(stamps.get(key) for key in keys)
+
+
+def _load(telegram_id):
+    """Загрузить запись; возвращает (BotUser, метки версии, время жизни)"""
+    from accounts.models import ProjectAccessKey, TelegramUser
+    from projects.access import accessible_projects, get_project_access
+
+    telegram_user = TelegramUser.objects.select_related('user').get(telegram_id=telegram_id)
+    user = telegram_user.user
+
+    # Метки читаются до загрузки проектов: сброс во время загрузки не потеряется
+    versions = _versions(telegram_id, user.id)
+    sees_all_active = user.is_admin_role()
+    if sees_all_active:
+        project_ids = tuple(get_project_access(user).keyed)
+    else:
+        project_ids = tuple(
+            accessible_projects(user).order_by('-created_at').values_list('id', flat=True)
+        )
+
+    # Запись не должна пережить истечение ближайшего ключа доступа
+    ttl = BOT_USER_TTL
+    now = timezone.now()
+    nearest = ProjectAccessKey.objects.valid(now).filter(
+        assigned_to_id=user.id,
+        expires_at__isnull=False
+    ).aggregate(nearest=Min('expires_at'))['nearest']
+    if nearest:
+        ttl = max(1, min(ttl, int((nearest - now).total_seconds())))
+
+    bot_user = BotUser(
+        id=user.id,
+        telegram_user_id=telegram_user.id,
+        role=user.role,
+        role_display=user.get_role_display(),
+        full_name=user.get_full_name(),
+        project_ids=project_ids,
+        sees_all_active=sees_all_active
+    )
+    return bot_user, versions, ttl
+
+
+def get_bot_user(telegram_id):
+    """Пользователь бота по telegram_id; TelegramUser.DoesNotExist, если не привязан"""
+    with _lock:
+        entry = _entries.get(telegram_id)
+        if entry is not None:
+            _entries.move_to_end(telegram_id)
+
+    if entry is not None:
+        bot_user, versions, expires_at = entry
+        if expires_at > time.monotonic() and _versions(telegram_id, bot_user.id) == versions:
+            return bot_user
+
+    bot_user, versions, ttl = _load(telegram_id)
+    with _lock:
+        _entries[telegram_id] = (bot_user, versions, time.monotonic() + ttl)
+        _entries.move_to_end(telegram_id)
+        while len(_entries) > BOT_USER_MAXSIZE:
+            _entries.popitem(last=False)
+    return bot_user
+
+
+def invalidate_bot_users(user_ids=(), telegram_ids=()):
+    """Сбросить записи пользователей во всех процессах"""
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    telegram_ids = {telegram_id for telegram_id in telegram_ids if telegram_id is not None}
+    if not user_ids and not telegram_ids:
+        return
+
+    stamp = uuid.uuid4().hex
+    stamps = {_user_version_key(user_id): stamp for user_id in user_ids}
+    stamps.update({_telegram_version_key(telegram_id): stamp for telegram_id in telegram_ids})
+    cache.set_many(stamps, VERSION_TIMEOUT)
+
+    with _lock:
+        for telegram_id, (bot_user, _stamps, _expires_at) in list(_entries.items()):
+            if telegram_id in telegram_ids or bot_user.id in user_ids:
+                del _entries[telegram_id]
+
+
+def clear_bot_users():
+    """Очистить записи текущего процесса"""
+    with _lock:
+        _entries.clear()
@@ -0,0 +1,153 @@
+"""
+Прием обновлений Telegram через webhook в ASGI-процессе Django
+
+Режим задается настройкой TELEGRAM_BOT_MODE: 'polling' - отдельный процесс
+run_telegram_bot.py, 'webhook' - обновления приходят на /telegram/webhook/,
+представление кладет их в очередь Application бота, а обработка идет в том
+же event loop. Адрес webhook регистрируется командой telegram_webhook.
+Application запускается при старте ASGI-воркера (lifespan, superpan/asgi.py)
+вместе с отправителем очереди исходящих сообщений. Режим webhook работает
+только под ASGI: без запущенного Application (WSGI, lifespan отключен)
+представление отвечает 503, и Telegram повторит доставку позже.
+"""
+
+import asyncio
+import hmac
+import json
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import (
+    HttpResponse,
+    HttpResponseForbidden,
+    HttpResponseNotAllowed,
+    JsonResponse,
+)
+from django.views.decorators.csrf import csrf_exempt
+
+logger = logging.getLogger(__name__)
+
+POLLING = 'polling'
+WEBHOOK = 'webhook'
+
+# Сколько помнить принятые update_id (секунды): Telegram повторяет доставку,
+# пока не получит ответ 200
+UPDATE_DEDUP_TIMEOUT = 24 * 60 * 60
+
+_application = None
+_application_lock = None
+
+
+def is_webhook_mode():
+    return getattr(settings, 'TELEGRAM_BOT_MODE', POLLING) == WEBHOOK
+
+
+def running_application():
+    """Application, запущенное обработчиком lifespan, или None"""
+    return _application
+
+
+async def start_application():
+    """Запустить Application бота в event loop ASGI-воркера (lifespan)"""
+    global _application, _application_lock
+    if _application is not None:
+        return _application
+
+    if _application_lock is None:
+        _application_lock = asyncio.Lock()
+    async with _application_lock:
+        if _application is None:
+            from .bot import get_bot_instance
+
+            bot = get_bot_instance()
+            application = bot.application
+            await application.initialize()
+            # Без updater: обновления поступают из представления
+            await application.start()
+            await bot.start_outbox(application)
+            _application = application
+    return _application
+
+
+async def shutdown_application():
+    """Остановить Application бота (завершение ASGI-воркера)"""
+    global _application
+    if _application is None:
+        return
+
+    from .bot import get_bot_instance
+
+    await get_bot_instance().stop_outbox()
+    await _application.stop()
+    await _application.shutdown()
+    _application = None
+
+
+async def apply_bot_mode(bot):
+    """
+    Зарегистрировать или удалить webhook в Telegram по TELEGRAM_BOT_MODE.
+    Вызывается вне работающего Application (команда, run_telegram_bot.py).
+    """
+    async with bot:
+        if is_webhook_mode():
+            await bot.set_webhook(
+                url=settings.TELEGRAM_WEBHOOK_URL,
+                secret_token=settings.TELEGRAM_WEBHOOK_SECRET or None,
+                allowed_updates=['message', 'callback_query']
+            )
+        else:
+            await bot.delete_webhook()
+        return await bot.get_webhook_info()
+
+
+@csrf_exempt
+async def telegram_webhook(request):
+    """Принять обновление Telegram и передать его боту"""
+    from telegram import Update
+
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    if not is_webhook_mode():
+        return JsonResponse({'error': 'Webhook отключен'}, status=404)
+
+    # Подпись проверяет TelegramWebhookSecurityMiddleware; здесь - обязательный токен
+    secret = settings.TELEGRAM_WEBHOOK_SECRET
+    received = request.META.get('HTTP_X_TELEGRAM_BOT_API_SECRET_TOKEN', '')
+    if not secret or not hmac.compare_digest(received, secret):
+        return HttpResponseForbidden('Invalid secret token')
+
+    try:
+        data = json.loads(request.body)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return JsonResponse({'error': 'Некорректные данные'}, status=400)
+
+    application = running_application()
+    if application is None:
+        # Под WSGI у каждого запроса свой event loop: обновление потерялось бы
+        # после ответа 200. Telegram повторит доставку после ответа 503
+        logger.error(
+            "Webhook Telegram: Application бота не запущено. Режим webhook "
+            "требует ASGI-сервера с lifespan (SERVER_MODE=asgi)"
+        )
+        return JsonResponse({'error': 'Бот не запущен'}, status=503)
+
+    update = Update.de_json(data, application.bot)
+    if update is None:
+        return JsonResponse({'error': 'Некорректные данные'}, status=400)
+
+    # Повторная доставка уже принятого обновления (ответ 200 не дошел до Telegram).
+    # add() атомарен: из нескольких воркеров обновление примет только один
+    cache = caches['ratelimit']
+    dedup_key = f"telegram_update:{update.update_id}"
+    if not await cache.aadd(dedup_key, True, timeout=UPDATE_DEDUP_TIMEOUT):
+        return HttpResponse(status=200)
+
+    # Обработка идет в фоне: Telegram получает ответ сразу
+    try:
+        await application.update_queue.put(update)
+    except BaseException:
+        # Обновление не передано боту - повторная доставка должна пройти
+        await cache.adelete(dedup_key)
+        raise
+    return HttpResponse(status=200)
@@ -0,0 +1,54 @@
+"""
+Пакетное перемещение карточек (kanban/bulk_moves.py)
+"""
+
+from decimal import Decimal
+
+from django.test import TestCase
+
+from accounts.models import User
+from kanban.board_snapshot import get_or_create_board
+from kanban.bulk_moves import apply_bulk_moves
+from kanban.models import ExpenseItem
+from kanban.ordering import CARD_ORDERING, POSITION_MAX
+from projects.models import Project
+
+
+class ApplyBulkMovesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin@example.com', 'password')
+        cls.project = Project.objects.create(
+            name='Жилой дом', budget=Decimal('1000000.00'), created_by=cls.admin
+        )
+        board = get_or_create_board(cls.project, cls.admin)
+        cls.source = board.columns.get(column_type='new')
+        cls.target = board.columns.get(column_type='todo')
+
+    def _item(self, column, title, position):
+        return ExpenseItem.objects.create(
+            project=self.project,
+            column=column,
+            title=title,
+            position=position,
+            created_by=self.admin
+        )
+
+    def test_append_rebalances_full_column(self):
+        last = self._item(self.target, 'Последняя', POSITION_MAX)
+        moved = [self._item(self.source, f'Карточка {index}', index + 1) for index in range(3)]
+
+        results = apply_bulk_moves(
+            self.admin,
+            [{'item_id': str(item.id), 'target_column_id': self.target.id} for item in moved]
+        )
+
+        self.assertTrue(all(result['success'] for result in results))
+        ordered = list(
+            ExpenseItem.objects.filter(column=self.target)
+            .order_by(*CARD_ORDERING)
+            .values_list('id', 'position')
+        )
+        self.assertEqual([item_id for item_id, _ in ordered], [last.id] + [item.id for item in moved])
+        self.assertTrue(all(position <= POSITION_MAX for _, position in ordered))
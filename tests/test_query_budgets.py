@@ -0,0 +1,228 @@
+"""
+Бюджеты SQL-запросов представлений
+
+Запускаются с superpan.settings_test (QUERY_BUDGET_STRICT): если
+представление выполнит больше запросов, чем объявлено в @query_budget,
+QueryInspectionMiddleware выбросит QueryBudgetExceeded и тест упадет.
+Данных заведомо больше, чем карточек в одном столбце, чтобы N+1 был заметен.
+Сам детектор проверяется отдельно: без этого сломанный middleware
+пропустил бы все проверки бюджетов молча.
+"""
+
+import json
+from decimal import Decimal
+
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import path, reverse
+
+from accounts.models import User
+from kanban.board_snapshot import get_or_create_board
+from kanban.models import ExpenseCategory, ExpenseItem, StatusChangeRequest
+from projects.estimate_models import (
+    EstimateCategory,
+    EstimateRate,
+    EstimateUnit,
+    ProjectEstimateItem,
+)
+from projects.models import Project, ProjectEstimate
+from superpan.query_budget import (
+    QueryBudgetExceeded,
+    QueryRecorder,
+    check_queries,
+    query_budget,
+    sql_shape,
+)
+
+ITEMS_PER_COLUMN = 5
+
+
+@query_budget(2)
+def over_budget_view(request):
+    for _ in range(3):
+        User.objects.count()
+    return HttpResponse()
+
+
+@query_budget(3)
+def within_budget_view(request):
+    for _ in range(3):
+        User.objects.count()
+    return HttpResponse()
+
+
+urlpatterns = [
+    path('over-budget/', over_budget_view),
+    path('within-budget/', within_budget_view),
+]
+
+
+def _execute(sql, params, many, context):
+    return None
+
+
+class QueryDetectorTests(SimpleTestCase):
+
+    def test_sql_shape_folds_in_lists_and_literals(self):
+        self.assertEqual(
+            sql_shape("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'O''Brien' LIMIT 21"),
+            "SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?"
+        )
+        self.assertEqual(
+            sql_shape('SELECT * FROM t WHERE id IN (%s)'),
+            sql_shape('SELECT * FROM t WHERE id IN (%s, %s)')
+        )
+
+    def test_recorder_repeated(self):
+        recorder = QueryRecorder()
+        for item_id in range(5):
+            recorder(_execute, f'SELECT * FROM t WHERE id = {item_id}', None, False, {})
+        recorder(_execute, 'SELECT * FROM other', None, False, {})
+
+        self.assertEqual(recorder.count, 6)
+        self.assertEqual(recorder.repeated(5), [('SELECT * FROM t WHERE id = ?', 5)])
+        self.assertEqual(recorder.repeated(6), [])
+
+    def test_check_queries(self):
+        recorder = QueryRecorder()
+        for _ in range(3):
+            recorder(_execute, 'SELECT 1', None, False, {})
+
+        check_queries('view', recorder, budget=3, strict=True)
+        with self.assertRaises(QueryBudgetExceeded):
+            check_queries('view', recorder, budget=2, strict=True)
+        with self.assertLogs('superpan.query_budget', 'ERROR'):
+            check_queries('view', recorder, budget=2)
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class QueryInspectionMiddlewareTests(TestCase):
+
+    def test_over_budget_view_fails(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get('/over-budget/')
+
+    def test_within_budget_view_passes(self):
+        self.assertEqual(self.client.get('/within-budget/').status_code, 200)
+
+
+class QueryBudgetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'admin@example.com', 'password', first_name='Иван', last_name='Петров'
+        )
+        cls.worker = User.objects.create_user(
+            'worker@example.com', 'password', first_name='Петр', last_name='Иванов'
+        )
+        cls.project = Project.objects.create(
+            name='Жилой дом', budget=Decimal('1000000.00'), created_by=cls.admin
+        )
+        board = get_or_create_board(cls.project, cls.admin)
+        cls.columns = list(board.columns.order_by('position'))
+        categories = [
+            ExpenseCategory.objects.create(name=f'Категория {index}') for index in range(3)
+        ]
+
+        cls.items = []
+        for column in cls.columns:
+            for index in range(ITEMS_PER_COLUMN):
+                cls.items.append(ExpenseItem.objects.create(
+                    project=cls.project,
+                    column=column,
+                    category=categories[index % len(categories)],
+                    title=f'{column.name} {index}',
+                    amount=Decimal('1000.00'),
+                    created_by=cls.worker,
+                    assigned_to=cls.worker
+                ))
+
+        cls.status_requests = [
+            StatusChangeRequest.objects.create(
+                expense_item=item,
+                requested_by=cls.worker,
+                old_status=item.status,
+                new_status=ExpenseItem.Status.DONE
+            )
+            for item in cls.items[:ITEMS_PER_COLUMN * 2]
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_kanban_board(self):
+        response = self.client.get(reverse('kanban:board', args=[self.project.id]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_board_delta(self):
+        response = self.client.get(
+            reverse('kanban:board_delta', args=[self.project.id]), {'since': 0}
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_bulk_move(self):
+        target = self.columns[-1]
+        moves = [
+            {'item_id': str(item.id), 'target_column_id': target.id}
+            for item in self.items if item.column_id != target.id
+        ]
+        response = self.client.post(
+            reverse('kanban:bulk_move_expense'),
+            json.dumps({'moves': moves}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all(result['success'] for result in response.json()['results']))
+
+    def test_process_status_changes(self):
+        response = self.client.post(
+            reverse('kanban:process_status_changes'),
+            json.dumps({
+                'action': 'approve',
+                'request_ids': [status_request.id for status_request in self.status_requests]
+            }),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all(result['success'] for result in response.json()['results']))
+
+    def test_project_estimate_detailed(self):
+        category = EstimateCategory.objects.create(name='Общестроительные работы', code='01')
+        unit = EstimateUnit.objects.create(name='Квадратный метр', short_name='м2')
+        estimate = ProjectEstimate.objects.create(
+            project=self.project,
+            estimate_type=ProjectEstimate.EstimateType.DETAILED,
+            total_amount=self.project.budget,
+            created_by=self.admin
+        )
+        for index in range(10):
+            rate = EstimateRate.objects.create(
+                code=f'01-{index:02d}',
+                name=f'Работа {index}',
+                category=category,
+                unit=unit,
+                base_price=Decimal('100.00'),
+                labor_cost=Decimal('60.00'),
+                material_cost=Decimal('30.00'),
+                equipment_cost=Decimal('10.00'),
+                labor_hours=Decimal('1.50')
+            )
+            ProjectEstimateItem.objects.create(
+                estimate=estimate,
+                rate=rate,
+                quantity=Decimal('2.000'),
+                unit_price=Decimal('100.00'),
+                position=index
+            )
+
+        response = self.client.get(reverse('projects:estimate_detailed', args=[self.project.id]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_export_excel(self):
+        response = self.client.get(reverse('admin_panel:export_excel'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_export_csv(self):
+        response = self.client.get(reverse('admin_panel:export_csv'))
+        self.assertEqual(response.status_code, 200)
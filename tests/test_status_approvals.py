@@ -0,0 +1,72 @@
+"""
+Пакетная обработка запросов на изменение статуса (kanban/status_approvals.py)
+"""
+
+from decimal import Decimal
+
+from django.test import TestCase
+
+from accounts.models import User
+from kanban.board_snapshot import get_or_create_board
+from kanban.models import ExpenseItem, StatusChangeRequest
+from kanban.status_approvals import APPROVE, process_status_requests
+from projects.models import Project
+
+
+class ProcessStatusRequestsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin@example.com', 'password')
+        cls.worker = User.objects.create_user('worker@example.com', 'password')
+        cls.project = Project.objects.create(
+            name='Жилой дом', budget=Decimal('1000000.00'), created_by=cls.admin
+        )
+        board = get_or_create_board(cls.project, cls.admin)
+        cls.new_column = board.columns.get(column_type='new')
+
+    def _request(self, new_status):
+        item = ExpenseItem.objects.create(
+            project=self.project,
+            column=self.new_column,
+            title='Задача',
+            amount=Decimal('1000.00'),
+            created_by=self.worker
+        )
+        return item, StatusChangeRequest.objects.create(
+            expense_item=item,
+            requested_by=self.worker,
+            old_status=item.status,
+            new_status=new_status
+        )
+
+    def test_approve_moves_item_to_status_column(self):
+        item, status_request = self._request(ExpenseItem.Status.DONE)
+
+        results = process_status_requests(self.admin, [status_request.id], APPROVE)
+
+        self.assertTrue(results[0]['success'])
+        item.refresh_from_db()
+        self.assertEqual(item.status, ExpenseItem.Status.DONE)
+        self.assertEqual(item.column.column_type, ExpenseItem.Status.DONE)
+
+    def test_approve_without_status_column_leaves_item_alone(self):
+        item, status_request = self._request(ExpenseItem.Status.DONE)
+        other_item, other_request = self._request(ExpenseItem.Status.IN_PROGRESS)
+        self.new_column.board.columns.filter(column_type='done').delete()
+
+        results = process_status_requests(
+            self.admin, [status_request.id, other_request.id], APPROVE
+        )
+
+        self.assertFalse(results[0]['success'])
+        self.assertIn('error', results[0])
+        self.assertTrue(results[1]['success'])
+
+        item.refresh_from_db()
+        status_request.refresh_from_db()
+        self.assertEqual(item.status, ExpenseItem.Status.NEW)
+        self.assertEqual(item.column_id, self.new_column.id)
+        self.assertTrue(status_request.is_pending)
+        other_item.refresh_from_db()
+        self.assertEqual(other_item.status, ExpenseItem.Status.IN_PROGRESS)
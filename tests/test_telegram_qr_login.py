@@ -0,0 +1,117 @@
+"""
+Вход по QR-коду: страница входа ждет подтверждения в боте, затем
+accounts:telegram_qr_login авторизует браузер, показавший QR-код
+"""
+
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from asgiref.sync import sync_to_async
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import TelegramAuthToken, TelegramUser, User
+
+
+class TelegramQrLoginTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('worker@example.com', 'password')
+        cls.telegram_user = TelegramUser.objects.create(
+            telegram_id=123456, user=cls.user, first_name='Петр'
+        )
+
+    def _token(self, is_used=True, expires_in=timedelta(minutes=10)):
+        return TelegramAuthToken.objects.create(
+            user=self.user if is_used else None,
+            telegram_user=self.telegram_user if is_used else None,
+            is_used=is_used,
+            expires_at=timezone.now() + expires_in
+        )
+
+    def _set_session_token(self, auth_token):
+        session = self.client.session
+        session['telegram_auth_token'] = str(auth_token.token)
+        session.save()
+
+    def _login(self):
+        return self.client.get(reverse('accounts:telegram_qr_login'))
+
+    def _logged_in_user_id(self):
+        return self.client.session.get('_auth_user_id')
+
+    def test_confirmed_token_logs_in_once(self):
+        self._set_session_token(self._token())
+
+        response = self._login()
+
+        self.assertRedirects(response, '/projects/list/', fetch_redirect_response=False)
+        self.assertEqual(self._logged_in_user_id(), str(self.user.pk))
+
+        self.client.logout()
+        response = self._login()
+        self.assertRedirects(response, reverse('accounts:telegram_login'), fetch_redirect_response=False)
+        self.assertIsNone(self._logged_in_user_id())
+
+    def test_without_session_token(self):
+        self._token()
+
+        response = self._login()
+
+        self.assertRedirects(response, reverse('accounts:telegram_login'), fetch_redirect_response=False)
+        self.assertIsNone(self._logged_in_user_id())
+
+    def test_unconfirmed_token(self):
+        self._set_session_token(self._token(is_used=False))
+
+        self._login()
+
+        self.assertIsNone(self._logged_in_user_id())
+
+    def test_expired_token(self):
+        self._set_session_token(self._token(expires_in=timedelta(minutes=-1)))
+
+        self._login()
+
+        self.assertIsNone(self._logged_in_user_id())
+
+
+class BotQrConfirmationTests(TestCase):
+    """Бот не подтверждает вход без явного согласия пользователя"""
+
+    def setUp(self):
+        from telegram_bot.bot import ConstructionBot
+
+        # Без Application: проверяются только обработчики
+        self.bot = ConstructionBot.__new__(ConstructionBot)
+        self.auth_token = TelegramAuthToken.objects.create(
+            expires_at=timezone.now() + timedelta(minutes=10)
+        )
+
+    async def test_start_with_token_asks_for_confirmation(self):
+        message = SimpleNamespace(text='/start', reply_text=AsyncMock())
+        update = SimpleNamespace(
+            message=message,
+            effective_user=SimpleNamespace(id=123456, first_name='Петр')
+        )
+        context = SimpleNamespace(args=[f'auth_{self.auth_token.token}'])
+
+        await self.bot.start_command(update, context)
+
+        await sync_to_async(self.auth_token.refresh_from_db)()
+        self.assertFalse(self.auth_token.is_used)
+        keyboard = message.reply_text.call_args.kwargs['reply_markup'].inline_keyboard
+        self.assertEqual(keyboard[0][0].callback_data, f'auth_confirm:{self.auth_token.token}')
+
+    async def test_cancel_expires_token(self):
+        query = SimpleNamespace(edit_message_text=AsyncMock())
+
+        await self.bot.cancel_auth_token(query, str(self.auth_token.token))
+
+        await sync_to_async(self.auth_token.refresh_from_db)()
+        self.assertFalse(self.auth_token.is_used)
+        self.assertTrue(self.auth_token.is_expired())